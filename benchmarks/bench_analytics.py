@@ -0,0 +1,62 @@
+"""Compare the analytics views with the live joins they materialize.
+
+Run from the repository root against the database of the .env file:
+
+    python -m benchmarks.bench_analytics [repeats]
+
+The live query of each view is its own definition, read with ``pg_get_viewdef``,
+so both sides always compute the same rows.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+from asyncpg import Connection
+from typing import Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dependencies import connect_db
+from crud.analytics import ANALYTICS_VIEWS
+
+async def measure(connection: Connection, query: str, repeats: int) -> Tuple[float, int]:
+    """Get the median duration of a query.
+
+    Args:
+        connection (Connection): The database connection.
+        query (str): The query to time.
+        repeats (int): The number of timed executions.
+
+    Returns:
+        Tuple[float, int]: The median duration in milliseconds and the number of rows.
+    """
+    rows = await connection.fetch(query)
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        await connection.fetch(query)
+        durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations), len(rows)
+
+async def main(repeats: int = 50) -> None:
+    """Print the median time of each view and of its live join.
+
+    Args:
+        repeats (int): The number of timed executions per query. Defaults to 50.
+    """
+    connection = await connect_db()
+    try:
+        count = await connection.fetchval("SELECT count(*) FROM installation")
+        print(f"{count} installations")
+        for view in ANALYTICS_VIEWS:
+            live_query = await connection.fetchval("SELECT pg_get_viewdef($1::regclass)", view)
+            live, live_rows = await measure(connection, live_query.rstrip().rstrip(";"), repeats)
+            materialized, view_rows = await measure(connection, f"SELECT * FROM {view}", repeats)
+            assert live_rows == view_rows, f"{view} is outdated, refresh it first"
+            print(f"{view}: live {live:.2f} ms, materialized {materialized:.2f} ms, {live / materialized:.1f}x ({view_rows} rows)")
+    finally:
+        await connection.close()
+
+if __name__ == "__main__":
+    asyncio.run(main(*(int(arg) for arg in sys.argv[1:2])))
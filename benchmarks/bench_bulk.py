@@ -0,0 +1,99 @@
+"""Compare creating installations one POST at a time with a single bulk POST.
+
+Run from the repository root, against the storage backend of the .env file
+(``STORAGE_BACKEND=memory`` needs no database):
+
+    python -m benchmarks.bench_bulk [rows] [repeats]
+
+Both paths go through the whole application in process, middlewares and
+validation included, without a network in between. The rows get IDs from
+``BENCH_ID_START`` on and are deleted after each run.
+"""
+import os
+import statistics
+import sys
+import time
+from fastapi.testclient import TestClient
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app
+
+# First ID of the rows created by the benchmark, clear of the seeded and generated rows
+BENCH_ID_START = int(os.getenv("BENCH_ID_START", "2000000000"))
+
+def make_items(count: int) -> List[Dict[str, Any]]:
+    """Build installations to create, referencing a seeded product and customer.
+
+    Args:
+        count (int): The number of installations.
+
+    Returns:
+        List[Dict[str, Any]]: The request bodies.
+    """
+    return [{
+        "id": BENCH_ID_START + i,
+        "name": f"Bench-{i}",
+        "description": "Bulk benchmark installation",
+        "product_id": 1000,
+        "customer_id": 1000,
+        "installation_date": "2023-01-01"} for i in range(count)]
+
+def post_single(client: TestClient, items: List[Dict[str, Any]]) -> None:
+    """Create the installations with one ``POST /v1/installations/`` each.
+
+    Args:
+        client (TestClient): The client.
+        items (List[Dict[str, Any]]): The installations.
+    """
+    for item in items:
+        assert client.post("/v1/installations/", json=item).status_code == 201
+
+def post_bulk(client: TestClient, items: List[Dict[str, Any]]) -> None:
+    """Create the installations with a single ``POST /v1/installations/bulk``.
+
+    Args:
+        client (TestClient): The client.
+        items (List[Dict[str, Any]]): The installations.
+    """
+    response = client.post("/v1/installations/bulk", json=items)
+    assert response.status_code == 200 and not response.json()["conflicts"]
+
+def measure(client: TestClient, create: Callable[[TestClient, List[Dict[str, Any]]], None], items: List[Dict[str, Any]], repeats: int) -> float:
+    """Get the median throughput of a creation path, deleting the rows between runs.
+
+    Args:
+        client (TestClient): The client.
+        create (Callable[[TestClient, List[Dict[str, Any]]], None]): The creation path.
+        items (List[Dict[str, Any]]): The installations created by each run.
+        repeats (int): The number of timed runs.
+
+    Returns:
+        float: The median number of rows created per second.
+    """
+    rates = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        create(client, items)
+        rates.append(len(items) / (time.perf_counter() - start))
+        for item in items:
+            assert client.delete(f"/v1/installations/{item['id']}").status_code == 204
+    return statistics.median(rates)
+
+def main(count: int = 1000, repeats: int = 5) -> None:
+    """Print the median throughput of both paths for `count` rows.
+
+    Args:
+        count (int): The number of rows per run. Defaults to 1000.
+        repeats (int): The number of timed runs per path. Defaults to 5.
+    """
+    items = make_items(count)
+    with TestClient(app) as client:
+        results = {create.__name__: measure(client, create, items, repeats) for create in (post_single, post_bulk)}
+    for name, rate in results.items():
+        print(f"{name:>11}: {rate:10.0f} rows/s")
+    print(f"    speedup: {results['post_bulk'] / results['post_single']:10.1f}x")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
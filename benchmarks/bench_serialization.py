@@ -0,0 +1,96 @@
+"""Compare the validated and trusted response paths of a list endpoint.
+
+Run from the repository root, no database needed:
+
+    python -m benchmarks.bench_serialization [rows] [repeats]
+
+Each path builds the models from synthetic rows shaped like the ``installation``
+table and serves them through a FastAPI route, as the installations list does.
+"""
+import os
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.installation import Installation
+from serialization import from_row, json_response
+
+def make_rows(count: int) -> List[Dict[str, Any]]:
+    """Build synthetic installation rows, as asyncpg would return them.
+
+    Args:
+        count (int): The number of rows.
+
+    Returns:
+        List[Dict[str, Any]]: The rows.
+    """
+    start = date(2020, 1, 1)
+    return [{
+        "id": i,
+        "name": f"Installation {i}",
+        "description": f"Description of installation {i}",
+        "product_id": i % 500 + 1,
+        "customer_id": i % 2000 + 1,
+        "installation_date": start + timedelta(days=i % 1500)} for i in range(1, count + 1)]
+
+def make_app(rows: List[Dict[str, Any]]) -> FastAPI:
+    """Build an application serving the rows through both paths.
+
+    Args:
+        rows (List[Dict[str, Any]]): The rows to serve.
+
+    Returns:
+        FastAPI: The application.
+    """
+    app = FastAPI()
+
+    @app.get("/validated", response_model=List[Installation])
+    async def validated() -> List[Installation]:
+        return [Installation(**row) for row in rows]
+
+    @app.get("/trusted", response_model=List[Installation])
+    async def trusted() -> List[Installation]:
+        return json_response([from_row(Installation, row) for row in rows])
+
+    return app
+
+def measure(call: Callable[[], Any], repeats: int) -> float:
+    """Get the median duration of a call.
+
+    Args:
+        call (Callable[[], Any]): The call to time.
+        repeats (int): The number of timed calls.
+
+    Returns:
+        float: The median duration in milliseconds.
+    """
+    call()
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        call()
+        durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations)
+
+def main(count: int = 10000, repeats: int = 20) -> None:
+    """Print the median time of both paths for `count` rows.
+
+    Args:
+        count (int): The number of rows per response. Defaults to 10000.
+        repeats (int): The number of timed requests per path. Defaults to 20.
+    """
+    client = TestClient(make_app(make_rows(count)))
+    assert client.get("/validated").json() == client.get("/trusted").json()
+    results = {path: measure(lambda: client.get(f"/{path}"), repeats) for path in ("validated", "trusted")}
+    for path, duration in results.items():
+        print(f"{path:>9}: {duration:8.1f} ms per {count} rows")
+    print(f"  speedup: {results['validated'] / results['trusted']:8.1f}x")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,356 @@
+"""Fill the five tables with synthetic data at a given scale factor.
+
+Run from the repository root against the database of the .env file:
+
+    python -m benchmarks.generate_data SCALE [--workers N] [--seed S] [--replace]
+
+A scale factor of 1 adds 100000 customers, 1000 products and 1000000
+installations to the seed rows of ``data/init.sql``, besides 200 countries and
+100 product categories; 100 builds a 100M-installation dataset. Generated IDs
+start at ``GENERATED_ID_START``, so the seed rows the tests rely on are kept.
+
+The data is skewed like real traffic: customers cluster in a few countries, a
+few customers own most installations, product popularity follows a Zipf law,
+and installation dates follow the seasons, weekdays and a yearly growth.
+
+Rows are generated in worker processes, each streaming its chunk through a
+binary ``COPY``. The secondary indexes and foreign keys of the three large
+tables are dropped for the load, then rebuilt in parallel and validated with a
+single scan each, which is much faster than maintaining them row by row.
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from typing import Any, Iterator, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncpg
+from dependencies import DATABASE_URL
+from crud.analytics import ANALYTICS_VIEWS, SET_REFRESH
+
+# First ID of the generated rows of every table, above the seed rows and below the load test rows
+GENERATED_ID_START = 100000
+# Rows generated per scale factor; countries and categories do not grow with the scale
+COUNTRIES = 200
+CATEGORIES = 100
+CUSTOMERS_PER_SCALE = 100000
+PRODUCTS_PER_SCALE = 1000
+INSTALLATIONS_PER_SCALE = 1000000
+# Rows sent by each COPY, the unit of work of a worker process
+CHUNK_ROWS = 1000000
+# Memory of each index build, overridable from the .env file
+GENERATE_MAINTENANCE_WORK_MEM = os.getenv("GENERATE_MAINTENANCE_WORK_MEM", "512MB")
+
+# Zipf exponents: the larger, the more a few rows dominate
+COUNTRY_SKEW = 1.2
+CATEGORY_SKEW = 0.8
+CUSTOMER_SKEW = 0.8
+PRODUCT_SKEW = 1.0
+
+REGIONS = ["Europe", "Asia", "Africa", "America"]
+REGION_WEIGHTS = [4, 3, 1, 2]
+# Relative installations of each month, January first: busy spring and autumn, quiet summer and December
+SEASONS = [0.7, 0.8, 1.1, 1.2, 1.2, 1.0, 0.6, 0.5, 1.1, 1.2, 1.1, 0.6]
+FIRST_DAY = date(2015, 1, 1)
+LAST_DAY = date(2024, 12, 31)
+# Yearly growth of the installations and relative installations on weekends
+YEARLY_GROWTH = 0.15
+WEEKEND_WEIGHT = 0.35
+PREMIUM_SHARE = 0.1
+
+TABLE_COLUMNS = {
+    "country": ("id", "name", "region"),
+    "product_category": ("id", "name"),
+    "customer": ("id", "name", "email", "country_id", "premium_customer"),
+    "product": ("id", "reference", "name", "category_id", "price"),
+    "installation": ("id", "name", "description", "product_id", "customer_id", "installation_date"),
+}
+# Tables loaded by the worker processes, without their secondary indexes and foreign keys
+LARGE_TABLES = ["customer", "product", "installation"]
+
+class Zipf:
+    """Draw IDs of a range with probabilities following a Zipf law.
+
+    The rank is drawn by inverting the continuous approximation of the law, so no
+    table of weights is kept, then scattered over the range by a multiplicative
+    permutation so the popular rows are not all next to each other.
+
+    Attributes:
+        first_id (int): The first ID of the range.
+        count (int): The number of IDs.
+        skew (float): The exponent of the law.
+    """
+    def __init__(self, first_id: int, count: int, skew: float) -> None:
+        """Initialize the distribution.
+
+        Args:
+            first_id (int): The first ID of the range.
+            count (int): The number of IDs.
+            skew (float): The exponent of the law, 0 for uniform.
+        """
+        self.first_id = first_id
+        self.count = count
+        self.skew = skew
+        self._stride = 2654435761 % count or 1
+        while math.gcd(self._stride, count) != 1:
+            self._stride += 1
+
+    def draw(self, rng: random.Random) -> int:
+        """Draw an ID.
+
+        Args:
+            rng (random.Random): The random generator.
+
+        Returns:
+            int: The ID, the rank 0 being the most likely.
+        """
+        u = rng.random()
+        if self.skew == 1:
+            rank = int((self.count + 1) ** u) - 1
+        else:
+            exponent = 1 - self.skew
+            rank = int((((self.count + 1) ** exponent - 1) * u + 1) ** (1 / exponent)) - 1
+        return self.first_id + (min(rank, self.count - 1) * self._stride) % self.count
+
+def seasonal_days() -> Tuple[List[date], List[float]]:
+    """Get every day of the installation period with its cumulative weight.
+
+    Returns:
+        Tuple[List[date], List[float]]: The days and their cumulative weights, for `random.Random.choices`.
+    """
+    days, cumulative_weights, total = [], [], 0.0
+    day = FIRST_DAY
+    while day <= LAST_DAY:
+        total += (1 + YEARLY_GROWTH * (day.year - FIRST_DAY.year)) * SEASONS[day.month - 1] * (WEEKEND_WEIGHT if day.weekday() >= 5 else 1)
+        days.append(day)
+        cumulative_weights.append(total)
+        day += timedelta(days=1)
+    return days, cumulative_weights
+
+class Plan:
+    """Row counts and ID ranges of a generated dataset, shared with the worker processes.
+
+    Attributes:
+        counts (Dict[str, int]): The number of generated rows of each table.
+        seed (int): The seed of the random generators.
+    """
+    def __init__(self, scale: float, seed: int) -> None:
+        """Initialize the plan.
+
+        Args:
+            scale (float): The scale factor.
+            seed (int): The seed of the random generators.
+        """
+        self.counts = {
+            "country": COUNTRIES,
+            "product_category": CATEGORIES,
+            "customer": max(1, round(CUSTOMERS_PER_SCALE * scale)),
+            "product": max(1, round(PRODUCTS_PER_SCALE * scale)),
+            "installation": max(1, round(INSTALLATIONS_PER_SCALE * scale)),
+        }
+        self.seed = seed
+
+    def chunks(self, table: str) -> Iterator[Tuple[int, int]]:
+        """Split the rows of a table into COPY chunks.
+
+        Args:
+            table (str): The table.
+
+        Yields:
+            Tuple[int, int]: The first ID and the number of rows of each chunk.
+        """
+        count = self.counts[table]
+        for offset in range(0, count, CHUNK_ROWS):
+            yield GENERATED_ID_START + offset, min(CHUNK_ROWS, count - offset)
+
+    def rows(self, table: str, first_id: int, count: int) -> Iterator[Tuple[Any, ...]]:
+        """Generate the rows of a chunk, the same ones whatever the worker that generates them.
+
+        Args:
+            table (str): The table.
+            first_id (int): The ID of the first row.
+            count (int): The number of rows.
+
+        Yields:
+            Tuple[Any, ...]: The values of each row, in the order of `TABLE_COLUMNS`.
+        """
+        rng = random.Random(f"{self.seed}-{table}-{first_id}")
+        ids = range(first_id, first_id + count)
+        if table == "country":
+            for row_id in ids:
+                yield row_id, f"Country {row_id}", rng.choices(REGIONS, REGION_WEIGHTS)[0]
+        elif table == "product_category":
+            for row_id in ids:
+                yield row_id, f"Category {row_id}"
+        elif table == "customer":
+            countries = Zipf(GENERATED_ID_START, self.counts["country"], COUNTRY_SKEW)
+            for row_id in ids:
+                yield row_id, f"Customer {row_id}", f"customer{row_id}@example.com", countries.draw(rng), "yes" if rng.random() < PREMIUM_SHARE else "no"
+        elif table == "product":
+            categories = Zipf(GENERATED_ID_START, self.counts["product_category"], CATEGORY_SKEW)
+            for row_id in ids:
+                yield row_id, f"Prd-{row_id}", f"Product {row_id}", categories.draw(rng), str(math.ceil(rng.lognormvariate(4, 1)))
+        else:
+            products = Zipf(GENERATED_ID_START, self.counts["product"], PRODUCT_SKEW)
+            customers = Zipf(GENERATED_ID_START, self.counts["customer"], CUSTOMER_SKEW)
+            days, cumulative_weights = seasonal_days()
+            for row_id, day in zip(ids, rng.choices(days, cum_weights=cumulative_weights, k=count)):
+                product_id = products.draw(rng)
+                customer_id = customers.draw(rng)
+                yield row_id, f"Installation {row_id}", f"Product {product_id} installed for customer {customer_id}", product_id, customer_id, day
+
+async def connect() -> asyncpg.Connection:
+    """Open a connection tuned for bulk loading.
+
+    Returns:
+        asyncpg.Connection: The connection.
+    """
+    return await asyncpg.connect(DATABASE_URL, server_settings={"synchronous_commit": "off", "maintenance_work_mem": GENERATE_MAINTENANCE_WORK_MEM})
+
+async def copy_chunk(plan: Plan, table: str, first_id: int, count: int) -> int:
+    """Generate a chunk of rows and stream it into its table.
+
+    Args:
+        plan (Plan): The plan of the dataset.
+        table (str): The table.
+        first_id (int): The ID of the first row.
+        count (int): The number of rows.
+
+    Returns:
+        int: The number of rows copied.
+    """
+    connection = await connect()
+    try:
+        await connection.copy_records_to_table(table, records=plan.rows(table, first_id, count), columns=TABLE_COLUMNS[table])
+    finally:
+        await connection.close()
+    return count
+
+def load_chunk(plan: Plan, table: str, first_id: int, count: int) -> Tuple[str, int]:
+    """Run `copy_chunk` in a worker process.
+
+    Args:
+        plan (Plan): The plan of the dataset.
+        table (str): The table.
+        first_id (int): The ID of the first row.
+        count (int): The number of rows.
+
+    Returns:
+        Tuple[str, int]: The table and the number of rows copied.
+    """
+    return table, asyncio.run(copy_chunk(plan, table, first_id, count))
+
+async def drop_constraints(connection: asyncpg.Connection) -> Tuple[List[str], List[Tuple[str, str, str]]]:
+    """Drop the secondary indexes and foreign keys of the large tables, remembering their definitions.
+
+    Args:
+        connection (asyncpg.Connection): The connection.
+
+    Returns:
+        Tuple[List[str], List[Tuple[str, str, str]]]: The ``CREATE INDEX`` statements, and the table, name and definition of each foreign key.
+    """
+    indexes = await connection.fetch(
+        "SELECT indexrelid::regclass::text AS name, pg_get_indexdef(indexrelid) AS definition FROM pg_index "
+        "WHERE indrelid = ANY($1::regclass[]) AND NOT indisprimary", LARGE_TABLES)
+    foreign_keys = await connection.fetch(
+        "SELECT conrelid::regclass::text AS table_name, conname AS name, pg_get_constraintdef(oid) AS definition FROM pg_constraint "
+        "WHERE conrelid = ANY($1::regclass[]) AND contype = 'f'", LARGE_TABLES)
+    async with connection.transaction():
+        for foreign_key in foreign_keys:
+            await connection.execute(f"ALTER TABLE {foreign_key['table_name']} DROP CONSTRAINT {foreign_key['name']}")
+        for index in indexes:
+            await connection.execute(f"DROP INDEX {index['name']}")
+    return [index["definition"] for index in indexes], [(key["table_name"], key["name"], key["definition"]) for key in foreign_keys]
+
+async def restore_constraints(indexes: List[str], foreign_keys: List[Tuple[str, str, str]]) -> None:
+    """Build the dropped indexes in parallel, then add back and validate the foreign keys.
+
+    Args:
+        indexes (List[str]): The ``CREATE INDEX`` statements.
+        foreign_keys (List[Tuple[str, str, str]]): The table, name and definition of each foreign key.
+    """
+    async def run(statement: str) -> None:
+        connection = await connect()
+        try:
+            await connection.execute(statement)
+        finally:
+            await connection.close()
+
+    await asyncio.gather(*(run(definition) for definition in indexes))
+    # NOT VALID skips the row by row check, VALIDATE then checks every row with a single join
+    await asyncio.gather(*(run(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition} NOT VALID") for table, name, definition in foreign_keys))
+    await asyncio.gather(*(run(f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}") for table, name, _ in foreign_keys))
+
+async def delete_generated(connection: asyncpg.Connection, replace: bool) -> None:
+    """Delete the rows of a previous generation, or refuse to mix with them.
+
+    Args:
+        connection (asyncpg.Connection): The connection.
+        replace (bool): Whether the previous rows may be deleted.
+
+    Raises:
+        SystemExit: If generated rows exist and `replace` is False.
+    """
+    if not await connection.fetchval("SELECT EXISTS (SELECT 1 FROM country WHERE id >= $1)", GENERATED_ID_START):
+        return
+    if not replace:
+        raise SystemExit("The database already holds generated rows, pass --replace to delete them first")
+    for table in reversed(TABLE_COLUMNS):
+        result = await connection.execute(f"DELETE FROM {table} WHERE id >= $1", GENERATED_ID_START)
+        print(f"{table}: {result.split()[-1]} generated rows deleted")
+
+async def main(scale: float, workers: int, seed: int, replace: bool) -> None:
+    """Generate and load a dataset.
+
+    Args:
+        scale (float): The scale factor.
+        workers (int): The number of worker processes.
+        seed (int): The seed of the random generators.
+        replace (bool): Whether the rows of a previous generation may be deleted.
+    """
+    plan = Plan(scale, seed)
+    start = time.perf_counter()
+    connection = await connect()
+    try:
+        await delete_generated(connection, replace)
+        for table in ("country", "product_category"):
+            await connection.copy_records_to_table(table, records=plan.rows(table, GENERATED_ID_START, plan.counts[table]), columns=TABLE_COLUMNS[table])
+        indexes, foreign_keys = await drop_constraints(connection)
+        try:
+            loaded = {table: 0 for table in LARGE_TABLES}
+            loop = asyncio.get_running_loop()
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [loop.run_in_executor(executor, load_chunk, plan, table, first_id, count) for table in LARGE_TABLES for first_id, count in plan.chunks(table)]
+                for future in asyncio.as_completed(futures):
+                    table, count = await future
+                    loaded[table] += count
+                    total = sum(loaded.values())
+                    print(f"{table}: {loaded[table]}/{plan.counts[table]} rows, {total / (time.perf_counter() - start):,.0f} rows/s overall")
+            print(f"Loaded in {time.perf_counter() - start:.0f} s, rebuilding {len(indexes)} indexes and {len(foreign_keys)} foreign keys")
+        finally:
+            await restore_constraints(indexes, foreign_keys)
+        for table in TABLE_COLUMNS:
+            await connection.execute(f"ANALYZE {table}")
+        for view in ANALYTICS_VIEWS:
+            # A plain refresh rewrites the view at once, faster than a concurrent one on a fresh load
+            await connection.execute(f"REFRESH MATERIALIZED VIEW {view}")
+            await SET_REFRESH.fetchrow(connection, view)
+    finally:
+        await connection.close()
+    print(f"Done in {time.perf_counter() - start:.0f} s: " + ", ".join(f"{count} {table}" for table, count in plan.counts.items()))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill the database with synthetic data.")
+    parser.add_argument("scale", type=float, help="Scale factor, 1 for 1M installations.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes, defaults to the CPU count.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random generators.")
+    parser.add_argument("--replace", action="store_true", help="Delete the rows of a previous generation first.")
+    args = parser.parse_args()
+    asyncio.run(main(args.scale, args.workers, args.seed, args.replace))
@@ -0,0 +1,13 @@
+"""End-to-end load test of the API over HTTP.
+
+Run from the repository root against a running API, seeded with ``data/init.sql``:
+
+    python -m benchmarks.loadtest [--base-url URL] [--scenario NAME] [--duration S] [--concurrency N]
+
+Each scenario (``read_heavy``, ``write_heavy``, ``mixed`` and ``hot_key``) drives
+every route of ``endpoints/`` with a closed loop of virtual users, then reports the
+throughput and the p50/p95/p99 latencies, overall and per route, to a JSON file.
+When a baseline is stored, the run fails if it regressed beyond the tolerance.
+Rows created by the run get IDs from ``LOADTEST_ID_START`` onward and are deleted
+at the end, as are those left behind by an interrupted run.
+"""
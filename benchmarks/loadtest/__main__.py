@@ -0,0 +1,116 @@
+"""Command line of the load test, see the package docstring."""
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import httpx
+from fastapi.routing import APIRoute
+from benchmarks.loadtest.report import compare, load, save
+from benchmarks.loadtest.runner import delete_leftovers, discover, run_scenario
+from benchmarks.loadtest.scenarios import SCENARIOS, covered_routes
+
+# Stored results the runs are compared with, refreshed with --save-baseline
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+def uncovered_routes() -> List[str]:
+    """List the routes of the API that no scenario exercises.
+
+    The admin routes and ``/metrics`` are left out: they serve operators, not clients.
+
+    Returns:
+        List[str]: The method and path template of each uncovered route.
+    """
+    from main import app
+    routes = {
+        f"{method} {route.path}"
+        for route in app.routes
+        if isinstance(route, APIRoute) and route.include_in_schema and not route.path.startswith("/v1/admin/")
+        for method in route.methods
+    }
+    return sorted(routes - covered_routes())
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the selected scenarios one after the other.
+
+    Args:
+        args (argparse.Namespace): The parsed command line.
+
+    Returns:
+        Dict[str, Any]: The settings of the run and the summary of each scenario.
+    """
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        leftovers = await delete_leftovers(client)
+        if leftovers:
+            print(f"Deleted {leftovers} rows left by a previous run")
+        dataset = await discover(client)
+        results: Dict[str, Any] = {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "base_url": args.base_url,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "scenarios": {},
+        }
+        for name in args.scenario or list(SCENARIOS):
+            scenario = SCENARIOS[name]
+            print(f"{name}: {scenario.description}")
+            summary = await run_scenario(client, scenario, dataset, args.duration, args.concurrency, args.warmup, args.seed)
+            results["scenarios"][name] = summary
+            print(f"{name}: {summary['throughput']:.1f} requests/s, p50 {summary['p50_ms']:.2f} ms, p95 {summary['p95_ms']:.2f} ms, "
+                  f"p99 {summary['p99_ms']:.2f} ms, {summary['errors']} errors out of {summary['requests']}")
+    return results
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the load test, save its results and compare them with the baseline.
+
+    Args:
+        argv (Optional[List[str]]): The command line arguments. Defaults to None, for sys.argv.
+
+    Raises:
+        SystemExit: If a route is not covered by any scenario, or if the run regressed against the baseline.
+    """
+    parser = argparse.ArgumentParser(description="Load test every route of the API.")
+    parser.add_argument("--base-url", default="http://localhost:8000", help="URL of the running API.")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="Scenario to run, may be repeated. Defaults to all of them.")
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds per scenario.")
+    parser.add_argument("--warmup", type=float, default=5, help="Seconds run before measuring.")
+    parser.add_argument("--concurrency", type=int, default=32, help="Number of virtual users.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random generators.")
+    parser.add_argument("--timeout", type=float, default=30, help="Seconds before a request fails.")
+    parser.add_argument("--output", default="loadtest_results.json", help="JSON file receiving the results.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="JSON file of the baseline results.")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline instead of comparing.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Accepted relative change before a regression is reported.")
+    args = parser.parse_args(argv)
+
+    uncovered = uncovered_routes()
+    if uncovered:
+        raise SystemExit("No scenario covers " + ", ".join(uncovered))
+
+    results = asyncio.run(run(args))
+    save(results, args.output)
+    print(f"Results written to {args.output}")
+    if args.save_baseline:
+        save(results, args.baseline)
+        print(f"Baseline written to {args.baseline}")
+        return
+    baseline = load(args.baseline)
+    if baseline is None:
+        print(f"No baseline at {args.baseline}, store one with --save-baseline")
+        return
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"Regression: {regression}")
+    if regressions:
+        raise SystemExit(1)
+    print(f"No regression beyond {args.tolerance:.0%} of the baseline")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Latency samples of a load test run, their summary and the comparison with a baseline."""
+import json
+import math
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+# Operations with fewer samples than this, in the run or the baseline, are too noisy to compare
+MIN_COMPARED_SAMPLES = 100
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    """Get a percentile with the nearest-rank method.
+
+    Args:
+        sorted_values (List[float]): The values, in increasing order.
+        percent (float): The percentile, between 0 and 100.
+
+    Returns:
+        float: The smallest value greater than or equal to `percent` % of the values, 0.0 if there is none.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def summarize(latencies: List[float], errors: int, duration: float) -> Dict[str, Any]:
+    """Summarize the requests of one route or of a whole scenario.
+
+    Args:
+        latencies (List[float]): The latency of each request, in seconds.
+        errors (int): The number of requests that failed or got an unexpected status.
+        duration (float): The measured seconds.
+
+    Returns:
+        Dict[str, Any]: The request and error counts, the throughput in requests per second and the latencies in milliseconds.
+    """
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "throughput": len(values) / duration if duration else 0.0,
+        "mean_ms": sum(values) * 1000 / len(values) if values else 0.0,
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+    }
+
+class Recorder:
+    """Latencies and errors of the requests of a scenario, by route.
+
+    Nothing is kept until `start` is called, so the warm-up requests are left out.
+
+    Attributes:
+        recording (bool): Whether requests are currently recorded.
+        statuses (Dict[str, Dict[str, int]]): The count of each response status by route, ``error`` for transport failures.
+    """
+    def __init__(self) -> None:
+        """Initialize an empty recorder."""
+        self.recording = False
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._latencies: Dict[str, List[float]] = defaultdict(list)
+        self._errors: Dict[str, int] = defaultdict(int)
+
+    def start(self) -> None:
+        """Start recording."""
+        self.recording = True
+
+    def add(self, route: str, latency: float, status: Optional[int], ok: bool) -> None:
+        """Record a request.
+
+        Args:
+            route (str): The method and path template of the route.
+            latency (float): The latency in seconds.
+            status (Optional[int]): The response status, or None if the request failed.
+            ok (bool): Whether the status was the expected one.
+        """
+        if not self.recording:
+            return
+        self._latencies[route].append(latency)
+        self.statuses[route]["error" if status is None else str(status)] += 1
+        if not ok:
+            self._errors[route] += 1
+
+    def summary(self, duration: float) -> Dict[str, Any]:
+        """Summarize the recorded requests.
+
+        Args:
+            duration (float): The measured seconds.
+
+        Returns:
+            Dict[str, Any]: The totals of the scenario, with the summary and statuses of each route under ``operations``.
+        """
+        every_latency = [latency for latencies in self._latencies.values() for latency in latencies]
+        result = summarize(every_latency, sum(self._errors.values()), duration)
+        result["operations"] = {
+            route: {**summarize(latencies, self._errors[route], duration), "statuses": dict(self.statuses[route])}
+            for route, latencies in sorted(self._latencies.items())
+        }
+        return result
+
+def _regressions(label: str, current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    found = []
+    if current["throughput"] < baseline["throughput"] * (1 - tolerance):
+        found.append(f"{label}: throughput {current['throughput']:.1f}/s, baseline {baseline['throughput']:.1f}/s")
+    for key in ("p95_ms", "p99_ms"):
+        if current[key] > baseline[key] * (1 + tolerance):
+            found.append(f"{label}: {key[:3]} {current[key]:.2f} ms, baseline {baseline[key]:.2f} ms")
+    error_rate = current["errors"] / current["requests"] if current["requests"] else 0.0
+    baseline_error_rate = baseline["errors"] / baseline["requests"] if baseline["requests"] else 0.0
+    if error_rate > baseline_error_rate + 0.01:
+        found.append(f"{label}: {error_rate:.1%} errors, baseline {baseline_error_rate:.1%}")
+    return found
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """List the regressions of a run against a baseline run.
+
+    A scenario regresses when its throughput drops, or its p95 or p99 latency grows,
+    by more than `tolerance`, or when its error rate grows by more than one point.
+    The latencies of each route are compared too once both runs have
+    `MIN_COMPARED_SAMPLES` requests of it. Scenarios missing from either run are skipped.
+
+    Args:
+        results (Dict[str, Any]): The results of the run.
+        baseline (Dict[str, Any]): The results of the baseline run.
+        tolerance (float): The accepted relative change, for instance 0.2 for 20 %.
+
+    Returns:
+        List[str]: A description of each regression, empty if there is none.
+    """
+    found = []
+    for name, scenario in results["scenarios"].items():
+        reference = baseline["scenarios"].get(name)
+        if reference is None:
+            continue
+        found += _regressions(name, scenario, reference, tolerance)
+        for route, operation in scenario["operations"].items():
+            reference_operation = reference["operations"].get(route)
+            if reference_operation is None or min(operation["requests"], reference_operation["requests"]) < MIN_COMPARED_SAMPLES:
+                continue
+            for key in ("p95_ms", "p99_ms"):
+                if operation[key] > reference_operation[key] * (1 + tolerance):
+                    found.append(f"{name} {route}: {key[:3]} {operation[key]:.2f} ms, baseline {reference_operation[key]:.2f} ms")
+    return found
+
+def load(path: str) -> Optional[Dict[str, Any]]:
+    """Read the results of a previous run.
+
+    Args:
+        path (str): The JSON file.
+
+    Returns:
+        Optional[Dict[str, Any]]: The results, or None if the file does not exist.
+    """
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+def save(results: Dict[str, Any], path: str) -> None:
+    """Write the results of a run.
+
+    Args:
+        results (Dict[str, Any]): The results.
+        path (str): The JSON file.
+    """
+    with open(path, "w") as file:
+        json.dump(results, file, indent=2)
+        file.write("\n")
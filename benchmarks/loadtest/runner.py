@@ -0,0 +1,87 @@
+"""Closed-loop load generator: a fixed number of virtual users, each sending its next request as soon as the previous one answers."""
+import asyncio
+import random
+import httpx
+from benchmarks.loadtest.report import Recorder
+from benchmarks.loadtest.scenarios import ID_START, RESOURCES, Dataset, Scenario, Session
+from pagination import MAX_PAGE_SIZE, encode_cursor
+from typing import Any, Dict
+
+async def delete_leftovers(client: httpx.AsyncClient) -> int:
+    """Delete the rows an interrupted run left behind, the referencing tables first.
+
+    Args:
+        client (httpx.AsyncClient): The HTTP client.
+
+    Returns:
+        int: The number of rows deleted.
+    """
+    deleted = 0
+    for resource in reversed(RESOURCES):
+        cursor = encode_cursor(ID_START - 1)
+        while cursor:
+            response = await client.get(resource.path, params={"limit": MAX_PAGE_SIZE, "cursor": cursor})
+            response.raise_for_status()
+            for row in response.json():
+                await client.delete(f"{resource.path}{row['id']}")
+                deleted += 1
+            cursor = response.headers.get("X-Next-Cursor")
+    return deleted
+
+async def discover(client: httpx.AsyncClient) -> Dataset:
+    """Read the IDs of the first rows of each table, which the scenarios read and reference.
+
+    Args:
+        client (httpx.AsyncClient): The HTTP client.
+
+    Raises:
+        SystemExit: If a table is empty.
+
+    Returns:
+        Dataset: The dataset of the run.
+    """
+    seeded = {}
+    for resource in RESOURCES:
+        response = await client.get(resource.path, params={"limit": MAX_PAGE_SIZE})
+        response.raise_for_status()
+        seeded[resource.name] = [row["id"] for row in response.json() if row["id"] < ID_START]
+        if not seeded[resource.name]:
+            raise SystemExit(f"No {resource.name} found, seed the database with data/init.sql first")
+    return Dataset(seeded)
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, dataset: Dataset, duration: float, concurrency: int, warmup: float, seed: int) -> Dict[str, Any]:
+    """Run a scenario, then delete the rows it created.
+
+    Args:
+        client (httpx.AsyncClient): The HTTP client.
+        scenario (Scenario): The scenario.
+        dataset (Dataset): The dataset of the run.
+        duration (float): The measured seconds.
+        concurrency (int): The number of virtual users.
+        warmup (float): The seconds run before measuring, to fill the pools, caches and prepared statements.
+        seed (int): The seed of the random generators, so runs send the same requests.
+
+    Returns:
+        Dict[str, Any]: The summary of the measured requests, see `Recorder.summary`.
+    """
+    loop = asyncio.get_running_loop()
+    recorder = Recorder()
+    setup = Session(client, recorder, dataset, random.Random(seed))
+    sessions = [Session(client, recorder, dataset, random.Random(seed + index + 1)) for index in range(concurrency)]
+    try:
+        if scenario.hot:
+            await setup.create_hot_rows()
+        measured_from = loop.time() + warmup
+        end = measured_from + duration
+
+        async def drive(session: Session) -> None:
+            while loop.time() < end:
+                if not recorder.recording and loop.time() >= measured_from:
+                    recorder.start()
+                await scenario.pick(session.rng).run(session)
+
+        await asyncio.gather(*(drive(session) for session in sessions))
+        return recorder.summary(loop.time() - measured_from)
+    finally:
+        for session in [*sessions, setup]:
+            await session.cleanup()
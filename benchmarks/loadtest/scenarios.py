@@ -0,0 +1,510 @@
+"""Operations of the load test, one or more per route of ``endpoints/``, and the scenarios weighting them."""
+import csv
+import io
+import os
+import random
+import time
+from datetime import date, timedelta
+import httpx
+from benchmarks.loadtest.report import Recorder
+from pagination import encode_cursor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+# First ID of the rows created by the load test, overridable from the environment
+ID_START = int(os.getenv("LOADTEST_ID_START", "1000000000"))
+# Number of rows sent by each bulk and import request
+BATCH_SIZE = 10
+
+REGIONS = ["Europe", "Asia", "Africa", "America"]
+
+class Dataset:
+    """IDs shared by the virtual users of a run.
+
+    Attributes:
+        seeded (Dict[str, List[int]]): The IDs found before the run, by resource. Reads and foreign keys only use these rows, which no user deletes.
+        hot (Dict[str, int]): The row of each resource updated by every user of the ``hot_key`` scenario.
+    """
+    def __init__(self, seeded: Dict[str, List[int]], id_start: int = ID_START) -> None:
+        """Initialize the dataset.
+
+        Args:
+            seeded (Dict[str, List[int]]): The IDs found before the run, by resource.
+            id_start (int): The first ID given to a created row. Defaults to ID_START.
+        """
+        self.seeded = seeded
+        self.hot: Dict[str, int] = {}
+        self._next_id = id_start
+
+    def new_id(self) -> int:
+        """Get an ID no row has yet.
+
+        Returns:
+            int: The ID.
+        """
+        self._next_id += 1
+        return self._next_id
+
+class Resource:
+    """Table served under ``/v1/<name>/``, with the payloads the load test sends to it.
+
+    Attributes:
+        name (str): The path segment of the table, such as ``customers``.
+        path (str): The path of the list and create routes.
+        id_param (str): The name of the ID parameter of the single-row routes.
+        build (Callable[[int, Session], Dict[str, Any]]): Builds a full row with the given ID.
+        patch (Callable[[int, Session], Dict[str, Any]]): Builds a partial update of the row with the given ID.
+        importable (bool): Whether the table has a CSV import route.
+        list_params (Optional[Callable[[Session], Dict[str, Any]]]): Builds extra query parameters of the list route, such as filters.
+        get_params (Optional[Callable[[Session], Dict[str, Any]]]): Builds query parameters of the single-row route.
+    """
+    def __init__(
+        self,
+        name: str,
+        id_param: str,
+        build: Callable[[int, "Session"], Dict[str, Any]],
+        patch: Callable[[int, "Session"], Dict[str, Any]],
+        importable: bool = False,
+        list_params: Optional[Callable[["Session"], Dict[str, Any]]] = None,
+        get_params: Optional[Callable[["Session"], Dict[str, Any]]] = None,
+    ) -> None:
+        """Initialize the resource.
+
+        Args:
+            name (str): The path segment of the table.
+            id_param (str): The name of the ID parameter of the single-row routes.
+            build (Callable[[int, Session], Dict[str, Any]]): Builds a full row with the given ID.
+            patch (Callable[[int, Session], Dict[str, Any]]): Builds a partial update of the row with the given ID.
+            importable (bool): Whether the table has a CSV import route. Defaults to False.
+            list_params (Optional[Callable[[Session], Dict[str, Any]]]): Builds extra query parameters of the list route. Defaults to None.
+            get_params (Optional[Callable[[Session], Dict[str, Any]]]): Builds query parameters of the single-row route. Defaults to None.
+        """
+        self.name = name
+        self.path = f"/v1/{name}/"
+        self.id_param = id_param
+        self.build = build
+        self.patch = patch
+        self.importable = importable
+        self.list_params = list_params
+        self.get_params = get_params
+
+    def route(self, method: str, suffix: str = "") -> str:
+        """Get the name of a route of the resource, as reported in the results.
+
+        Args:
+            method (str): The HTTP method.
+            suffix (str): The path after the list path, such as ``bulk``. Defaults to "".
+
+        Returns:
+            str: The method and path template, such as ``GET /v1/customers/{customer_id}``.
+        """
+        return f"{method} {self.path}{suffix}"
+
+    def row_route(self, method: str) -> str:
+        """Get the name of a single-row route of the resource.
+
+        Args:
+            method (str): The HTTP method.
+
+        Returns:
+            str: The method and path template.
+        """
+        return self.route(method, f"{{{self.id_param}}}")
+
+class Session:
+    """Virtual user of a scenario, with the rows it created.
+
+    Each user only updates and deletes its own rows, so concurrent users never
+    race for a row, except for the shared rows of the ``hot_key`` scenario.
+
+    Attributes:
+        client (httpx.AsyncClient): The HTTP client, shared by all users.
+        recorder (Recorder): The recorder of the scenario.
+        dataset (Dataset): The IDs shared by all users.
+        rng (random.Random): The random generator of the user.
+        owned (Dict[str, List[int]]): The IDs of the rows created by the user, by resource.
+    """
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, dataset: Dataset, rng: random.Random) -> None:
+        """Initialize the user.
+
+        Args:
+            client (httpx.AsyncClient): The HTTP client.
+            recorder (Recorder): The recorder of the scenario.
+            dataset (Dataset): The IDs shared by all users.
+            rng (random.Random): The random generator of the user.
+        """
+        self.client = client
+        self.recorder = recorder
+        self.dataset = dataset
+        self.rng = rng
+        self.owned: Dict[str, List[int]] = {resource.name: [] for resource in RESOURCES}
+
+    def seeded(self, resource: str) -> int:
+        """Pick a row that existed before the run.
+
+        Args:
+            resource (str): The name of the resource.
+
+        Returns:
+            int: The ID of the row.
+        """
+        return self.rng.choice(self.dataset.seeded[resource])
+
+    async def call(self, route: str, url: str, expected: int, **kwargs: Any) -> Optional[httpx.Response]:
+        """Send a request and record its latency under its route.
+
+        Args:
+            route (str): The method and path template of the route.
+            url (str): The path of the request.
+            expected (int): The status of a successful response.
+            **kwargs (Any): The other arguments of `httpx.AsyncClient.request`.
+
+        Returns:
+            Optional[httpx.Response]: The response, or None if the request failed.
+        """
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(route.split(" ", 1)[0], url, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.add(route, time.perf_counter() - start, None, False)
+            return None
+        self.recorder.add(route, time.perf_counter() - start, response.status_code, response.status_code == expected)
+        return response
+
+    async def own_row(self, resource: Resource) -> Optional[int]:
+        """Get a row created by the user, creating one if needed.
+
+        Args:
+            resource (Resource): The resource.
+
+        Returns:
+            Optional[int]: The ID of the row, or None if it could not be created.
+        """
+        if not self.owned[resource.name]:
+            await create_row(resource).run(self)
+        return self.owned[resource.name][-1] if self.owned[resource.name] else None
+
+    async def create_hot_rows(self) -> None:
+        """Create the rows shared by every user of the ``hot_key`` scenario."""
+        for resource in RESOURCES:
+            row_id = await self.own_row(resource)
+            if row_id is None:
+                raise SystemExit(f"Could not create the hot row of {resource.name}")
+            self.dataset.hot[resource.name] = row_id
+
+    async def cleanup(self) -> None:
+        """Delete the rows created by the user, the referencing tables first."""
+        for resource in reversed(RESOURCES):
+            for row_id in self.owned[resource.name]:
+                await self.client.delete(f"{resource.path}{row_id}")
+            self.owned[resource.name].clear()
+
+class Operation:
+    """Request, or short sequence of requests, sent by a virtual user.
+
+    Attributes:
+        route (str): The method and path template of the route it exercises.
+        kind (str): ``read`` or ``write``.
+        run (Callable[[Session], Awaitable[None]]): Sends the request for a user.
+    """
+    def __init__(self, route: str, kind: str, run: Callable[[Session], Awaitable[None]]) -> None:
+        """Initialize the operation.
+
+        Args:
+            route (str): The method and path template of the route.
+            kind (str): ``read`` or ``write``.
+            run (Callable[[Session], Awaitable[None]]): Sends the request for a user.
+        """
+        self.route = route
+        self.kind = kind
+        self.run = run
+
+def list_rows(resource: Resource) -> Operation:
+    """Read a page, from the start or after a random row.
+
+    Args:
+        resource (Resource): The resource.
+
+    Returns:
+        Operation: The operation.
+    """
+    async def run(session: Session) -> None:
+        params: Dict[str, Any] = {"limit": 100}
+        if session.rng.random() < 0.5:
+            params["cursor"] = encode_cursor(session.seeded(resource.name) - 1)
+        if resource.list_params is not None:
+            params.update(resource.list_params(session))
+        await session.call(resource.route("GET"), resource.path, 200, params=params)
+    return Operation(resource.route("GET"), "read", run)
+
+def get_row(resource: Resource, hot: bool = False) -> Operation:
+    """Read one row, a random one or always the first when `hot`.
+
+    Args:
+        resource (Resource): The resource.
+        hot (bool): Whether every user reads the same row. Defaults to False.
+
+    Returns:
+        Operation: The operation.
+    """
+    async def run(session: Session) -> None:
+        row_id = session.dataset.seeded[resource.name][0] if hot else session.seeded(resource.name)
+        params = resource.get_params(session) if resource.get_params is not None else None
+        await session.call(resource.row_route("GET"), f"{resource.path}{row_id}", 200, params=params)
+    return Operation(resource.row_route("GET"), "read", run)
+
+def create_row(resource: Resource) -> Operation:
+    """Create one row.
+
+    Args:
+        resource (Resource): The resource.
+
+    Returns:
+        Operation: The operation.
+    """
+    async def run(session: Session) -> None:
+        row_id = session.dataset.new_id()
+        response = await session.call(resource.route("POST"), resource.path, 201, json=resource.build(row_id, session))
+        if response is not None and response.status_code == 201:
+            session.owned[resource.name].append(row_id)
+    return Operation(resource.route("POST"), "write", run)
+
+def create_rows(resource: Resource) -> Operation:
+    """Create `BATCH_SIZE` rows with the bulk route.
+
+    Args:
+        resource (Resource): The resource.
+
+    Returns:
+        Operation: The operation.
+    """
+    async def run(session: Session) -> None:
+        rows = [resource.build(session.dataset.new_id(), session) for _ in range(BATCH_SIZE)]
+        response = await session.call(resource.route("POST", "bulk"), f"{resource.path}bulk", 200, json=rows)
+        if response is not None and response.status_code == 200:
+            session.owned[resource.name] += [row["id"] for row in response.json()["created"]]
+    return Operation(resource.route("POST", "bulk"), "write", run)
+
+def import_rows(resource: Resource) -> Operation:
+    """Create `BATCH_SIZE` rows with the CSV import route.
+
+    Args:
+        resource (Resource): The resource.
+
+    Returns:
+        Operation: The operation.
+    """
+    async def run(session: Session) -> None:
+        rows = [resource.build(session.dataset.new_id(), session) for _ in range(BATCH_SIZE)]
+        body = io.StringIO()
+        writer = csv.DictWriter(body, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+        response = await session.call(resource.route("POST", "import"), f"{resource.path}import", 200, content=body.getvalue(), headers={"Content-Type": "text/csv"})
+        if response is not None and response.status_code == 200:
+            session.owned[resource.name] += [row["id"] for row in rows]
+    return Operation(resource.route("POST", "import"), "write", run)
+
+def replace_row(resource: Resource) -> Operation:
+    """Replace a row of the user.
+
+    Args:
+        resource (Resource): The resource.
+
+    Returns:
+        Operation: The operation.
+    """
+    async def run(session: Session) -> None:
+        row_id = await session.own_row(resource)
+        if row_id is not None:
+            await session.call(resource.row_route("PUT"), f"{resource.path}{row_id}", 200, json=resource.build(row_id, session))
+    return Operation(resource.row_route("PUT"), "write", run)
+
+def update_row(resource: Resource, hot: bool = False) -> Operation:
+    """Update one field of a row of the user, or of the shared hot row when `hot`.
+
+    Args:
+        resource (Resource): The resource.
+        hot (bool): Whether every user updates the same row. Defaults to False.
+
+    Returns:
+        Operation: The operation.
+    """
+    async def run(session: Session) -> None:
+        row_id = session.dataset.hot[resource.name] if hot else await session.own_row(resource)
+        if row_id is not None:
+            await session.call(resource.row_route("PATCH"), f"{resource.path}{row_id}", 200, json=resource.patch(row_id, session))
+    return Operation(resource.row_route("PATCH"), "write", run)
+
+def delete_row(resource: Resource) -> Operation:
+    """Delete the latest row of the user.
+
+    Args:
+        resource (Resource): The resource.
+
+    Returns:
+        Operation: The operation.
+    """
+    async def run(session: Session) -> None:
+        row_id = await session.own_row(resource)
+        if row_id is not None:
+            session.owned[resource.name].pop()
+            await session.call(resource.row_route("DELETE"), f"{resource.path}{row_id}", 204)
+    return Operation(resource.row_route("DELETE"), "write", run)
+
+def read_report(name: str) -> Operation:
+    """Read an analytics report.
+
+    Args:
+        name (str): The path segment of the report.
+
+    Returns:
+        Operation: The operation.
+    """
+    route = f"GET /v1/analytics/{name}"
+    async def run(session: Session) -> None:
+        await session.call(route, f"/v1/analytics/{name}", 200)
+    return Operation(route, "read", run)
+
+def _day(session: Session) -> str:
+    return (date(2020, 1, 1) + timedelta(days=session.rng.randrange(1500))).isoformat()
+
+def _installation_filters(session: Session) -> Dict[str, Any]:
+    variant = session.rng.randrange(4)
+    if variant == 0:
+        return {"customer_id": session.seeded("customers")}
+    if variant == 1:
+        return {"product_id": session.seeded("products")}
+    if variant == 2:
+        return {"expand": "customer.country,product.category"}
+    return {}
+
+def _installation_expand(session: Session) -> Dict[str, Any]:
+    return {"expand": "customer,product"} if session.rng.random() < 0.5 else {}
+
+# Tables in the order they can be filled: each only references the ones before it
+RESOURCES = [
+    Resource(
+        "countries", "country_id",
+        build=lambda row_id, session: {"id": row_id, "name": f"Country {row_id}", "region": session.rng.choice(REGIONS)},
+        patch=lambda row_id, session: {"region": session.rng.choice(REGIONS)}),
+    Resource(
+        "product_categories", "category_id",
+        build=lambda row_id, session: {"id": row_id, "name": f"Category {row_id}"},
+        patch=lambda row_id, session: {"name": f"Category {row_id}-{session.rng.randrange(1000)}"}),
+    Resource(
+        "customers", "customer_id",
+        build=lambda row_id, session: {
+            "id": row_id, "name": f"Customer {row_id}", "email": f"customer{row_id}@loadtest.com",
+            "country_id": session.seeded("countries"), "premium_customer": session.rng.choice(["yes", "no"])},
+        patch=lambda row_id, session: {"premium_customer": session.rng.choice(["yes", "no"])},
+        importable=True),
+    Resource(
+        "products", "product_id",
+        build=lambda row_id, session: {
+            "id": row_id, "reference": f"Prd-{row_id}", "name": f"Product {row_id}",
+            "category_id": session.seeded("product_categories"), "price": str(session.rng.randint(1, 999))},
+        patch=lambda row_id, session: {"price": str(session.rng.randint(1, 999))},
+        importable=True),
+    Resource(
+        "installations", "installation_id",
+        build=lambda row_id, session: {
+            "id": row_id, "name": f"Installation {row_id}", "description": f"Load test installation {row_id}",
+            "product_id": session.seeded("products"), "customer_id": session.seeded("customers"), "installation_date": _day(session)},
+        patch=lambda row_id, session: {"installation_date": _day(session)},
+        list_params=_installation_filters,
+        get_params=_installation_expand),
+]
+
+REPORTS = ["installations-by-category", "installations-by-country", "top-products-by-region"]
+
+def _operations() -> List[Operation]:
+    operations = []
+    for resource in RESOURCES:
+        operations += [list_rows(resource), get_row(resource), create_row(resource), create_rows(resource),
+                       replace_row(resource), update_row(resource), delete_row(resource)]
+        if resource.importable:
+            operations.append(import_rows(resource))
+    return operations + [read_report(name) for name in REPORTS]
+
+# Every operation of the load test, at least one per route of endpoints/
+OPERATIONS = _operations()
+
+class Scenario:
+    """Weighted mix of operations run by every virtual user.
+
+    Attributes:
+        name (str): The name of the scenario.
+        description (str): What the scenario stresses.
+        hot (bool): Whether the shared hot rows must be created before it runs.
+    """
+    def __init__(self, name: str, description: str, operations: List[Tuple[Operation, float]], hot: bool = False) -> None:
+        """Initialize the scenario.
+
+        Args:
+            name (str): The name of the scenario.
+            description (str): What the scenario stresses.
+            operations (List[Tuple[Operation, float]]): Each operation with its relative weight.
+            hot (bool): Whether the shared hot rows must be created before it runs. Defaults to False.
+        """
+        self.name = name
+        self.description = description
+        self.hot = hot
+        self._operations = [operation for operation, _ in operations]
+        self._cumulative_weights = []
+        total = 0.0
+        for _, weight in operations:
+            total += weight
+            self._cumulative_weights.append(total)
+
+    def pick(self, rng: random.Random) -> Operation:
+        """Draw the next operation of a user.
+
+        Args:
+            rng (random.Random): The random generator of the user.
+
+        Returns:
+            Operation: The operation.
+        """
+        return rng.choices(self._operations, cum_weights=self._cumulative_weights)[0]
+
+    def routes(self) -> Set[str]:
+        """Get the routes the scenario exercises.
+
+        Returns:
+            Set[str]: The method and path template of each route.
+        """
+        return {operation.route for operation in self._operations}
+
+def mix(name: str, description: str, read_share: float) -> Scenario:
+    """Build a scenario running every operation, reads taking `read_share` of the requests.
+
+    Args:
+        name (str): The name of the scenario.
+        description (str): What the scenario stresses.
+        read_share (float): The share of reads, between 0 and 1.
+
+    Returns:
+        Scenario: The scenario.
+    """
+    reads = [operation for operation in OPERATIONS if operation.kind == "read"]
+    writes = [operation for operation in OPERATIONS if operation.kind == "write"]
+    return Scenario(name, description, [(operation, read_share / len(reads)) for operation in reads] + [(operation, (1 - read_share) / len(writes)) for operation in writes])
+
+SCENARIOS = {scenario.name: scenario for scenario in [
+    mix("read_heavy", "95 % reads spread over every row: pagination, filters, expand, by-id batching, analytics.", 0.95),
+    mix("write_heavy", "80 % writes: single, bulk and CSV inserts, updates and deletes.", 0.2),
+    mix("mixed", "Even split of reads and writes over every route.", 0.5),
+    Scenario(
+        "hot_key",
+        "Every user reads the same row of each table and updates one shared row, stressing row locks, the loaders and the caches.",
+        [(get_row(resource, hot=True), 0.9) for resource in RESOURCES] + [(update_row(resource, hot=True), 0.1) for resource in RESOURCES],
+        hot=True),
+]}
+
+def covered_routes() -> Set[str]:
+    """Get the routes exercised by at least one scenario.
+
+    Returns:
+        Set[str]: The method and path template of each route.
+    """
+    return set().union(*(scenario.routes() for scenario in SCENARIOS.values()))
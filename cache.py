@@ -0,0 +1,189 @@
+import asyncio
+import bisect
+import logging
+from asyncpg import Connection, Pool
+from fastapi import Response
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional, Type, Union
+from dependencies import connect_db
+from crud.statements import register
+from serialization import from_row
+
+logger = logging.getLogger(__name__)
+
+# Channel notified by the triggers of data/init.sql, with the table name as payload
+REFERENCE_CHANNEL = "reference_change"
+
+class ReferenceCache:
+    """In-memory copy of a small reference table.
+
+    Rows are kept as models and as pre-encoded JSON, so reads need neither a database
+    round trip nor serialization. The copy is reloaded on the first read after an
+    invalidation, which happens on local writes and on every ``NOTIFY`` of the table.
+
+    Attributes:
+        table (str): The cached table.
+        model (Type[BaseModel]): The model of a row.
+        listening (bool): Whether invalidations from other processes are received.
+        primary (Optional[Pool]): The pool the cache is reloaded from, so that a lagging replica is never cached.
+    """
+    def __init__(self, table: str, model: Type[BaseModel], primary: Optional[Pool] = None) -> None:
+        """Initialize an empty cache.
+
+        Args:
+            table (str): The table to cache.
+            model (Type[BaseModel]): The model of a row.
+            primary (Optional[Pool]): The pool of the primary, or None to reload from the handle of the read. Defaults to None.
+        """
+        self.table = table
+        self.model = model
+        self.primary = primary
+        self.listening = False
+        self._items: Dict[int, BaseModel] = {}
+        self._encoded: Dict[int, bytes] = {}
+        self._ids: List[int] = []
+        self._generation = 0
+        self._loaded_generation = -1
+        self._lock = asyncio.Lock()
+        columns = ", ".join(model.model_fields)
+        self._load = register(f"ReferenceCache.load_{table}", f"SELECT {columns} FROM {table} ORDER BY id")
+
+    def invalidate(self) -> None:
+        """Mark the cached rows as outdated."""
+        self._generation += 1
+
+    async def load(self, db: Connection) -> None:
+        """Read the whole table into the cache.
+
+        Args:
+            db (Connection): The database handle.
+        """
+        generation = self._generation
+        rows = await self._load.fetch(db)
+        items = {row["id"]: from_row(self.model, row) for row in rows}
+        self._items = items
+        self._encoded = {row_id: item.model_dump_json().encode() for row_id, item in items.items()}
+        self._ids = list(items)
+        self._loaded_generation = generation
+
+    def _outdated(self) -> bool:
+        return not self.listening or self._loaded_generation != self._generation
+
+    async def _fresh(self, db: Connection) -> None:
+        if self._outdated():
+            async with self._lock:
+                if self._outdated():
+                    await self.load(self.primary or db)
+
+    async def get(self, db: Connection, row_id: int) -> Optional[BaseModel]:
+        """Get a row by its ID.
+
+        Args:
+            db (Connection): The database handle, used only to reload an outdated cache.
+            row_id (int): The ID of the row.
+
+        Returns:
+            Optional[BaseModel]: The row or None if not found.
+        """
+        await self._fresh(db)
+        return self._items.get(row_id)
+
+    async def page(self, db: Connection, limit: int, after_id: Optional[int] = None) -> List[BaseModel]:
+        """Get a page of rows ordered by ID.
+
+        Args:
+            db (Connection): The database handle, used only to reload an outdated cache.
+            limit (int): The maximum number of rows to return.
+            after_id (Optional[int]): Only return rows with a greater ID. Defaults to None.
+
+        Returns:
+            List[BaseModel]: A list of rows.
+        """
+        await self._fresh(db)
+        start = 0 if after_id is None else bisect.bisect_right(self._ids, after_id)
+        return [self._items[row_id] for row_id in self._ids[start:start + limit]]
+
+    def response(self, content: Union[BaseModel, List[BaseModel]], response: Optional[Response] = None) -> Response:
+        """Build a JSON response from the pre-encoded rows.
+
+        Args:
+            content (Union[BaseModel, List[BaseModel]]): A row or a list of rows read from this cache.
+            response (Optional[Response]): The response whose headers are kept. Defaults to None.
+
+        Returns:
+            Response: The JSON response.
+        """
+        if isinstance(content, list):
+            body = b"[" + b",".join(self._encoded[item.id] for item in content) + b"]"
+        else:
+            body = self._encoded[content.id]
+        headers = dict(response.headers) if response is not None else None
+        return Response(content=body, media_type="application/json", headers=headers)
+
+class CacheListener:
+    """Dedicated connection invalidating reference caches on ``NOTIFY``.
+
+    When the connection is lost, the caches stop trusting their copy (every read
+    reloads it) until a new connection listens again.
+    """
+    def __init__(self, caches: Dict[str, ReferenceCache], retry_delay: float = 1.0) -> None:
+        """Initialize the listener.
+
+        Args:
+            caches (Dict[str, ReferenceCache]): The caches by table name.
+            retry_delay (float): Seconds between reconnection attempts. Defaults to 1.0.
+        """
+        self.caches = caches
+        self.retry_delay = retry_delay
+        self._connection: Optional[Connection] = None
+        self._reconnect: Optional[asyncio.Task] = None
+        self._closed = False
+
+    async def start(self) -> None:
+        """Open the listening connection."""
+        self._connection = await connect_db()
+        self._connection.add_termination_listener(self._on_termination)
+        await self._connection.add_listener(REFERENCE_CHANNEL, self._on_notify)
+        for cache in self.caches.values():
+            cache.invalidate()
+            cache.listening = True
+
+    async def stop(self) -> None:
+        """Close the listening connection."""
+        self._closed = True
+        if self._reconnect is not None:
+            self._reconnect.cancel()
+        if self._connection is not None and not self._connection.is_closed():
+            await self._connection.close()
+
+    def _on_notify(self, connection: Connection, pid: int, channel: str, payload: str) -> None:
+        cache = self.caches.get(payload)
+        if cache is not None:
+            cache.invalidate()
+
+    def _on_termination(self, connection: Connection) -> None:
+        for cache in self.caches.values():
+            cache.listening = False
+        if not self._closed:
+            self._reconnect = asyncio.get_running_loop().create_task(self._reconnect_loop())
+
+    async def _reconnect_loop(self) -> None:
+        while not self._closed:
+            await asyncio.sleep(self.retry_delay)
+            try:
+                await self.start()
+                return
+            except Exception as error:
+                logger.warning("Reference cache listener reconnection failed: %s", error)
+
+def get_cache(state: Any, table: str) -> Optional[ReferenceCache]:
+    """Get the cache of a table created by the application lifespan.
+
+    Args:
+        state (Any): The application state.
+        table (str): The cached table.
+
+    Returns:
+        Optional[ReferenceCache]: The cache, or None when the lifespan has not run.
+    """
+    return getattr(state, "caches", {}).get(table)
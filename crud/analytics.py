@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import os
+from asyncpg import Connection
+from models.analytics import AnalyticsRefresh, AnalyticsReport, CategoryMonthCount, CountryMonthCount, RegionProductRank
+from crud.statements import register, timed
+from serialization import from_row
+from dependencies import acquire_connection
+from typing import List, Optional
+from datetime import date
+
+logger = logging.getLogger(__name__)
+
+# Seconds after which an analytics view is refreshed, overridable from the .env file
+ANALYTICS_REFRESH_SECONDS = float(os.getenv("ANALYTICS_REFRESH_SECONDS", "300"))
+
+# Materialized views of data/init.sql, each with a unique index so it can be refreshed concurrently
+ANALYTICS_VIEWS = ("installations_by_category_month", "installations_by_country_month", "top_products_by_region")
+
+# Advisory lock key making sure a single API process refreshes the views at a time
+ANALYTICS_LOCK_KEY = 4_242_001
+
+GET_INSTALLATIONS_BY_CATEGORY = register("AnalyticsCRUD.get_installations_by_category", """
+    SELECT month, category_id, category_name, installations
+    FROM installations_by_category_month
+    WHERE ($1::date IS NULL OR month >= $1) AND ($2::date IS NULL OR month <= $2)
+    ORDER BY month, category_id
+    """)
+GET_INSTALLATIONS_BY_COUNTRY = register("AnalyticsCRUD.get_installations_by_country", """
+    SELECT month, country_id, country_name, region, installations
+    FROM installations_by_country_month
+    WHERE ($1::date IS NULL OR month >= $1) AND ($2::date IS NULL OR month <= $2) AND ($3::varchar IS NULL OR region = $3)
+    ORDER BY month, country_id
+    """)
+GET_TOP_PRODUCTS_BY_REGION = register("AnalyticsCRUD.get_top_products_by_region", """
+    SELECT region, rank, product_id, product_name, installations
+    FROM top_products_by_region
+    WHERE rank <= $1 AND ($2::varchar IS NULL OR region = $2)
+    ORDER BY region, rank
+    """)
+GET_REFRESH = register("AnalyticsCRUD.get_refresh", """
+    SELECT refreshed_at, extract(epoch FROM now() - refreshed_at)::float8 AS age_seconds
+    FROM analytics_refresh
+    WHERE view_name = $1
+    """)
+SET_REFRESH = register("AnalyticsCRUD.set_refresh", """
+    INSERT INTO analytics_refresh (view_name, refreshed_at)
+    VALUES ($1, now())
+    ON CONFLICT (view_name) DO UPDATE SET refreshed_at = excluded.refreshed_at
+    RETURNING view_name AS view, refreshed_at
+    """)
+
+class AnalyticsCRUD:
+    """Read operations on the analytics views, and their refresh.
+
+    Attributes:
+        db (Connection): The database connection.
+    """
+    def __init__(self, db: Connection) -> None:
+        """Initialize the CRUD instance.
+
+        Args:
+            db (Connection): The database connection.
+        """
+        self.db = db
+
+    async def _report(self, view: str, rows: list) -> AnalyticsReport:
+        refresh = await GET_REFRESH.fetchrow(self.db, view)
+        return from_row(AnalyticsReport, {
+            "view": view,
+            "refreshed_at": refresh["refreshed_at"] if refresh else None,
+            "refresh_interval": ANALYTICS_REFRESH_SECONDS,
+            "rows": rows})
+
+    async def get_installations_by_category(self, month_from: Optional[date] = None, month_to: Optional[date] = None) -> AnalyticsReport[CategoryMonthCount]:
+        """Get the installations per month and product category.
+
+        Args:
+            month_from (Optional[date]): Only months starting on or after this date. Defaults to None.
+            month_to (Optional[date]): Only months starting on or before this date. Defaults to None.
+
+        Returns:
+            AnalyticsReport[CategoryMonthCount]: The counts, ordered by month, and their staleness.
+        """
+        rows = await GET_INSTALLATIONS_BY_CATEGORY.fetch(self.db, month_from, month_to)
+        return await self._report("installations_by_category_month", [from_row(CategoryMonthCount, row) for row in rows])
+
+    async def get_installations_by_country(self, month_from: Optional[date] = None, month_to: Optional[date] = None, region: Optional[str] = None) -> AnalyticsReport[CountryMonthCount]:
+        """Get the installations per month and customer country.
+
+        Args:
+            month_from (Optional[date]): Only months starting on or after this date. Defaults to None.
+            month_to (Optional[date]): Only months starting on or before this date. Defaults to None.
+            region (Optional[str]): Only countries of this region. Defaults to None.
+
+        Returns:
+            AnalyticsReport[CountryMonthCount]: The counts, ordered by month, and their staleness.
+        """
+        rows = await GET_INSTALLATIONS_BY_COUNTRY.fetch(self.db, month_from, month_to, region)
+        return await self._report("installations_by_country_month", [from_row(CountryMonthCount, row) for row in rows])
+
+    async def get_top_products_by_region(self, limit: int, region: Optional[str] = None) -> AnalyticsReport[RegionProductRank]:
+        """Get the most installed products of each customer region.
+
+        Args:
+            limit (int): The number of products per region.
+            region (Optional[str]): Only this region. Defaults to None.
+
+        Returns:
+            AnalyticsReport[RegionProductRank]: The ranked products, ordered by region and rank, and their staleness.
+        """
+        rows = await GET_TOP_PRODUCTS_BY_REGION.fetch(self.db, limit, region)
+        return await self._report("top_products_by_region", [from_row(RegionProductRank, row) for row in rows])
+
+    async def refresh_views(self, max_age: Optional[float] = None) -> Optional[List[AnalyticsRefresh]]:
+        """Refresh the analytics views concurrently, so reads are never blocked.
+
+        A session advisory lock keeps the other API processes from refreshing at
+        the same time; they skip the refresh instead of waiting.
+
+        Args:
+            max_age (Optional[float]): Only refresh the views older than this many seconds, or all if None. Defaults to None.
+
+        Returns:
+            Optional[List[AnalyticsRefresh]]: The refreshed views, or None if another process holds the lock.
+        """
+        async with acquire_connection(self.db) as connection:
+            if not await connection.fetchval("SELECT pg_try_advisory_lock($1)", ANALYTICS_LOCK_KEY):
+                return None
+            try:
+                refreshed = []
+                for view in ANALYTICS_VIEWS:
+                    if max_age is not None:
+                        refresh = await GET_REFRESH.fetchrow(connection, view)
+                        if refresh is not None and refresh["age_seconds"] < max_age:
+                            continue
+                    refresh_sql = f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view}"
+                    async with timed(f"AnalyticsCRUD.refresh_{view}", refresh_sql, self.db):
+                        await connection.execute(refresh_sql)
+                    refreshed.append(from_row(AnalyticsRefresh, await SET_REFRESH.fetchrow(connection, view)))
+                return refreshed
+            finally:
+                await connection.fetchval("SELECT pg_advisory_unlock($1)", ANALYTICS_LOCK_KEY)
+
+class AnalyticsRefresher:
+    """Background task refreshing the analytics views once they are `interval` seconds old.
+
+    Every API process runs one; the age of the views is checked twice per interval,
+    and the advisory lock of `AnalyticsCRUD.refresh_views` lets a single one refresh.
+    """
+    def __init__(self, db: Connection, interval: float = ANALYTICS_REFRESH_SECONDS) -> None:
+        """Initialize the refresher.
+
+        Args:
+            db (Connection): The database handle, usually the pool.
+            interval (float): The maximum age of the views in seconds. Defaults to ANALYTICS_REFRESH_SECONDS.
+        """
+        self.db = db
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the background task."""
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self) -> None:
+        crud = AnalyticsCRUD(self.db)
+        while True:
+            try:
+                await crud.refresh_views(max_age=self.interval)
+            except Exception as error:
+                logger.warning("Analytics views refresh failed: %s", error)
+            await asyncio.sleep(self.interval / 2)
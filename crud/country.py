@@ -1,21 +1,35 @@
-from asyncpg.exceptions import UniqueViolationError
 from models.country import Country, CountryCreate, CountryUpdate
 from asyncpg import Connection
-from typing import List, Optional
+from storage.base import TableSpec
+from storage.tables import open_table, register_table, split_conflicts
+from serialization import from_row
+from cache import ReferenceCache
+from typing import List, Optional, Tuple
+
+TABLE = register_table(TableSpec("country", "CountryCRUD", "country", "countries", Country))
 
 class CountryCRUD:
     """CRUD operations for Country.
 
     Attributes:
-        db (Connection): The database connection.
+        db (Connection): The database connection, or the `storage.memory.MemoryStorage`.
+        table (TableStorage): The country table on the backend of `db`.
+        cache (Optional[ReferenceCache]): The in-memory copy of the table serving reads, if any.
     """
-    def __init__(self, db: Connection) -> None:
+    def __init__(self, db: Connection, cache: Optional[ReferenceCache] = None) -> None:
         """Initialize the CRUD instance.
 
         Args:
             db (Connection): The database connection.
+            cache (Optional[ReferenceCache]): The in-memory copy of the table. Defaults to None.
         """
         self.db = db
+        self.table = open_table(db, TABLE)
+        self.cache = cache
+
+    def _invalidate(self) -> None:
+        if self.cache is not None:
+            self.cache.invalidate()
 
     async def create_country(self, country: CountryCreate) -> Optional[Country]:
         """Create a new country.
@@ -24,28 +38,44 @@ class CountryCRUD:
             country (CountryCreate): The country data to create.
 
         Returns:
-            Optional[Country]: The created country or None if a UniqueViolationError occurs.
-        """
-        query = """
-        INSERT INTO country (id, name, region)
-        VALUES ($1, $2, $3)
-        RETURNING id, name, region
+            Optional[Country]: The created country or None if its ID already exists.
         """
-        try:
-            row = await self.db.fetchrow(query, country.id, country.name, country.region)
-            return Country(**row)
-        except UniqueViolationError:
+        row = await self.table.insert((country.id, country.name, country.region))
+        if not row:
             return None
+        self._invalidate()
+        return from_row(Country, row)
+
+    async def create_countries(self, countries: List[CountryCreate]) -> Tuple[List[Country], List[int]]:
+        """Create many countries in a single statement.
+
+        All rows are sent at once as column arrays and inserted in one transaction;
+        rows whose ID already exists are skipped instead of aborting the batch.
+
+        Args:
+            countries (List[CountryCreate]): The countries to create.
+
+        Returns:
+            Tuple[List[Country], List[int]]: The created countries and the IDs that already existed.
+        """
+        rows = await self.table.insert_many(([country.id for country in countries], [country.name for country in countries], [country.region for country in countries]))
+        self._invalidate()
+        return split_conflicts(Country, [country.id for country in countries], rows)
 
-    async def get_countries(self) -> List[Country]:
-        """Get all countries.
+    async def get_countries(self, limit: int, after_id: Optional[int] = None) -> List[Country]:
+        """Get a page of countries ordered by ID.
+
+        Args:
+            limit (int): The maximum number of countries to return.
+            after_id (Optional[int]): Only return countries with a greater ID. Defaults to None.
 
         Returns:
-            List[Country]: A list of all countries.
+            List[Country]: A list of countries.
         """
-        query = "SELECT id, name, region FROM country"
-        rows = await self.db.fetch(query)
-        return [Country(**row) for row in rows]
+        if self.cache is not None:
+            return await self.cache.page(self.db, limit, after_id)
+        rows = await self.table.page(limit, after_id)
+        return [from_row(Country, row) for row in rows]
 
     async def get_country(self, country_id: int) -> Optional[Country]:
         """Get a country by its ID.
@@ -56,11 +86,27 @@ class CountryCRUD:
         Returns:
             Optional[Country]: The country with the given ID or None if not found.
         """
-        query = "SELECT id, name, region FROM country WHERE id = $1"
-        row = await self.db.fetchrow(query, country_id)
+        if self.cache is not None:
+            return await self.cache.get(self.db, country_id)
+        row = await self.table.get(country_id)
         if not row:
             return None
-        return Country(**row)
+        return from_row(Country, row)
+
+    async def get_countries_by_ids(self, ids: List[int]) -> List[Country]:
+        """Get many countries by their IDs in a single query.
+
+        Args:
+            ids (List[int]): The IDs of the countries to retrieve.
+
+        Returns:
+            List[Country]: The countries found, in no particular order.
+        """
+        if self.cache is not None:
+            items = [await self.cache.get(self.db, row_id) for row_id in ids]
+            return [item for item in items if item is not None]
+        rows = await self.table.get_many(ids)
+        return [from_row(Country, row) for row in rows]
 
     async def delete_country(self, country_id: int) -> Optional[Country]:
         """Delete a country by its ID.
@@ -71,11 +117,11 @@ class CountryCRUD:
         Returns:
             Optional[Country]: The deleted country or None if not found.
         """
-        query = "DELETE FROM country WHERE id = $1 RETURNING id, name, region"
-        row = await self.db.fetchrow(query, country_id)
+        row = await self.table.delete(country_id)
+        self._invalidate()
         if not row:
             return None
-        return Country(**row)
+        return from_row(Country, row)
 
     async def update_country(self, country_id: int, country: CountryCreate) -> Optional[Country]:
         """Update a country by its ID.
@@ -87,20 +133,18 @@ class CountryCRUD:
         Returns:
             Optional[Country]: The updated country or None if not found.
         """
-        query = """
-        UPDATE country
-        SET name = $2, region = $3
-        WHERE id = $1
-        RETURNING id, name, region
-        """
-        row = await self.db.fetchrow(query, country_id, country.name, country.region)
+        row = await self.table.update(country_id, (country.name, country.region))
+        self._invalidate()
         if not row:
             return None
-        return Country(**row)
+        return from_row(Country, row)
 
     async def partial_update_country(self, country_id: int, country: CountryUpdate) -> Optional[Country]:
         """Partially update a country by its ID.
 
+        Only the fields sent by the client are written (null is refused by
+        `models.update.PartialUpdate`). On Postgres, each set of fields gets its own prepared statement.
+
         Args:
             country_id (int): The ID of the country to update.
             country (CountryUpdate): The partial data for the country.
@@ -108,13 +152,8 @@ class CountryCRUD:
         Returns:
             Optional[Country]: The updated country or None if not found.
         """
-        query = """
-        UPDATE country
-        SET name = COALESCE($2, name), region = COALESCE($3, region)
-        WHERE id = $1
-        RETURNING id, name, region
-        """
-        row = await self.db.fetchrow(query, country_id, country.name, country.region)
+        row = await self.table.patch(country_id, country.model_dump(exclude_unset=True))
+        self._invalidate()
         if not row:
             return None
-        return Country(**row)
\ No newline at end of file
+        return from_row(Country, row)
\ No newline at end of file
@@ -1,13 +1,20 @@
-from asyncpg.exceptions import UniqueViolationError
 from models.customer import Customer, CustomerCreate, CustomerUpdate
+from models.bulk import ImportResult
 from asyncpg import Connection
-from typing import List, Optional
+from storage.base import Row, TableSpec
+from storage.tables import open_table, register_table, split_conflicts
+from serialization import from_row
+from typing import AsyncIterator, List, Optional, Tuple
+
+TABLE = register_table(TableSpec("customer", "CustomerCRUD", "customer", "customers", Customer, foreign_keys={"country_id": "country"}, batched=True))
+COLUMNS = TABLE.columns
 
 class CustomerCRUD:
     """CRUD operations for Customer.
 
     Attributes:
-        db (Connection): The database connection.
+        db (Connection): The database connection, or the `storage.memory.MemoryStorage`.
+        table (TableStorage): The customer table on the backend of `db`.
     """
     def __init__(self, db: Connection) -> None:
         """Initialize the CRUD instance.
@@ -16,6 +23,7 @@ class CustomerCRUD:
             db (Connection): The database connection.
         """
         self.db = db
+        self.table = open_table(db, TABLE)
 
     async def create_customer(self, customer: CustomerCreate) -> Optional[Customer]:
         """Create a new customer.
@@ -24,43 +32,99 @@ class CustomerCRUD:
             customer (CustomerCreate): The customer data to create.
 
         Returns:
-            Optional[Customer]: The created customer or None if a UniqueViolationError occurs.
-        """
-        query = """
-        INSERT INTO customer (id, name, email, country_id, premium_customer)
-        VALUES ($1, $2, $3, $4, $5)
-        RETURNING id, name, email, country_id, premium_customer
+            Optional[Customer]: The created customer or None if its ID already exists.
         """
-        try:
-            row = await self.db.fetchrow(query, customer.id, customer.name, customer.email, customer.country_id, customer.premium_customer)
-            return Customer(**row)
-        except UniqueViolationError:
+        row = await self.table.insert((customer.id, customer.name, customer.email, customer.country_id, customer.premium_customer))
+        if not row:
             return None
+        return from_row(Customer, row)
+
+    async def create_customers(self, customers: List[CustomerCreate]) -> Tuple[List[Customer], List[int]]:
+        """Create many customers in a single statement.
+
+        All rows are sent at once as column arrays and inserted in one transaction;
+        rows whose ID already exists are skipped instead of aborting the batch.
+
+        Args:
+            customers (List[CustomerCreate]): The customers to create.
+
+        Returns:
+            Tuple[List[Customer], List[int]]: The created customers and the IDs that already existed.
+        """
+        rows = await self.table.insert_many(([customer.id for customer in customers], [customer.name for customer in customers], [customer.email for customer in customers], [customer.country_id for customer in customers], [customer.premium_customer for customer in customers]))
+        return split_conflicts(Customer, [customer.id for customer in customers], rows)
+
+    async def import_customers(self, columns: List[str], source: AsyncIterator[bytes]) -> ImportResult:
+        """Upsert customers streamed from a CSV file.
 
-    async def get_customers(self) -> List[Customer]:
-        """Get all customers.
+        Args:
+            columns (List[str]): The CSV columns, a subset of `COLUMNS` including ``id``.
+            source (AsyncIterator[bytes]): The CSV data without its header line.
+
+        Raises:
+            InvalidData: If a value does not fit its column.
 
         Returns:
-            List[Customer]: A list of all customers.
+            ImportResult: The row counts of the import.
         """
-        query = "SELECT id, name, email, country_id, premium_customer FROM customer"
-        rows = await self.db.fetch(query)
-        return [Customer(**row) for row in rows]
+        return await self.table.import_csv(columns, source)
+
+    async def get_customers(self, limit: int, after_id: Optional[int] = None) -> List[Customer]:
+        """Get a page of customers ordered by ID.
+
+        Args:
+            limit (int): The maximum number of customers to return.
+            after_id (Optional[int]): Only return customers with a greater ID. Defaults to None.
+
+        Returns:
+            List[Customer]: A list of customers.
+        """
+        rows = await self.table.page(limit, after_id)
+        return [from_row(Customer, row) for row in rows]
+
+    async def stream_customers(self, batch_size: int, after_id: Optional[int] = None) -> AsyncIterator[List[Row]]:
+        """Read customers ordered by ID, `batch_size` at a time.
+
+        On Postgres, the rows are read through a server-side cursor (see
+        `storage.postgres.PostgresTable.stream`), and only `batch_size` rows are held in memory at a time.
+
+        Args:
+            batch_size (int): The number of rows fetched per round trip.
+            after_id (Optional[int]): Only return customers with a greater ID. Defaults to None.
+
+        Yields:
+            List[Row]: The next batch of raw customer rows.
+        """
+        async for batch in self.table.stream(batch_size, after_id):
+            yield batch
 
     async def get_customer(self, customer_id: int) -> Optional[Customer]:
         """Get a customer by its ID.
 
+        On Postgres, concurrent lookups are batched into one query (see `crud.loader.BatchLoader`).
+
         Args:
             customer_id (int): The ID of the customer to retrieve.
 
         Returns:
             Optional[Customer]: The customer with the given ID or None if not found.
         """
-        query = "SELECT id, name, email, country_id, premium_customer FROM customer WHERE id = $1"
-        row = await self.db.fetchrow(query, customer_id)
+        row = await self.table.get(customer_id)
         if not row:
             return None
-        return Customer(**row)
+        return from_row(Customer, row)
+
+    async def get_customers_by_ids(self, ids: List[int]) -> List[Customer]:
+        """Get many customers by their IDs in a single query.
+
+        Args:
+            ids (List[int]): The IDs of the customers to retrieve.
+
+        Returns:
+            List[Customer]: The customers found, in no particular order.
+        """
+        rows = await self.table.get_many(ids)
+        return [from_row(Customer, row) for row in rows]
 
     async def delete_customer(self, customer_id: int) -> Optional[Customer]:
         """Delete a customer by its ID.
@@ -71,11 +135,10 @@ class CustomerCRUD:
         Returns:
             Optional[Customer]: The deleted customer or None if not found.
         """
-        query = "DELETE FROM customer WHERE id = $1 RETURNING id, name, email, country_id, premium_customer"
-        row = await self.db.fetchrow(query, customer_id)
+        row = await self.table.delete(customer_id)
         if not row:
             return None
-        return Customer(**row)
+        return from_row(Customer, row)
 
     async def update_customer(self, customer_id: int, customer: CustomerCreate) -> Optional[Customer]:
         """Update a customer by its ID.
@@ -87,20 +150,17 @@ class CustomerCRUD:
         Returns:
             Optional[Customer]: The updated customer or None if not found.
         """
-        query = """
-        UPDATE customer
-        SET name = $2, email = $3, country_id = $4, premium_customer = $5
-        WHERE id = $1
-        RETURNING id, name, email, country_id, premium_customer
-        """
-        row = await self.db.fetchrow(query, customer_id, customer.name, customer.email, customer.country_id, customer.premium_customer)
+        row = await self.table.update(customer_id, (customer.name, customer.email, customer.country_id, customer.premium_customer))
         if not row:
             return None
-        return Customer(**row)
+        return from_row(Customer, row)
 
     async def partial_update_customer(self, customer_id: int, customer: CustomerUpdate) -> Optional[Customer]:
         """Partially update a customer by its ID.
 
+        Only the fields sent by the client are written (null is refused by
+        `models.update.PartialUpdate`). On Postgres, each set of fields gets its own prepared statement.
+
         Args:
             customer_id (int): The ID of the customer to update.
             customer (CustomerUpdate): The partial data for the customer.
@@ -108,13 +168,7 @@ class CustomerCRUD:
         Returns:
             Optional[Customer]: The updated customer or None if not found.
         """
-        query = """
-        UPDATE customer
-        SET name = COALESCE($2, name), email = COALESCE($3, email), country_id = COALESCE($4, country_id), premium_customer = COALESCE($5, premium_customer)
-        WHERE id = $1
-        RETURNING id, name, email, country_id, premium_customer
-        """
-        row = await self.db.fetchrow(query, customer_id, customer.name, customer.email, customer.country_id, customer.premium_customer)
+        row = await self.table.patch(customer_id, customer.model_dump(exclude_unset=True))
         if not row:
             return None
-        return Customer(**row)
\ No newline at end of file
+        return from_row(Customer, row)
\ No newline at end of file
@@ -0,0 +1,71 @@
+from asyncpg import Connection
+from models.installation import Installation, InstallationExpanded
+from models.customer import CustomerExpanded
+from models.product import ProductExpanded
+from crud.customer import CustomerCRUD
+from crud.product import ProductCRUD
+from crud.country import CountryCRUD
+from crud.product_category import ProductCategoryCRUD
+from serialization import from_row
+from cache import ReferenceCache
+from typing import AbstractSet, List, Optional
+
+class InstallationExpander:
+    """Embed the related objects of installations.
+
+    Each related table is read once per list, whatever the number of installations,
+    with a single ``WHERE id = ANY($1)`` query (or from the reference caches).
+
+    Attributes:
+        customers (CustomerCRUD): Reads the customers.
+        products (ProductCRUD): Reads the products.
+        countries (CountryCRUD): Reads the countries of the customers.
+        categories (ProductCategoryCRUD): Reads the categories of the products.
+    """
+    def __init__(self, db: Connection, country_cache: Optional[ReferenceCache] = None, category_cache: Optional[ReferenceCache] = None) -> None:
+        """Initialize the expander.
+
+        Args:
+            db (Connection): The database connection.
+            country_cache (Optional[ReferenceCache]): The in-memory copy of the country table. Defaults to None.
+            category_cache (Optional[ReferenceCache]): The in-memory copy of the product category table. Defaults to None.
+        """
+        self.customers = CustomerCRUD(db)
+        self.products = ProductCRUD(db)
+        self.countries = CountryCRUD(db, country_cache)
+        self.categories = ProductCategoryCRUD(db, category_cache)
+
+    async def expand(self, installations: List[Installation], paths: AbstractSet[str]) -> List[InstallationExpanded]:
+        """Embed the requested related objects in installations.
+
+        Args:
+            installations (List[Installation]): The installations.
+            paths (AbstractSet[str]): The paths to expand, with their parents, such as ``{"customer", "customer.country"}``.
+
+        Returns:
+            List[InstallationExpanded]: The installations with their related objects.
+        """
+        customers, products = {}, {}
+        if "customer" in paths:
+            rows = await self.customers.get_customers_by_ids(list({installation.customer_id for installation in installations}))
+            if "customer.country" in paths:
+                countries = {country.id: country for country in await self.countries.get_countries_by_ids(list({customer.country_id for customer in rows}))}
+                customers = {customer.id: from_row(CustomerExpanded, {**customer.__dict__, "country": countries.get(customer.country_id)}) for customer in rows}
+            else:
+                customers = {customer.id: customer for customer in rows}
+        if "product" in paths:
+            rows = await self.products.get_products_by_ids(list({installation.product_id for installation in installations}))
+            if "product.category" in paths:
+                categories = {category.id: category for category in await self.categories.get_product_categories_by_ids(list({product.category_id for product in rows}))}
+                products = {product.id: from_row(ProductExpanded, {**product.__dict__, "category": categories.get(product.category_id)}) for product in rows}
+            else:
+                products = {product.id: product for product in rows}
+        expanded = []
+        for installation in installations:
+            values = dict(installation.__dict__)
+            if "customer" in paths:
+                values["customer"] = customers.get(installation.customer_id)
+            if "product" in paths:
+                values["product"] = products.get(installation.product_id)
+            expanded.append(from_row(InstallationExpanded, values))
+        return expanded
@@ -1,13 +1,39 @@
-from asyncpg.exceptions import UniqueViolationError
-from models.installation import Installation, InstallationCreate, InstallationUpdate
+from models.installation import Installation, InstallationCreate, InstallationFilter, InstallationUpdate
 from asyncpg import Connection
-from typing import List, Optional
+from storage.base import Row, TableSpec
+from storage.tables import open_table, register_table, split_conflicts
+from serialization import from_row, from_versioned_row
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+# Column and operator of the list filters, each served by an index of data/init.sql
+FILTERS = {
+    "customer_id": ("customer_id", "="),
+    "product_id": ("product_id", "="),
+    "installation_date_from": ("installation_date", ">="),
+    "installation_date_to": ("installation_date", "<="),
+}
+TABLE = register_table(TableSpec(
+    "installation", "InstallationCRUD", "installation", "installations", Installation,
+    foreign_keys={"product_id": "product", "customer_id": "customer"}, filters=FILTERS, batched=True, versioned=True,
+))
+
+def _applied(filters: Optional[InstallationFilter]) -> Dict[str, Any]:
+    """Collect the filters given a value.
+
+    Args:
+        filters (Optional[InstallationFilter]): The filters, if any.
+
+    Returns:
+        Dict[str, Any]: The value of each applied filter.
+    """
+    return {name: getattr(filters, name) for name in FILTERS if getattr(filters, name, None) is not None}
 
 class InstallationCRUD:
     """CRUD operations for Installation.
 
     Attributes:
-        db (Connection): The database connection.
+        db (Connection): The database connection, or the `storage.memory.MemoryStorage`.
+        table (TableStorage): The installation table on the backend of `db`.
     """
     def __init__(self, db: Connection) -> None:
         """Initialize the CRUD instance.
@@ -16,105 +42,144 @@ class InstallationCRUD:
             db (Connection): The database connection.
         """
         self.db = db
+        self.table = open_table(db, TABLE)
 
-    async def create_installation(self, installation: InstallationCreate) -> Optional[Installation]:
+    async def create_installation(self, installation: InstallationCreate) -> Optional[Tuple[Installation, int]]:
         """Create a new installation.
 
         Args:
             installation (InstallationCreate): The installation data to create.
 
         Returns:
-            Optional[Installation]: The created installation or None if a UniqueViolationError occurs.
-        """
-        query = """
-        INSERT INTO installation (id, name, description, product_id, customer_id, installation_date)
-        VALUES ($1, $2, $3, $4, $5, $6)
-        RETURNING id, name, description, product_id, customer_id, installation_date
+            Optional[Tuple[Installation, int]]: The created installation and its version, or None if its ID already exists.
         """
-        try:
-            row = await self.db.fetchrow(query, installation.id, installation.name, installation.description, installation.product_id, installation.customer_id, installation.installation_date)
-            return Installation(**row)
-        except UniqueViolationError:
+        row = await self.table.insert((installation.id, installation.name, installation.description, installation.product_id, installation.customer_id, installation.installation_date))
+        if not row:
             return None
+        return from_versioned_row(Installation, row)
+
+    async def create_installations(self, installations: List[InstallationCreate]) -> Tuple[List[Installation], List[int]]:
+        """Create many installations in a single statement.
+
+        All rows are sent at once as column arrays and inserted in one transaction;
+        rows whose ID already exists are skipped instead of aborting the batch.
+
+        Args:
+            installations (List[InstallationCreate]): The installations to create.
 
-    async def get_installations(self) -> List[Installation]:
-        """Get all installations.
+        Returns:
+            Tuple[List[Installation], List[int]]: The created installations and the IDs that already existed.
+        """
+        rows = await self.table.insert_many(([installation.id for installation in installations], [installation.name for installation in installations], [installation.description for installation in installations], [installation.product_id for installation in installations], [installation.customer_id for installation in installations], [installation.installation_date for installation in installations]))
+        return split_conflicts(Installation, [installation.id for installation in installations], rows)
+
+    async def get_installations(self, limit: int, after_id: Optional[int] = None, filters: Optional[InstallationFilter] = None) -> List[Installation]:
+        """Get a page of installations ordered by ID.
+
+        On Postgres, each combination of filters is registered as its own prepared statement.
+
+        Args:
+            limit (int): The maximum number of installations to return.
+            after_id (Optional[int]): Only return installations with a greater ID. Defaults to None.
+            filters (Optional[InstallationFilter]): Only return matching installations. Defaults to None.
 
         Returns:
-            List[Installation]: A list of all installations.
+            List[Installation]: A list of installations.
         """
-        query = "SELECT id, name, description, product_id, customer_id, installation_date FROM installation"
-        rows = await self.db.fetch(query)
-        return [Installation(**row) for row in rows]
+        rows = await self.table.page(limit, after_id, _applied(filters))
+        return [from_row(Installation, row) for row in rows]
+
+    async def stream_installations(self, batch_size: int, after_id: Optional[int] = None, filters: Optional[InstallationFilter] = None) -> AsyncIterator[List[Row]]:
+        """Read installations ordered by ID, `batch_size` at a time.
 
-    async def get_installation(self, installation_id: int) -> Optional[Installation]:
+        On Postgres, the rows are read through a server-side cursor (see
+        `storage.postgres.PostgresTable.stream`), and only `batch_size` rows are held in memory at a time.
+
+        Args:
+            batch_size (int): The number of rows fetched per round trip.
+            after_id (Optional[int]): Only return installations with a greater ID. Defaults to None.
+            filters (Optional[InstallationFilter]): Only return matching installations. Defaults to None.
+
+        Yields:
+            List[Row]: The next batch of raw installation rows.
+        """
+        async for batch in self.table.stream(batch_size, after_id, _applied(filters)):
+            yield batch
+
+    async def get_installation(self, installation_id: int) -> Optional[Tuple[Installation, int]]:
         """Get an installation by its ID.
 
+        On Postgres, concurrent lookups are batched into one query (see `crud.loader.BatchLoader`).
+
         Args:
             installation_id (int): The ID of the installation to retrieve.
 
         Returns:
-            Optional[Installation]: The installation with the given ID or None if not found.
+            Optional[Tuple[Installation, int]]: The installation with the given ID and its version, or None if not found.
         """
-        query = "SELECT id, name, description, product_id, customer_id, installation_date FROM installation WHERE id = $1"
-        row = await self.db.fetchrow(query, installation_id)
+        row = await self.table.get(installation_id)
         if not row:
             return None
-        return Installation(**row)
+        return from_versioned_row(Installation, row)
 
-    async def delete_installation(self, installation_id: int) -> Optional[Installation]:
+    async def delete_installation(self, installation_id: int, versions: Optional[List[int]] = None) -> Optional[Tuple[Installation, int]]:
         """Delete an installation by its ID.
 
         Args:
             installation_id (int): The ID of the installation to delete.
+            versions (Optional[List[int]]): Only delete the installation at one of these versions. Defaults to None, for any version.
+
+        Raises:
+            VersionConflict: If the installation is at another version.
 
         Returns:
-            Optional[Installation]: The deleted installation or None if not found.
+            Optional[Tuple[Installation, int]]: The deleted installation and its last version, or None if not found.
         """
-        query = "DELETE FROM installation WHERE id = $1 RETURNING id, name, description, product_id, customer_id, installation_date"
-        row = await self.db.fetchrow(query, installation_id)
+        row = await self.table.delete(installation_id, versions)
         if not row:
             return None
-        return Installation(**row)
+        return from_versioned_row(Installation, row)
 
-    async def update_installation(self, installation_id: int, installation: InstallationCreate) -> Optional[Installation]:
+    async def update_installation(self, installation_id: int, installation: InstallationCreate, versions: Optional[List[int]] = None) -> Optional[Tuple[Installation, int]]:
         """Update an installation by its ID.
 
+        With `versions`, the version check and the write are a single statement: a
+        version mismatch costs no extra round trip.
+
         Args:
             installation_id (int): The ID of the installation to update.
             installation (InstallationCreate): The new data for the installation.
+            versions (Optional[List[int]]): Only write the installation at one of these versions. Defaults to None, for any version.
+
+        Raises:
+            VersionConflict: If the installation is at another version.
 
         Returns:
-            Optional[Installation]: The updated installation or None if not found.
-        """
-        query = """
-        UPDATE installation
-        SET name = $2, description = $3, product_id = $4, customer_id = $5, installation_date = $6
-        WHERE id = $1
-        RETURNING id, name, description, product_id, customer_id, installation_date
+            Optional[Tuple[Installation, int]]: The updated installation and its new version, or None if not found.
         """
-        row = await self.db.fetchrow(query, installation_id, installation.name, installation.description, installation.product_id, installation.customer_id, installation.installation_date)
+        row = await self.table.update(installation_id, (installation.name, installation.description, installation.product_id, installation.customer_id, installation.installation_date), versions)
         if not row:
             return None
-        return Installation(**row)
+        return from_versioned_row(Installation, row)
 
-    async def partial_update_installation(self, installation_id: int, installation: InstallationUpdate) -> Optional[Installation]:
+    async def partial_update_installation(self, installation_id: int, installation: InstallationUpdate, versions: Optional[List[int]] = None) -> Optional[Tuple[Installation, int]]:
         """Partially update an installation by its ID.
 
+        Only the fields sent by the client are written (null is refused by
+        `models.update.PartialUpdate`). On Postgres, each set of fields gets its own prepared statement.
+
         Args:
             installation_id (int): The ID of the installation to update.
             installation (InstallationUpdate): The partial data for the installation.
+            versions (Optional[List[int]]): Only write the installation at one of these versions. Defaults to None, for any version.
+
+        Raises:
+            VersionConflict: If the installation is at another version.
 
         Returns:
-            Optional[Installation]: The updated installation or None if not found.
-        """
-        query = """
-        UPDATE installation
-        SET name = COALESCE($2, name), description = COALESCE($3, description), product_id = COALESCE($4, product_id), customer_id = COALESCE($5, customer_id), installation_date = COALESCE($6, installation_date)
-        WHERE id = $1
-        RETURNING id, name, description, product_id, customer_id, installation_date
+            Optional[Tuple[Installation, int]]: The updated installation and its new version, or None if not found.
         """
-        row = await self.db.fetchrow(query, installation_id, installation.name, installation.description, installation.product_id, installation.customer_id, installation.installation_date)
+        row = await self.table.patch(installation_id, installation.model_dump(exclude_unset=True), versions)
         if not row:
             return None
-        return Installation(**row)
\ No newline at end of file
+        return from_versioned_row(Installation, row)
\ No newline at end of file
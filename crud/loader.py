@@ -0,0 +1,126 @@
+import asyncio
+import os
+from asyncpg import Connection, Pool, Record
+from crud.statements import Statement
+from typing import Any, Dict, Hashable, List, Optional, Union
+
+# Milliseconds during which by-id lookups are collected into one query, overridable from the .env file
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "1"))
+# Maximum number of IDs sent in one query, a full batch is sent without waiting for the window
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "500"))
+
+class BatchLoader:
+    """Coalesce concurrent by-id lookups into a single ``WHERE id = ANY($1)`` query.
+
+    Lookups made on the same database handle within `window` seconds, typically the
+    pool shared by all requests, wait for one query whose rows are fanned back out.
+    The same ID asked twice in a batch is only sent once.
+
+    Attributes:
+        statement (Statement): The statement taking the array of IDs and returning rows with an ``id`` column.
+        window (float): The seconds lookups are collected for; 0 collects those of the same event loop iteration.
+        max_batch_size (int): The maximum number of IDs per query.
+        loads (int): The number of lookups.
+        batches (int): The number of queries sent.
+    """
+    def __init__(self, statement: Statement, window: float = BATCH_WINDOW_MS / 1000, max_batch_size: int = MAX_BATCH_SIZE) -> None:
+        """Initialize the loader.
+
+        Args:
+            statement (Statement): The statement taking the array of IDs.
+            window (float): The seconds lookups are collected for. Defaults to BATCH_WINDOW_MS / 1000.
+            max_batch_size (int): The maximum number of IDs per query. Defaults to MAX_BATCH_SIZE.
+        """
+        self.statement = statement
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.loads = 0
+        self.batches = 0
+        self._pending: Dict[Hashable, Dict[int, asyncio.Future]] = {}
+
+    async def load(self, db: Union[Pool, Connection], row_id: int) -> Optional[Record]:
+        """Get a row by its ID, batched with the other lookups of the window.
+
+        Args:
+            db (Union[Pool, Connection]): The handle yielded by `get_db`.
+            row_id (int): The ID of the row.
+
+        Returns:
+            Optional[Record]: The row or None if not found.
+        """
+        self.loads += 1
+        loop = asyncio.get_running_loop()
+        batch = self._pending.get(db)
+        if batch is None:
+            batch = self._pending[db] = {}
+            if self.window > 0:
+                loop.call_later(self.window, self._dispatch, db, batch)
+            else:
+                loop.call_soon(self._dispatch, db, batch)
+        future = batch.get(row_id)
+        if future is None:
+            future = batch[row_id] = loop.create_future()
+            if len(batch) >= self.max_batch_size:
+                self._dispatch(db, batch)
+        # A cancelled caller must not cancel the lookup shared with the others
+        return await asyncio.shield(future)
+
+    def _dispatch(self, db: Union[Pool, Connection], batch: Dict[int, asyncio.Future]) -> None:
+        if self._pending.get(db) is not batch:
+            # Already sent because it was full
+            return
+        del self._pending[db]
+        self.batches += 1
+        asyncio.get_running_loop().create_task(self._fetch(db, batch))
+
+    async def _fetch(self, db: Union[Pool, Connection], batch: Dict[int, asyncio.Future]) -> None:
+        try:
+            rows = await self.statement.fetch(db, list(batch))
+        except BaseException as error:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(error)
+            if not isinstance(error, Exception):
+                raise
+            return
+        found = {row["id"]: row for row in rows}
+        for row_id, future in batch.items():
+            if not future.done():
+                future.set_result(found.get(row_id))
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the counters of the loader.
+
+        Returns:
+            Dict[str, Any]: The statement name, the number of lookups and of queries sent.
+        """
+        return {
+            "name": self.statement.name,
+            "loads": self.loads,
+            "batches": self.batches,
+            "mean_batch_size": self.loads / self.batches if self.batches else 0.0,
+        }
+
+# Every loader of the CRUD layer
+LOADERS: List[BatchLoader] = []
+
+def loader(statement: Statement) -> BatchLoader:
+    """Create a loader and list it in `LOADERS`.
+
+    Args:
+        statement (Statement): The statement taking the array of IDs.
+
+    Returns:
+        BatchLoader: The loader.
+    """
+    batch_loader = BatchLoader(statement)
+    LOADERS.append(batch_loader)
+    return batch_loader
+
+def loader_stats() -> List[Dict[str, Any]]:
+    """Get the counters of every loader.
+
+    Returns:
+        List[Dict[str, Any]]: The counters of each loader.
+    """
+    return [batch_loader.stats() for batch_loader in LOADERS]
@@ -1,13 +1,20 @@
-from asyncpg.exceptions import UniqueViolationError
 from models.product import Product, ProductCreate, ProductUpdate
+from models.bulk import ImportResult
 from asyncpg import Connection
-from typing import List, Optional
+from storage.base import Row, TableSpec
+from storage.tables import open_table, register_table, split_conflicts
+from serialization import from_row
+from typing import AsyncIterator, List, Optional, Tuple
+
+TABLE = register_table(TableSpec("product", "ProductCRUD", "product", "products", Product, foreign_keys={"category_id": "product_category"}, batched=True))
+COLUMNS = TABLE.columns
 
 class ProductCRUD:
     """CRUD operations for Product.
 
     Attributes:
-        db (Connection): The database connection.
+        db (Connection): The database connection, or the `storage.memory.MemoryStorage`.
+        table (TableStorage): The product table on the backend of `db`.
     """
     def __init__(self, db: Connection) -> None:
         """Initialize the CRUD instance.
@@ -16,6 +23,7 @@ class ProductCRUD:
             db (Connection): The database connection.
         """
         self.db = db
+        self.table = open_table(db, TABLE)
 
     async def create_product(self, product: ProductCreate) -> Optional[Product]:
         """Create a new product.
@@ -24,43 +32,99 @@ class ProductCRUD:
             product (ProductCreate): The product data to create.
 
         Returns:
-            Optional[Product]: The created product or None if a UniqueViolationError occurs.
-        """
-        query = """
-        INSERT INTO product (id, reference, name, category_id, price)
-        VALUES ($1, $2, $3, $4, $5)
-        RETURNING id, reference, name, category_id, price
+            Optional[Product]: The created product or None if its ID already exists.
         """
-        try:
-            row = await self.db.fetchrow(query, product.id, product.reference, product.name, product.category_id, product.price)
-            return Product(**row)
-        except UniqueViolationError:
+        row = await self.table.insert((product.id, product.reference, product.name, product.category_id, product.price))
+        if not row:
             return None
+        return from_row(Product, row)
+
+    async def create_products(self, products: List[ProductCreate]) -> Tuple[List[Product], List[int]]:
+        """Create many products in a single statement.
+
+        All rows are sent at once as column arrays and inserted in one transaction;
+        rows whose ID already exists are skipped instead of aborting the batch.
+
+        Args:
+            products (List[ProductCreate]): The products to create.
+
+        Returns:
+            Tuple[List[Product], List[int]]: The created products and the IDs that already existed.
+        """
+        rows = await self.table.insert_many(([product.id for product in products], [product.reference for product in products], [product.name for product in products], [product.category_id for product in products], [product.price for product in products]))
+        return split_conflicts(Product, [product.id for product in products], rows)
+
+    async def import_products(self, columns: List[str], source: AsyncIterator[bytes]) -> ImportResult:
+        """Upsert products streamed from a CSV file.
 
-    async def get_products(self) -> List[Product]:
-        """Get all products.
+        Args:
+            columns (List[str]): The CSV columns, a subset of `COLUMNS` including ``id``.
+            source (AsyncIterator[bytes]): The CSV data without its header line.
+
+        Raises:
+            InvalidData: If a value does not fit its column.
 
         Returns:
-            List[Product]: A list of all products.
+            ImportResult: The row counts of the import.
         """
-        query = "SELECT id, reference, name, category_id, price FROM product"
-        rows = await self.db.fetch(query)
-        return [Product(**row) for row in rows]
+        return await self.table.import_csv(columns, source)
+
+    async def get_products(self, limit: int, after_id: Optional[int] = None) -> List[Product]:
+        """Get a page of products ordered by ID.
+
+        Args:
+            limit (int): The maximum number of products to return.
+            after_id (Optional[int]): Only return products with a greater ID. Defaults to None.
+
+        Returns:
+            List[Product]: A list of products.
+        """
+        rows = await self.table.page(limit, after_id)
+        return [from_row(Product, row) for row in rows]
+
+    async def stream_products(self, batch_size: int, after_id: Optional[int] = None) -> AsyncIterator[List[Row]]:
+        """Read products ordered by ID, `batch_size` at a time.
+
+        On Postgres, the rows are read through a server-side cursor (see
+        `storage.postgres.PostgresTable.stream`), and only `batch_size` rows are held in memory at a time.
+
+        Args:
+            batch_size (int): The number of rows fetched per round trip.
+            after_id (Optional[int]): Only return products with a greater ID. Defaults to None.
+
+        Yields:
+            List[Row]: The next batch of raw product rows.
+        """
+        async for batch in self.table.stream(batch_size, after_id):
+            yield batch
 
     async def get_product(self, product_id: int) -> Optional[Product]:
         """Get a product by its ID.
 
+        On Postgres, concurrent lookups are batched into one query (see `crud.loader.BatchLoader`).
+
         Args:
             product_id (int): The ID of the product to retrieve.
 
         Returns:
             Optional[Product]: The product with the given ID or None if not found.
         """
-        query = "SELECT id, reference, name, category_id, price FROM product WHERE id = $1"
-        row = await self.db.fetchrow(query, product_id)
+        row = await self.table.get(product_id)
         if not row:
             return None
-        return Product(**row)
+        return from_row(Product, row)
+
+    async def get_products_by_ids(self, ids: List[int]) -> List[Product]:
+        """Get many products by their IDs in a single query.
+
+        Args:
+            ids (List[int]): The IDs of the products to retrieve.
+
+        Returns:
+            List[Product]: The products found, in no particular order.
+        """
+        rows = await self.table.get_many(ids)
+        return [from_row(Product, row) for row in rows]
 
     async def delete_product(self, product_id: int) -> Optional[Product]:
         """Delete a product by its ID.
@@ -71,11 +135,10 @@ class ProductCRUD:
         Returns:
             Optional[Product]: The deleted product or None if not found.
         """
-        query = "DELETE FROM product WHERE id = $1 RETURNING id, reference, name, category_id, price"
-        row = await self.db.fetchrow(query, product_id)
+        row = await self.table.delete(product_id)
         if not row:
             return None
-        return Product(**row)
+        return from_row(Product, row)
 
     async def update_product(self, product_id: int, product: ProductCreate) -> Optional[Product]:
         """Update a product by its ID.
@@ -87,20 +150,17 @@ class ProductCRUD:
         Returns:
             Optional[Product]: The updated product or None if not found.
         """
-        query = """
-        UPDATE product
-        SET reference = $2, name = $3, category_id = $4, price = $5
-        WHERE id = $1
-        RETURNING id, reference, name, category_id, price
-        """
-        row = await self.db.fetchrow(query, product_id, product.reference, product.name, product.category_id, product.price)
+        row = await self.table.update(product_id, (product.reference, product.name, product.category_id, product.price))
         if not row:
             return None
-        return Product(**row)
+        return from_row(Product, row)
 
     async def partial_update_product(self, product_id: int, product: ProductUpdate) -> Optional[Product]:
         """Partially update a product by its ID.
 
+        Only the fields sent by the client are written (null is refused by
+        `models.update.PartialUpdate`). On Postgres, each set of fields gets its own prepared statement.
+
         Args:
             product_id (int): The ID of the product to update.
             product (ProductUpdate): The partial data for the product.
@@ -108,13 +168,7 @@ class ProductCRUD:
         Returns:
             Optional[Product]: The updated product or None if not found.
         """
-        query = """
-        UPDATE product
-        SET reference = COALESCE($2, reference), name = COALESCE($3, name), category_id = COALESCE($4, category_id), price = COALESCE($5, price)
-        WHERE id = $1
-        RETURNING id, reference, name, category_id, price
-        """
-        row = await self.db.fetchrow(query, product_id, product.reference, product.name, product.category_id, product.price)
+        row = await self.table.patch(product_id, product.model_dump(exclude_unset=True))
         if not row:
             return None
-        return Product(**row)
\ No newline at end of file
+        return from_row(Product, row)
\ No newline at end of file
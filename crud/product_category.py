@@ -1,21 +1,35 @@
-from asyncpg.exceptions import UniqueViolationError
 from models.product_category import ProductCategory, ProductCategoryCreate, ProductCategoryUpdate
 from asyncpg import Connection
-from typing import List, Optional
+from storage.base import TableSpec
+from storage.tables import open_table, register_table, split_conflicts
+from serialization import from_row
+from cache import ReferenceCache
+from typing import List, Optional, Tuple
+
+TABLE = register_table(TableSpec("product_category", "ProductCategoryCRUD", "product_category", "product_categories", ProductCategory))
 
 class ProductCategoryCRUD:
     """CRUD operations for ProductCategory.
 
     Attributes:
-        db (Connection): The database connection.
+        db (Connection): The database connection, or the `storage.memory.MemoryStorage`.
+        table (TableStorage): The product category table on the backend of `db`.
+        cache (Optional[ReferenceCache]): The in-memory copy of the table serving reads, if any.
     """
-    def __init__(self, db: Connection) -> None:
+    def __init__(self, db: Connection, cache: Optional[ReferenceCache] = None) -> None:
         """Initialize the CRUD instance.
 
         Args:
             db (Connection): The database connection.
+            cache (Optional[ReferenceCache]): The in-memory copy of the table. Defaults to None.
         """
         self.db = db
+        self.table = open_table(db, TABLE)
+        self.cache = cache
+
+    def _invalidate(self) -> None:
+        if self.cache is not None:
+            self.cache.invalidate()
 
     async def create_product_category(self, category: ProductCategoryCreate) -> Optional[ProductCategory]:
         """Create a new product category.
@@ -24,28 +38,44 @@ class ProductCategoryCRUD:
             category (ProductCategoryCreate): The product category data to create.
 
         Returns:
-            Optional[ProductCategory]: The created product category or None if a UniqueViolationError occurs.
-        """
-        query = """
-        INSERT INTO product_category (id, name)
-        VALUES ($1, $2)
-        RETURNING id, name
+            Optional[ProductCategory]: The created product category or None if its ID already exists.
         """
-        try:
-            row = await self.db.fetchrow(query, category.id, category.name)
-            return ProductCategory(**row)
-        except UniqueViolationError:
+        row = await self.table.insert((category.id, category.name))
+        if not row:
             return None
+        self._invalidate()
+        return from_row(ProductCategory, row)
+
+    async def create_product_categories(self, categories: List[ProductCategoryCreate]) -> Tuple[List[ProductCategory], List[int]]:
+        """Create many product categories in a single statement.
+
+        All rows are sent at once as column arrays and inserted in one transaction;
+        rows whose ID already exists are skipped instead of aborting the batch.
+
+        Args:
+            categories (List[ProductCategoryCreate]): The product categories to create.
+
+        Returns:
+            Tuple[List[ProductCategory], List[int]]: The created product categories and the IDs that already existed.
+        """
+        rows = await self.table.insert_many(([category.id for category in categories], [category.name for category in categories]))
+        self._invalidate()
+        return split_conflicts(ProductCategory, [category.id for category in categories], rows)
 
-    async def get_product_categories(self) -> List[ProductCategory]:
-        """Get all product categories.
+    async def get_product_categories(self, limit: int, after_id: Optional[int] = None) -> List[ProductCategory]:
+        """Get a page of product categories ordered by ID.
+
+        Args:
+            limit (int): The maximum number of product categories to return.
+            after_id (Optional[int]): Only return product categories with a greater ID. Defaults to None.
 
         Returns:
-            List[ProductCategory]: A list of all product categories.
+            List[ProductCategory]: A list of product categories.
         """
-        query = "SELECT id, name FROM product_category"
-        rows = await self.db.fetch(query)
-        return [ProductCategory(**row) for row in rows]
+        if self.cache is not None:
+            return await self.cache.page(self.db, limit, after_id)
+        rows = await self.table.page(limit, after_id)
+        return [from_row(ProductCategory, row) for row in rows]
 
     async def get_product_category(self, category_id: int) -> Optional[ProductCategory]:
         """Get a product category by its ID.
@@ -56,11 +86,27 @@ class ProductCategoryCRUD:
         Returns:
             Optional[ProductCategory]: The product category with the given ID or None if not found.
         """
-        query = "SELECT id, name FROM product_category WHERE id = $1"
-        row = await self.db.fetchrow(query, category_id)
+        if self.cache is not None:
+            return await self.cache.get(self.db, category_id)
+        row = await self.table.get(category_id)
         if not row:
             return None
-        return ProductCategory(**row)
+        return from_row(ProductCategory, row)
+
+    async def get_product_categories_by_ids(self, ids: List[int]) -> List[ProductCategory]:
+        """Get many product categories by their IDs in a single query.
+
+        Args:
+            ids (List[int]): The IDs of the product categories to retrieve.
+
+        Returns:
+            List[ProductCategory]: The product categories found, in no particular order.
+        """
+        if self.cache is not None:
+            items = [await self.cache.get(self.db, row_id) for row_id in ids]
+            return [item for item in items if item is not None]
+        rows = await self.table.get_many(ids)
+        return [from_row(ProductCategory, row) for row in rows]
 
     async def delete_product_category(self, category_id: int) -> Optional[ProductCategory]:
         """Delete a product category by its ID.
@@ -71,11 +117,11 @@ class ProductCategoryCRUD:
         Returns:
             Optional[ProductCategory]: The deleted product category or None if not found.
         """
-        query = "DELETE FROM product_category WHERE id = $1 RETURNING id, name"
-        row = await self.db.fetchrow(query, category_id)
+        row = await self.table.delete(category_id)
+        self._invalidate()
         if not row:
             return None
-        return ProductCategory(**row)
+        return from_row(ProductCategory, row)
 
     async def update_product_category(self, category_id: int, category: ProductCategoryCreate) -> Optional[ProductCategory]:
         """Update a product category by its ID.
@@ -87,20 +133,18 @@ class ProductCategoryCRUD:
         Returns:
             Optional[ProductCategory]: The updated product category or None if not found.
         """
-        query = """
-        UPDATE product_category
-        SET name = $2
-        WHERE id = $1
-        RETURNING id, name
-        """
-        row = await self.db.fetchrow(query, category_id, category.name)
+        row = await self.table.update(category_id, (category.name,))
+        self._invalidate()
         if not row:
             return None
-        return ProductCategory(**row)
+        return from_row(ProductCategory, row)
 
     async def partial_update_product_category(self, category_id: int, category: ProductCategoryUpdate) -> Optional[ProductCategory]:
         """Partially update a product category by its ID.
 
+        Only the fields sent by the client are written (null is refused by
+        `models.update.PartialUpdate`). On Postgres, each set of fields gets its own prepared statement.
+
         Args:
             category_id (int): The ID of the product category to update.
             category (ProductCategoryUpdate): The partial data for the product category.
@@ -108,13 +152,8 @@ class ProductCategoryCRUD:
         Returns:
             Optional[ProductCategory]: The updated product category or None if not found.
         """
-        query = """
-        UPDATE product_category
-        SET name = COALESCE($2, name)
-        WHERE id = $1
-        RETURNING id, name
-        """
-        row = await self.db.fetchrow(query, category_id, category.name)
+        row = await self.table.patch(category_id, category.model_dump(exclude_unset=True))
+        self._invalidate()
         if not row:
             return None
-        return ProductCategory(**row)
\ No newline at end of file
+        return from_row(ProductCategory, row)
\ No newline at end of file
@@ -0,0 +1,125 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timezone
+from asyncpg import Connection, Pool
+from typing import Any, Deque, Dict, List, Set, Union
+
+logger = logging.getLogger(__name__)
+
+# Milliseconds from which a statement is logged as slow, overridable from the .env file (0 disables the log)
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "100"))
+# Number of slow queries kept, the oldest are dropped first
+SLOW_QUERY_LOG_SIZE = int(os.getenv("SLOW_QUERY_LOG_SIZE", "100"))
+# Seconds during which the plan captured for a statement is reused instead of running EXPLAIN again
+SLOW_QUERY_EXPLAIN_INTERVAL = float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL", "60"))
+
+def parameter_shape(value: Any) -> str:
+    """Describe a query argument without its value, which may be personal data.
+
+    Args:
+        value (Any): The argument.
+
+    Returns:
+        str: The type name, with the length of lists such as ``list[500]``.
+    """
+    if isinstance(value, (list, tuple)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+class SlowQueryLog:
+    """Ring buffer of the slowest executions of the registered statements, with their plans.
+
+    A statement slower than `threshold` seconds is recorded with its SQL text, the
+    shape of its arguments, its row count and its duration. Its plan is then read
+    with ``EXPLAIN (ANALYZE off, FORMAT JSON)`` in a background task on the same
+    pool, so the statement is not executed again and the request is not delayed.
+    A statement is explained at most once per `explain_interval` seconds; the
+    entries in between reuse its last plan.
+
+    Attributes:
+        threshold (float): The seconds from which an execution is recorded, 0 to record none.
+        explain_interval (float): The seconds during which a plan is reused.
+    """
+    def __init__(self, threshold: float = SLOW_QUERY_THRESHOLD_MS / 1000, size: int = SLOW_QUERY_LOG_SIZE, explain_interval: float = SLOW_QUERY_EXPLAIN_INTERVAL) -> None:
+        """Initialize an empty log.
+
+        Args:
+            threshold (float): The seconds from which an execution is recorded. Defaults to SLOW_QUERY_THRESHOLD_MS / 1000.
+            size (int): The number of entries kept. Defaults to SLOW_QUERY_LOG_SIZE.
+            explain_interval (float): The seconds during which a plan is reused. Defaults to SLOW_QUERY_EXPLAIN_INTERVAL.
+        """
+        self.threshold = threshold
+        self.explain_interval = explain_interval
+        self._entries: Deque[Dict[str, Any]] = deque(maxlen=size)
+        self._plans: Dict[str, Any] = {}
+        self._explained_at: Dict[str, float] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def record(self, name: str, sql: str, db: Union[Pool, Connection], args: tuple, rows: int, elapsed: float, explain: bool = True) -> None:
+        """Record a slow execution and capture its plan in the background.
+
+        Args:
+            name (str): The name of the statement.
+            sql (str): The SQL text.
+            db (Union[Pool, Connection]): The handle the statement ran on.
+            args (tuple): The query arguments.
+            rows (int): The number of rows returned.
+            elapsed (float): The duration in seconds, connection acquisition included.
+            explain (bool): Whether the plan may be read, False for COPY, DDL or queries on temporary tables. Defaults to True.
+        """
+        entry = {
+            "statement": name,
+            "sql": " ".join(sql.split()),
+            "parameters": [parameter_shape(arg) for arg in args],
+            "rows": rows,
+            "duration_ms": elapsed * 1000,
+            "at": datetime.now(timezone.utc).isoformat(),
+            "plan": self._plans.get(name),
+        }
+        self._entries.append(entry)
+        logger.warning("Slow query %s took %.1f ms for %d rows", name, entry["duration_ms"], rows)
+        now = time.monotonic()
+        if now - self._explained_at.get(name, -self.explain_interval) < self.explain_interval:
+            return
+        if not explain:
+            return
+        if not isinstance(db, Pool):
+            # The request connection is busy with the request and closed right after it
+            return
+        self._explained_at[name] = now
+        task = asyncio.get_running_loop().create_task(self._explain(name, sql, db, args))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _explain(self, name: str, sql: str, pool: Pool, args: tuple) -> None:
+        try:
+            plan = json.loads(await pool.fetchval(f"EXPLAIN (ANALYZE off, FORMAT JSON) {sql}", *args))
+        except Exception as error:
+            logger.warning("Could not explain slow query %s: %s", name, error)
+            return
+        self._plans[name] = plan
+        # Also covers the executions recorded while EXPLAIN was running
+        for entry in self._entries:
+            if entry["statement"] == name and entry["plan"] is None:
+                entry["plan"] = plan
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Get the recorded executions, the most recent first.
+
+        Returns:
+            List[Dict[str, Any]]: The statement, SQL, parameter shapes, rows, duration, time and plan of each execution.
+        """
+        return list(reversed(self._entries))
+
+    def clear(self) -> None:
+        """Drop every entry and captured plan."""
+        self._entries.clear()
+        self._plans.clear()
+        self._explained_at.clear()
+
+# Slow executions of every statement of the CRUD layer
+SLOW_QUERIES = SlowQueryLog()
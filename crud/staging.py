@@ -0,0 +1,66 @@
+from asyncpg import Connection
+from crud.statements import timed
+from dependencies import acquire_connection
+from models.bulk import ImportResult
+from typing import AsyncIterator, Dict, Sequence
+
+async def copy_and_merge(db: Connection, table: str, columns: Sequence[str], source: AsyncIterator[bytes], foreign_keys: Dict[str, str], table_columns: Sequence[str]) -> ImportResult:
+    """Stream CSV data into a table through a staging table, upserting on the ID.
+
+    The data is piped with ``COPY ... FROM STDIN`` into a temporary table without
+    constraints, dropped at commit, then merged with a single ``INSERT ... ON CONFLICT (id) DO UPDATE``. When
+    an ID appears several times, its last row wins. Every column is required by the
+    read models, so rows with an empty value, with a dangling foreign key, or with a
+    new ID when the header lacks some columns are counted as rejected and left out.
+    The ``COPY`` and the merge are timed as ``staging.copy_<table>`` and
+    ``staging.merge_<table>``.
+
+    Args:
+        db (Connection): The database handle yielded by `get_db`.
+        table (str): The target table.
+        columns (Sequence[str]): The CSV columns, already checked against the table.
+        source (AsyncIterator[bytes]): The CSV data without its header line.
+        foreign_keys (Dict[str, str]): The referenced table of each foreign key column.
+        table_columns (Sequence[str]): Every column of the table.
+
+    Returns:
+        ImportResult: The row counts of the import.
+    """
+    staging = f"{table}_staging"
+    column_list = ", ".join(columns)
+    conditions = [f"s.{column} IS NOT NULL" for column in columns]
+    if set(table_columns) - set(columns):
+        # A partial row can only update an existing one
+        conditions.append(f"EXISTS (SELECT 1 FROM {table} t WHERE t.id = s.id)")
+    for column, referenced in foreign_keys.items():
+        if column in columns:
+            conditions.append(f"EXISTS (SELECT 1 FROM {referenced} r WHERE r.id = s.{column})")
+    updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in columns if column != "id")
+    on_conflict = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+    merge = f"""
+    WITH checked AS (
+        SELECT s.*, s.ctid AS position, {" AND ".join(conditions)} AS valid FROM {staging} s
+    ), merged AS (
+        INSERT INTO {table} ({column_list})
+        SELECT DISTINCT ON (id) {column_list} FROM checked WHERE valid ORDER BY id, position DESC
+        ON CONFLICT (id) {on_conflict}
+        RETURNING (xmax = 0) AS inserted
+    )
+    SELECT
+        (SELECT count(*) FROM checked) AS staged,
+        (SELECT count(*) FROM merged WHERE inserted) AS inserted,
+        (SELECT count(*) FROM merged WHERE NOT inserted) AS updated,
+        (SELECT count(*) FROM checked WHERE NOT valid) AS rejected
+    """
+    copy = f"COPY {staging} ({column_list}) FROM STDIN (FORMAT csv)"
+    async with acquire_connection(db) as connection:
+        async with connection.transaction():
+            await connection.execute(f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS SELECT * FROM {table} WITH NO DATA")
+            # The staging table only exists in this transaction: neither query can be explained from another connection
+            async with timed(f"staging.copy_{table}", copy, db) as timing:
+                status = await connection.copy_to_table(staging, source=source, columns=list(columns), format="csv")
+                timing.rows = int(status.split()[-1])
+            async with timed(f"staging.merge_{table}", merge, db) as timing:
+                row = await connection.fetchrow(merge)
+                timing.rows = row["inserted"] + row["updated"]
+    return ImportResult(**row)
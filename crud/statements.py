@@ -0,0 +1,264 @@
+import time
+import asyncpg
+from contextlib import asynccontextmanager
+from asyncpg import Connection, Pool, Record
+from asyncpg.exceptions import InvalidCachedStatementError, OutdatedSchemaCacheError
+from asyncpg.prepared_stmt import PreparedStatement
+from metrics import DB_POOL_ACQUIRE_DURATION, DB_QUERY_DURATION
+from crud.slow_queries import SLOW_QUERIES
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+class StatementConnection(asyncpg.Connection):
+    """Pooled connection holding the statements of the registry, prepared once.
+
+    Attributes:
+        prepared (Dict[str, PreparedStatement]): The prepared statements by name.
+    """
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        """Initialize the connection with no prepared statement."""
+        super().__init__(*args, **kwargs)
+        self.prepared: Dict[str, PreparedStatement] = {}
+
+class QueryStats:
+    """Counters of a query of the CRUD layer, also fed to Prometheus and to the slow query log.
+
+    Attributes:
+        name (str): The unique name of the query, ``<CRUD class>.<method>``.
+        sql (str): The SQL text.
+        explain (bool): Whether the slow executions may be explained on another connection.
+        calls (int): The number of executions.
+        rows (int): The number of rows returned by all executions.
+        prepares (int): The number of times the query was prepared on a connection.
+        total_time (float): The cumulated execution time in seconds, connection acquisition included.
+        max_time (float): The slowest execution in seconds.
+    """
+    def __init__(self, name: str, sql: str, explain: bool = True) -> None:
+        """Initialize the counters.
+
+        Args:
+            name (str): The unique name of the query.
+            sql (str): The SQL text.
+            explain (bool): Whether the slow executions may be explained. Defaults to True.
+        """
+        self.name = name
+        self.sql = sql
+        self.explain = explain
+        self.calls = 0
+        self.rows = 0
+        self.prepares = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self._histogram = DB_QUERY_DURATION.labels(name)
+
+    def observe(self, db: Union[Pool, Connection], args: tuple, rows: int, elapsed: float) -> None:
+        """Count an execution, and log it if it was slow.
+
+        Args:
+            db (Union[Pool, Connection]): The handle the query ran on, a pool letting the slow log explain it.
+            args (tuple): The query arguments.
+            rows (int): The number of rows returned.
+            elapsed (float): The duration in seconds.
+        """
+        self.calls += 1
+        self.rows += rows
+        self.total_time += elapsed
+        if elapsed > self.max_time:
+            self.max_time = elapsed
+        self._histogram.observe(elapsed)
+        if 0 < SLOW_QUERIES.threshold <= elapsed:
+            SLOW_QUERIES.record(self.name, self.sql, db, args, rows, elapsed, self.explain)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the counters of the query.
+
+        Returns:
+            Dict[str, Any]: The name, SQL and counters, with times in milliseconds.
+        """
+        return {
+            "name": self.name,
+            "sql": " ".join(self.sql.split()),
+            "calls": self.calls,
+            "rows": self.rows,
+            "prepares": self.prepares,
+            "total_ms": self.total_time * 1000,
+            "mean_ms": self.total_time * 1000 / self.calls if self.calls else 0.0,
+            "max_ms": self.max_time * 1000,
+        }
+
+class Statement(QueryStats):
+    """SQL statement of the CRUD layer, executed through its prepared form.
+
+    Attributes:
+        name (str): The unique name of the statement, ``<CRUD class>.<method>``.
+        sql (str): The SQL text.
+    """
+    def __init__(self, name: str, sql: str) -> None:
+        """Initialize the statement.
+
+        Args:
+            name (str): The unique name of the statement.
+            sql (str): The SQL text.
+        """
+        super().__init__(name, sql)
+
+    async def prepare(self, connection: StatementConnection) -> PreparedStatement:
+        """Prepare the statement on a connection and keep it there.
+
+        Args:
+            connection (StatementConnection): The connection.
+
+        Returns:
+            PreparedStatement: The prepared statement.
+        """
+        prepared = await connection.prepare(self.sql)
+        connection.prepared[self.name] = prepared
+        self.prepares += 1
+        return prepared
+
+    async def _call(self, connection: Connection, method: str, args: tuple) -> Any:
+        prepared_statements = getattr(connection, "prepared", None)
+        if prepared_statements is None:
+            # Not a pooled connection: rely on the implicit statement cache of asyncpg
+            return await getattr(connection, method)(self.sql, *args)
+        prepared = prepared_statements.get(self.name) or await self.prepare(connection)
+        try:
+            return await getattr(prepared, method)(*args)
+        except (InvalidCachedStatementError, OutdatedSchemaCacheError):
+            # The schema changed under the prepared statement: prepare it again once
+            prepared = await self.prepare(connection)
+            return await getattr(prepared, method)(*args)
+
+    async def _run(self, db: Union[Pool, Connection], method: str, args: tuple) -> Any:
+        start = time.perf_counter()
+        result = None
+        try:
+            if isinstance(db, Pool):
+                async with db.acquire() as connection:
+                    DB_POOL_ACQUIRE_DURATION.observe(time.perf_counter() - start)
+                    result = await self._call(connection, method, args)
+            else:
+                result = await self._call(db, method, args)
+            return result
+        finally:
+            self.observe(db, args, len(result) if isinstance(result, list) else int(result is not None), time.perf_counter() - start)
+
+    async def fetch(self, db: Union[Pool, Connection], *args: Any) -> List[Record]:
+        """Execute the statement and return all rows.
+
+        Args:
+            db (Union[Pool, Connection]): The handle yielded by `get_db`, or a connection.
+            *args (Any): The query arguments.
+
+        Returns:
+            List[Record]: The rows.
+        """
+        return await self._run(db, "fetch", args)
+
+    async def fetchrow(self, db: Union[Pool, Connection], *args: Any) -> Optional[Record]:
+        """Execute the statement and return the first row.
+
+        Args:
+            db (Union[Pool, Connection]): The handle yielded by `get_db`, or a connection.
+            *args (Any): The query arguments.
+
+        Returns:
+            Optional[Record]: The first row or None if there is none.
+        """
+        return await self._run(db, "fetchrow", args)
+
+# Every statement of the CRUD layer, by name
+REGISTRY: Dict[str, Statement] = {}
+
+def register(name: str, sql: str) -> Statement:
+    """Add a statement to the registry, or get the one already registered under that name.
+
+    Args:
+        name (str): The unique name of the statement.
+        sql (str): The SQL text.
+
+    Raises:
+        ValueError: If another SQL text is already registered under that name.
+
+    Returns:
+        Statement: The registered statement.
+    """
+    statement = REGISTRY.get(name)
+    if statement is None:
+        statement = REGISTRY[name] = Statement(name, sql)
+    elif statement.sql != sql:
+        raise ValueError(f"Statement {name} is already registered with another SQL text")
+    return statement
+
+# Queries of the CRUD layer that cannot be prepared (cursors, COPY, DDL), by name
+UNPREPARED: Dict[str, QueryStats] = {}
+
+class Timing:
+    """Row count of a query timed by `timed`, set by the caller.
+
+    Attributes:
+        rows (int): The number of rows returned or written.
+    """
+    def __init__(self) -> None:
+        """Initialize the row count to 0."""
+        self.rows = 0
+
+def track(name: str, sql: str, explain: bool = False) -> QueryStats:
+    """Get the counters of a query that is not a registered statement, created on first use.
+
+    Their SQL text is that of the last execution, as it may depend on the arguments.
+
+    Args:
+        name (str): The unique name of the query.
+        sql (str): The SQL text about to run.
+        explain (bool): Whether the slow executions may be explained. Defaults to False.
+
+    Returns:
+        QueryStats: The counters, listed with those of the statements.
+    """
+    query = UNPREPARED.get(name)
+    if query is None:
+        query = UNPREPARED[name] = QueryStats(name, sql, explain)
+    query.sql = sql
+    return query
+
+@asynccontextmanager
+async def timed(name: str, sql: str, db: Union[Pool, Connection], args: tuple = (), explain: bool = False) -> AsyncIterator[Timing]:
+    """Time a query run outside the statements, with the counters and slow log of `track`.
+
+    Args:
+        name (str): The unique name of the query.
+        sql (str): The SQL text.
+        db (Union[Pool, Connection]): The handle the query runs on, a pool letting the slow log explain it.
+        args (tuple): The query arguments. Defaults to ().
+        explain (bool): Whether the slow executions may be explained. Defaults to False.
+
+    Yields:
+        Timing: The row count, to set before leaving the block.
+    """
+    query = track(name, sql, explain)
+    timing = Timing()
+    start = time.perf_counter()
+    try:
+        yield timing
+    finally:
+        query.observe(db, args, timing.rows, time.perf_counter() - start)
+
+async def prepare_statements(connection: StatementConnection) -> None:
+    """Prepare every registered statement on a new pooled connection.
+
+    Used as the ``init`` callback of the connection pool.
+
+    Args:
+        connection (StatementConnection): The new connection.
+    """
+    for statement in list(REGISTRY.values()):
+        await statement.prepare(connection)
+
+def statement_stats() -> List[Dict[str, Any]]:
+    """Get the counters of every statement and tracked query, the most time-consuming first.
+
+    Returns:
+        List[Dict[str, Any]]: The counters of each statement.
+    """
+    queries = [*REGISTRY.values(), *UNPREPARED.values()]
+    return sorted((query.stats() for query in queries), key=lambda stats: stats["total_ms"], reverse=True)
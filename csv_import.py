@@ -0,0 +1,48 @@
+import csv
+from fastapi import HTTPException, Request
+from typing import AsyncIterator, List, Sequence, Tuple
+
+CSV_MEDIA_TYPE = "text/csv"
+
+# OpenAPI description of a raw CSV request body, used as `openapi_extra` of the import endpoints
+CSV_REQUEST_BODY = {"requestBody": {"required": True, "content": {CSV_MEDIA_TYPE: {"schema": {"type": "string"}}}}}
+
+async def _prepend(first: bytes, rest: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    if first:
+        yield first
+    async for chunk in rest:
+        yield chunk
+
+async def read_csv_upload(request: Request, allowed_columns: Sequence[str]) -> Tuple[List[str], AsyncIterator[bytes]]:
+    """Read the header line of a streamed CSV request body.
+
+    Only the chunks up to the first line break are buffered; the rest of the body is
+    handed back as a stream, ready to be piped into ``COPY ... FROM STDIN``.
+
+    Args:
+        request (Request): The incoming request with a ``text/csv`` body.
+        allowed_columns (Sequence[str]): The columns of the target table.
+
+    Raises:
+        HTTPException: If the body is not CSV, or if the header is missing, lacks ``id`` or names unknown columns.
+
+    Returns:
+        Tuple[List[str], AsyncIterator[bytes]]: The header columns and the remaining CSV data.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.split(";")[0].strip().lower() != CSV_MEDIA_TYPE:
+        raise HTTPException(status_code=415, detail=f"Expected a {CSV_MEDIA_TYPE} body")
+    stream = request.stream()
+    head = b""
+    async for chunk in stream:
+        head += chunk
+        if b"\n" in head:
+            break
+    line, _, rest = head.partition(b"\n")
+    columns = [column.strip() for column in next(csv.reader([line.decode().rstrip("\r")]), [])]
+    if "id" not in columns:
+        raise HTTPException(status_code=422, detail="The CSV header must contain an id column")
+    unknown = [column for column in columns if column not in allowed_columns]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown CSV columns: {', '.join(unknown)}")
+    return columns, _prepend(rest, stream)
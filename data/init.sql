@@ -122,3 +122,70 @@ insert into installation values
     (1033, 'Inst-90182', 'Test', 1004, 1004, '2021-06-23'),
     (1034, 'Inst-09112', 'Install new product', 1000, 1002, '2021-10-24'),
     (1035, 'Inst-88972', 'Work during weekend', 1001, 1005, '2021-10-16');
+
+-- Indexes of the installation list filters, ending with the ID for keyset pagination
+create index ix_installation_customer on installation (customer_id, id);
+create index ix_installation_product on installation (product_id, id);
+create index ix_installation_date on installation (installation_date, id);
+
+
+-- Notify the API processes whenever a cached reference table changes
+create function notify_reference_change() returns trigger as $$
+begin
+    perform pg_notify('reference_change', tg_table_name);
+    return null;
+end;
+$$ language plpgsql;
+
+create trigger country_reference_change
+    after insert or update or delete or truncate on country
+    for each statement execute procedure notify_reference_change();
+
+create trigger product_category_reference_change
+    after insert or update or delete or truncate on product_category
+    for each statement execute procedure notify_reference_change();
+
+
+-- Analytics summaries, refreshed concurrently by the API every ANALYTICS_REFRESH_SECONDS
+create materialized view installations_by_category_month as
+    select date_trunc('month', i.installation_date)::date as month, pc.id as category_id, pc.name as category_name, count(*)::int as installations
+    from installation i
+    join product p on p.id = i.product_id
+    join product_category pc on pc.id = p.category_id
+    group by 1, pc.id, pc.name;
+
+create unique index ux_installations_by_category_month on installations_by_category_month (month, category_id);
+
+create materialized view installations_by_country_month as
+    select date_trunc('month', i.installation_date)::date as month, co.id as country_id, co.name as country_name, co.region, count(*)::int as installations
+    from installation i
+    join customer cu on cu.id = i.customer_id
+    join country co on co.id = cu.country_id
+    group by 1, co.id, co.name, co.region;
+
+create unique index ux_installations_by_country_month on installations_by_country_month (month, country_id);
+
+create materialized view top_products_by_region as
+    select region, (row_number() over (partition by region order by installations desc, product_id))::int as rank, product_id, product_name, installations
+    from (
+        select co.region, p.id as product_id, p.name as product_name, count(*)::int as installations
+        from installation i
+        join customer cu on cu.id = i.customer_id
+        join country co on co.id = cu.country_id
+        join product p on p.id = i.product_id
+        group by co.region, p.id, p.name
+    ) as counts;
+
+create unique index ux_top_products_by_region on top_products_by_region (region, product_id);
+
+create table analytics_refresh (
+    view_name       varchar,
+    refreshed_at    timestamptz,
+
+    constraint pk_analytics_refresh primary key (view_name)
+);
+
+insert into analytics_refresh values
+    ('installations_by_category_month', now()),
+    ('installations_by_country_month', now()),
+    ('top_products_by_region', now());
@@ -1,11 +1,27 @@
 import asyncpg
 from dotenv import load_dotenv
 import os
-from typing import AsyncGenerator
+from contextlib import asynccontextmanager
+from fastapi import Request
+from crud.statements import StatementConnection, prepare_statements
+from storage.base import TABLES
+from storage.memory import MemoryStorage
+from typing import AsyncGenerator, AsyncIterator, Dict, Union
 
 # Load database url from .env file
 load_dotenv()
-DATABASE_URL = os.getenv("DATABASE_URL").strip()
+DATABASE_URL = os.getenv("DATABASE_URL", "").strip()
+
+# Backend of the CRUD layer: "postgres", or "memory" for an in-process copy of the seed data without a database
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "postgres").strip().lower()
+# SQL file whose INSERT statements seed the memory backend
+MEMORY_SEED_FILE = os.getenv("MEMORY_SEED_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "init.sql"))
+
+# Connection pool settings, overridable from the .env file
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_MAX_QUERIES = int(os.getenv("DB_POOL_MAX_QUERIES", "50000"))
+DB_POOL_MAX_INACTIVE_LIFETIME = float(os.getenv("DB_POOL_MAX_INACTIVE_LIFETIME", "300"))
 
 async def connect_db() -> asyncpg.Connection:
     """Establish a connection to the database.
@@ -15,14 +31,94 @@ async def connect_db() -> asyncpg.Connection:
     """
     return await asyncpg.connect(DATABASE_URL)
 
-async def get_db() -> AsyncGenerator[asyncpg.Connection, None]:
-    """Yield a database connection and ensure it is closed properly.
+async def create_pool(dsn: str = DATABASE_URL) -> asyncpg.Pool:
+    """Create a shared connection pool of the application.
+
+    Every new pooled connection prepares the statements of the CRUD registry once.
+
+    Args:
+        dsn (str): The database URL. Defaults to DATABASE_URL, the primary.
+
+    Returns:
+        asyncpg.Pool: The connection pool.
+    """
+    return await asyncpg.create_pool(
+        dsn,
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        max_queries=DB_POOL_MAX_QUERIES,
+        max_inactive_connection_lifetime=DB_POOL_MAX_INACTIVE_LIFETIME,
+        connection_class=StatementConnection,
+        init=prepare_statements,
+    )
+
+# The memory storage of the process, created on first use
+MEMORY_STORAGE: Dict[str, MemoryStorage] = {}
+
+def get_memory_storage() -> MemoryStorage:
+    """Get the memory storage of the process, seeded from MEMORY_SEED_FILE on first use.
+
+    Returns:
+        MemoryStorage: The memory storage, shared by every request.
+    """
+    storage = MEMORY_STORAGE.get("default")
+    if storage is None:
+        storage = MEMORY_STORAGE["default"] = MemoryStorage(TABLES.values())
+        with open(MEMORY_SEED_FILE) as file:
+            storage.load_sql(file.read())
+    return storage
+
+async def get_db(request: Request) -> AsyncGenerator[Union[asyncpg.Pool, asyncpg.Connection, MemoryStorage], None]:
+    """Yield the database handle used by the CRUD classes.
+
+    When the application lifespan has created the pool, the pool itself is yielded:
+    every query acquires a connection right before it runs and releases it as soon as
+    it completes, so no connection is held while the response is serialized.
+    When replicas are configured, GET requests are given the pool of a replica (see
+    `replicas.ReplicaSet.pool_for`). Without a pool (e.g. a TestClient used outside a ``with`` block), a dedicated
+    connection is opened for the request and closed afterwards. With the memory
+    backend, the memory storage of the process is yielded instead.
+
+    Args:
+        request (Request): The incoming request.
 
     Yields:
-        asyncpg.Connection: The database connection.
+        Union[asyncpg.Pool, asyncpg.Connection, MemoryStorage]: The connection pool, a single connection or the memory storage.
     """
+    if STORAGE_BACKEND == "memory":
+        yield get_memory_storage()
+        return
+    pool = getattr(request.app.state, "db", None)
+    if pool is not None:
+        replicas = getattr(request.app.state, "replicas", None)
+        yield pool if replicas is None else await replicas.pool_for(request)
+        return
     db = await connect_db()
     try:
         yield db
     finally:
-        await db.close()
\ No newline at end of file
+        await db.close()
+
+@asynccontextmanager
+async def acquire_connection(db: Union[asyncpg.Pool, asyncpg.Connection]) -> AsyncIterator[asyncpg.Connection]:
+    """Hold one connection for work that outlives a single query, such as a cursor.
+
+    A pooled connection is acquired from the pool. Outside the lifespan, the request
+    connection yielded by `get_db` is closed as soon as the endpoint returns, so a
+    dedicated connection is opened instead.
+
+    Args:
+        db (Union[asyncpg.Pool, asyncpg.Connection]): The handle yielded by `get_db`.
+
+    Yields:
+        asyncpg.Connection: A connection reserved for the caller.
+    """
+    if isinstance(db, asyncpg.Pool):
+        async with db.acquire() as connection:
+            yield connection
+        return
+    connection = await connect_db()
+    try:
+        yield connection
+    finally:
+        await connection.close()
@@ -0,0 +1,67 @@
+from fastapi import APIRouter, Depends, HTTPException
+from typing import Any, Dict, List
+from crud.statements import statement_stats
+from crud.loader import loader_stats
+from crud.slow_queries import SLOW_QUERIES
+from crud.analytics import AnalyticsCRUD
+from models.analytics import AnalyticsRefresh
+from endpoints.analytics import get_analytics_crud
+
+router = APIRouter()
+
+@router.get("/admin/statements")
+async def read_statement_stats() -> List[Dict[str, Any]]:
+    """Get the execution counters of every SQL statement of the CRUD layer.
+
+    Returns:
+        List[Dict[str, Any]]: The calls, prepares and latencies of each statement, the most time-consuming first.
+    """
+    return statement_stats()
+
+@router.get("/admin/loaders")
+async def read_loader_stats() -> List[Dict[str, Any]]:
+    """Get the batching counters of every by-id loader of the CRUD layer.
+
+    Returns:
+        List[Dict[str, Any]]: The lookups and queries sent by each loader.
+    """
+    return loader_stats()
+
+@router.get("/admin/slow-queries")
+async def read_slow_queries() -> List[Dict[str, Any]]:
+    """Get the latest statements slower than SLOW_QUERY_THRESHOLD_MS, with their plans.
+
+    Returns:
+        List[Dict[str, Any]]: The SQL, parameter shapes, rows, duration and ``EXPLAIN`` plan of each slow execution, the most recent first.
+        The plan is None until it has been captured in the background.
+    """
+    return SLOW_QUERIES.entries()
+
+@router.delete("/admin/slow-queries", status_code=204)
+async def clear_slow_queries() -> None:
+    """Empty the slow-query log, for instance after adding an index.
+
+    Returns:
+        None: Indicates the log was emptied.
+    """
+    SLOW_QUERIES.clear()
+    return None
+
+@router.post("/admin/analytics/refresh", response_model=List[AnalyticsRefresh], responses={
+    409: {"description": "Another process is refreshing the analytics views"}})
+async def refresh_analytics(crud: AnalyticsCRUD = Depends(get_analytics_crud)) -> List[AnalyticsRefresh]:
+    """Refresh every analytics view now, without waiting for the schedule.
+
+    Args:
+        crud (AnalyticsCRUD, optional): The CRUD instance. Defaults to Depends(get_analytics_crud).
+
+    Raises:
+        HTTPException: If another process is already refreshing the views.
+
+    Returns:
+        List[AnalyticsRefresh]: The refreshed views.
+    """
+    refreshed = await crud.refresh_views()
+    if refreshed is None:
+        raise HTTPException(status_code=409, detail="The analytics views are already being refreshed.")
+    return refreshed
@@ -0,0 +1,110 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from typing import Optional
+from datetime import date
+from models.analytics import AnalyticsReport, CategoryMonthCount, CountryMonthCount, RegionProductRank
+from dependencies import get_db
+from storage.memory import MemoryStorage
+from serialization import json_response
+from http_cache import NOT_MODIFIED_RESPONSES, not_modified
+from crud.analytics import AnalyticsCRUD
+
+router = APIRouter()
+
+# Maximum number of products ranked per region
+MAX_TOP_PRODUCTS = 100
+
+def get_analytics_crud(db=Depends(get_db)) -> AnalyticsCRUD:
+    """Get an AnalyticsCRUD instance.
+
+    Args:
+        db (Optional[Depends]): Optional database dependency.
+
+    Raises:
+        HTTPException: If the storage backend is the memory one, which has no materialized views.
+
+    Returns:
+        AnalyticsCRUD: An instance of AnalyticsCRUD.
+    """
+    if isinstance(db, MemoryStorage):
+        raise HTTPException(status_code=503, detail="The analytics need the postgres storage backend.")
+    return AnalyticsCRUD(db)
+
+@router.get("/analytics/installations-by-category", response_model=AnalyticsReport[CategoryMonthCount], responses=NOT_MODIFIED_RESPONSES)
+async def read_installations_by_category(
+    request: Request,
+    response: Response,
+    month_from: Optional[date] = Query(None, description="Only months starting on or after this date."),
+    month_to: Optional[date] = Query(None, description="Only months starting on or before this date."),
+    crud: AnalyticsCRUD = Depends(get_analytics_crud),
+) -> AnalyticsReport[CategoryMonthCount]:
+    """Get the installations per month and product category.
+
+    Args:
+        request (Request): The incoming request.
+        response (Response): The response whose headers are set.
+        month_from (Optional[date]): Only months starting on or after this date.
+        month_to (Optional[date]): Only months starting on or before this date.
+        crud (AnalyticsCRUD, optional): The CRUD instance. Defaults to Depends(get_analytics_crud).
+
+    Returns:
+        AnalyticsReport[CategoryMonthCount]: The counts and the time of the last refresh.
+    """
+    report = await crud.get_installations_by_category(month_from, month_to)
+    unchanged = not_modified(request, response, report)
+    if unchanged is not None:
+        return unchanged
+    return json_response(report, response)
+
+@router.get("/analytics/installations-by-country", response_model=AnalyticsReport[CountryMonthCount], responses=NOT_MODIFIED_RESPONSES)
+async def read_installations_by_country(
+    request: Request,
+    response: Response,
+    month_from: Optional[date] = Query(None, description="Only months starting on or after this date."),
+    month_to: Optional[date] = Query(None, description="Only months starting on or before this date."),
+    region: Optional[str] = Query(None, description="Only countries of this region."),
+    crud: AnalyticsCRUD = Depends(get_analytics_crud),
+) -> AnalyticsReport[CountryMonthCount]:
+    """Get the installations per month and customer country.
+
+    Args:
+        request (Request): The incoming request.
+        response (Response): The response whose headers are set.
+        month_from (Optional[date]): Only months starting on or after this date.
+        month_to (Optional[date]): Only months starting on or before this date.
+        region (Optional[str]): Only countries of this region.
+        crud (AnalyticsCRUD, optional): The CRUD instance. Defaults to Depends(get_analytics_crud).
+
+    Returns:
+        AnalyticsReport[CountryMonthCount]: The counts and the time of the last refresh.
+    """
+    report = await crud.get_installations_by_country(month_from, month_to, region)
+    unchanged = not_modified(request, response, report)
+    if unchanged is not None:
+        return unchanged
+    return json_response(report, response)
+
+@router.get("/analytics/top-products-by-region", response_model=AnalyticsReport[RegionProductRank], responses=NOT_MODIFIED_RESPONSES)
+async def read_top_products_by_region(
+    request: Request,
+    response: Response,
+    limit: int = Query(10, ge=1, le=MAX_TOP_PRODUCTS, description="Number of products per region."),
+    region: Optional[str] = Query(None, description="Only this region."),
+    crud: AnalyticsCRUD = Depends(get_analytics_crud),
+) -> AnalyticsReport[RegionProductRank]:
+    """Get the most installed products of each customer region.
+
+    Args:
+        request (Request): The incoming request.
+        response (Response): The response whose headers are set.
+        limit (int): The number of products per region.
+        region (Optional[str]): Only this region.
+        crud (AnalyticsCRUD, optional): The CRUD instance. Defaults to Depends(get_analytics_crud).
+
+    Returns:
+        AnalyticsReport[RegionProductRank]: The ranked products and the time of the last refresh.
+    """
+    report = await crud.get_top_products_by_region(limit, region)
+    unchanged = not_modified(request, response, report)
+    if unchanged is not None:
+        return unchanged
+    return json_response(report, response)
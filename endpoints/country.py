@@ -1,23 +1,29 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, Body
 from typing import List
 from models.country import Country, CountryCreate, CountryUpdate
+from models.bulk import BulkConflict, BulkCreateResult, MAX_BULK_SIZE
 from dependencies import get_db
+from pagination import Page, paginate
+from serialization import json_response
+from http_cache import NOT_MODIFIED_RESPONSES, REFERENCE_CACHE_CONTROL, not_modified
+from cache import get_cache
 from crud.country import CountryCRUD
 
 # Connect to other files for this app
 router = APIRouter()
 
 # Initiate CountryCRUD instance with specified db dependency
-def get_country_crud(db=Depends(get_db)) -> CountryCRUD:
-    """Get a CountryCRUD instance.
+def get_country_crud(request: Request, db=Depends(get_db)) -> CountryCRUD:
+    """Get a CountryCRUD instance, backed by the country cache when the application has one.
 
     Args:
+        request (Request): The incoming request.
         db (Depends): Database dependency.
 
     Returns:
         CountryCRUD: An instance of CountryCRUD.
     """
-    return CountryCRUD(db)
+    return CountryCRUD(db, get_cache(request.app.state, "country"))
 
 # FastAPI Endpoints
 @router.post("/countries/", response_model=Country, status_code=201, responses={
@@ -39,27 +45,56 @@ async def create_country(country: CountryCreate, crud: CountryCRUD = Depends(get
     new_country = await crud.create_country(country)
     if new_country is None:
         raise HTTPException(status_code=409, detail=f"Country with id {country.id} already exists.")
-    return new_country
+    return json_response(new_country, status_code=201)
 
-@router.get("/countries/", response_model=List[Country])
-async def read_countries(crud: CountryCRUD = Depends(get_country_crud)) -> List[Country]:
-    """Get a list of all countries.
+@router.post("/countries/bulk", response_model=BulkCreateResult[Country], responses={
+    200: {"description": "Countries created, existing IDs reported as conflicts"}})
+async def create_countries(countries: List[CountryCreate] = Body(..., max_length=MAX_BULK_SIZE), crud: CountryCRUD = Depends(get_country_crud)) -> BulkCreateResult[Country]:
+    """Create many countries at once.
 
     Args:
+        countries (List[CountryCreate]): The countries to create.
         crud (CountryCRUD, optional): The CRUD instance. Defaults to Depends(get_country_crud).
 
     Returns:
-        List[Country]: A list of all countries.
+        BulkCreateResult[Country]: The created countries and the rejected IDs.
     """
-    return await crud.get_countries()
+    created, conflicts = await crud.create_countries(countries)
+    return json_response(BulkCreateResult[Country](
+        created=created,
+        conflicts=[BulkConflict(id=conflict_id, detail=f"Country with id {conflict_id} already exists.") for conflict_id in conflicts]))
+
+@router.get("/countries/", response_model=List[Country], responses=NOT_MODIFIED_RESPONSES)
+async def read_countries(request: Request, response: Response, page: Page = Depends(), crud: CountryCRUD = Depends(get_country_crud)) -> List[Country]:
+    """Get a page of countries using keyset pagination on the ID.
+
+    Args:
+        request (Request): The incoming request.
+        response (Response): The response whose headers are set.
+        page (Page): The pagination parameters. Defaults to Depends().
+        crud (CountryCRUD, optional): The CRUD instance. Defaults to Depends(get_country_crud).
+
+    Returns:
+        List[Country]: A page of countries.
+    """
+    countries = paginate(request, response, await crud.get_countries(page.limit + 1, page.after_id), page)
+    unchanged = not_modified(request, response, countries, REFERENCE_CACHE_CONTROL)
+    if unchanged is not None:
+        return unchanged
+    if crud.cache is not None:
+        return crud.cache.response(countries, response)
+    return json_response(countries, response)
 
 @router.get("/countries/{country_id}", response_model=Country, responses={
+    **NOT_MODIFIED_RESPONSES,
     404: {"description": "Country not found"}})
-async def read_country(country_id: int, crud: CountryCRUD = Depends(get_country_crud)) -> Country:
+async def read_country(country_id: int, request: Request, response: Response, crud: CountryCRUD = Depends(get_country_crud)) -> Country:
     """Get a country by its ID.
 
     Args:
         country_id (int): The ID of the country to retrieve.
+        request (Request): The incoming request.
+        response (Response): The response whose headers are set.
         crud (CountryCRUD, optional): The CRUD instance. Defaults to Depends(get_country_crud).
 
     Raises:
@@ -71,7 +106,12 @@ async def read_country(country_id: int, crud: CountryCRUD = Depends(get_country_
     country = await crud.get_country(country_id)
     if not country:
         raise HTTPException(status_code=404, detail="Country not found")
-    return country
+    unchanged = not_modified(request, response, country, REFERENCE_CACHE_CONTROL)
+    if unchanged is not None:
+        return unchanged
+    if crud.cache is not None:
+        return crud.cache.response(country, response)
+    return json_response(country, response)
 
 @router.delete("/countries/{country_id}", status_code=204, responses={
     204: {"description": "Country successfully deleted"},
@@ -114,7 +154,7 @@ async def update_country(country_id: int, country: CountryCreate, crud: CountryC
     updated_country = await crud.update_country(country_id, country)
     if not updated_country:
         raise HTTPException(status_code=404, detail="Country not found")
-    return updated_country
+    return json_response(updated_country)
 
 @router.patch("/countries/{country_id}", response_model=Country, responses={
     200: {"description": "Country successfully partially updated"}, 
@@ -136,4 +176,4 @@ async def partial_update_country(country_id: int, country: CountryUpdate, crud:
     updated_country = await crud.partial_update_country(country_id, country)
     if not updated_country:
         raise HTTPException(status_code=404, detail="Country not found")
-    return updated_country
\ No newline at end of file
+    return json_response(updated_country)
\ No newline at end of file
@@ -1,8 +1,15 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, Body
 from typing import List
 from models.customer import Customer, CustomerCreate, CustomerUpdate
+from models.bulk import BulkConflict, BulkCreateResult, ImportResult, MAX_BULK_SIZE
+from storage.base import InvalidData
 from dependencies import get_db
-from crud.customer import CustomerCRUD
+from pagination import Page, paginate
+from serialization import json_response
+from http_cache import NOT_MODIFIED_RESPONSES, not_modified
+from csv_import import CSV_REQUEST_BODY, read_csv_upload
+from export import EXPORT_BATCH_SIZE, EXPORT_RESPONSES, export_response, negotiate_export
+from crud.customer import CustomerCRUD, COLUMNS
 
 router = APIRouter()
 
@@ -36,27 +43,86 @@ async def create_customer(customer: CustomerCreate, crud: CustomerCRUD = Depends
     new_customer = await crud.create_customer(customer)
     if new_customer is None:
         raise HTTPException(status_code=409, detail=f"Customer with id {customer.id} already exists.")
-    return new_customer
+    return json_response(new_customer, status_code=201)
 
-@router.get("/customers/", response_model=List[Customer])
-async def read_customers(crud: CustomerCRUD = Depends(get_customer_crud)) -> List[Customer]:
-    """Get a list of all customers.
+@router.post("/customers/bulk", response_model=BulkCreateResult[Customer], responses={
+    200: {"description": "Customers created, existing IDs reported as conflicts"}})
+async def create_customers(customers: List[CustomerCreate] = Body(..., max_length=MAX_BULK_SIZE), crud: CustomerCRUD = Depends(get_customer_crud)) -> BulkCreateResult[Customer]:
+    """Create many customers at once.
 
     Args:
+        customers (List[CustomerCreate]): The customers to create.
         crud (CustomerCRUD, optional): The CRUD instance. Defaults to Depends(get_customer_crud).
 
     Returns:
-        List[Customer]: A list of all customers.
+        BulkCreateResult[Customer]: The created customers and the rejected IDs.
     """
-    return await crud.get_customers()
+    created, conflicts = await crud.create_customers(customers)
+    return json_response(BulkCreateResult[Customer](
+        created=created,
+        conflicts=[BulkConflict(id=conflict_id, detail=f"Customer with id {conflict_id} already exists.") for conflict_id in conflicts]))
+
+@router.post("/customers/import", response_model=ImportResult, openapi_extra=CSV_REQUEST_BODY, responses={
+    200: {"description": "CSV file merged, existing IDs updated"},
+    415: {"description": "Body is not text/csv"},
+    422: {"description": "Invalid CSV header or value"}})
+async def import_customers(request: Request, crud: CustomerCRUD = Depends(get_customer_crud)) -> ImportResult:
+    """Upsert customers from a CSV file streamed straight into ``COPY``.
+
+    The body is a ``text/csv`` file whose header names the columns, ``id`` included.
+    On Postgres, it is never buffered in full: chunks are forwarded to the database as they arrive.
+
+    Args:
+        request (Request): The incoming request with the CSV body.
+        crud (CustomerCRUD, optional): The CRUD instance. Defaults to Depends(get_customer_crud).
+
+    Raises:
+        HTTPException: If the body is not CSV, or if its header or a value is invalid.
+
+    Returns:
+        ImportResult: The row counts of the import.
+    """
+    columns, source = await read_csv_upload(request, COLUMNS)
+    try:
+        return await crud.import_customers(columns, source)
+    except InvalidData as error:
+        raise HTTPException(status_code=422, detail=str(error))
+
+@router.get("/customers/", response_model=List[Customer], responses={**EXPORT_RESPONSES, **NOT_MODIFIED_RESPONSES})
+async def read_customers(request: Request, response: Response, page: Page = Depends(), crud: CustomerCRUD = Depends(get_customer_crud)) -> List[Customer]:
+    """Get a page of customers using keyset pagination on the ID.
+
+    When ``Accept`` asks for NDJSON, CSV, MessagePack or Arrow, all customers after the
+    cursor are streamed instead, in fixed-size batches.
+
+    Args:
+        request (Request): The incoming request.
+        response (Response): The response whose headers are set.
+        page (Page): The pagination parameters. Defaults to Depends().
+        crud (CustomerCRUD, optional): The CRUD instance. Defaults to Depends(get_customer_crud).
+
+    Returns:
+        List[Customer]: A page of customers.
+    """
+    media_type = negotiate_export(request)
+    if media_type is not None:
+        return export_response(crud.stream_customers(EXPORT_BATCH_SIZE, page.after_id), Customer, media_type, "customers")
+    customers = paginate(request, response, await crud.get_customers(page.limit + 1, page.after_id), page)
+    unchanged = not_modified(request, response, customers)
+    if unchanged is not None:
+        return unchanged
+    return json_response(customers, response)
 
 @router.get("/customers/{customer_id}", response_model=Customer, responses={
+    **NOT_MODIFIED_RESPONSES,
     404: {"description": "Customer not found"}})
-async def read_customer(customer_id: int, crud: CustomerCRUD = Depends(get_customer_crud)) -> Customer:
+async def read_customer(customer_id: int, request: Request, response: Response, crud: CustomerCRUD = Depends(get_customer_crud)) -> Customer:
     """Get a customer by its ID.
 
     Args:
         customer_id (int): The ID of the customer to retrieve.
+        request (Request): The incoming request.
+        response (Response): The response whose headers are set.
         crud (CustomerCRUD, optional): The CRUD instance. Defaults to Depends(get_customer_crud).
 
     Raises:
@@ -68,7 +134,10 @@ async def read_customer(customer_id: int, crud: CustomerCRUD = Depends(get_custo
     customer = await crud.get_customer(customer_id)
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
-    return customer
+    unchanged = not_modified(request, response, customer)
+    if unchanged is not None:
+        return unchanged
+    return json_response(customer, response)
 
 @router.delete("/customers/{customer_id}", status_code=204, responses={
     204: {"description": "Customer successfully deleted"},
@@ -111,7 +180,7 @@ async def update_customer(customer_id: int, customer: CustomerCreate, crud: Cust
     updated_customer = await crud.update_customer(customer_id, customer)
     if not updated_customer:
         raise HTTPException(status_code=404, detail="Customer not found")
-    return updated_customer
+    return json_response(updated_customer)
 
 @router.patch("/customers/{customer_id}", response_model=Customer, responses={
     200: {"description": "Customer successfully partially updated"}, 
@@ -133,4 +202,4 @@ async def partial_update_customer(customer_id: int, customer: CustomerUpdate, cr
     updated_customer = await crud.partial_update_customer(customer_id, customer)
     if not updated_customer:
         raise HTTPException(status_code=404, detail="Customer not found")
-    return updated_customer
\ No newline at end of file
+    return json_response(updated_customer)
\ No newline at end of file
@@ -1,8 +1,19 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
-from models.installation import Installation, InstallationCreate, InstallationUpdate
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response, Body
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from datetime import date
+from typing import List, Optional
+from models.installation import EXPANSIONS, Installation, InstallationCreate, InstallationExpand, InstallationExpanded, InstallationFilter, InstallationUpdate
+from models.bulk import BulkConflict, BulkCreateResult, MAX_BULK_SIZE
 from dependencies import get_db
+from pagination import Page, paginate
+from serialization import json_response
+from http_cache import NOT_MODIFIED_RESPONSES, PRECONDITION_FAILED_RESPONSES, not_modified, parse_if_match, version_etag
+from export import EXPORT_BATCH_SIZE, EXPORT_RESPONSES, export_response, negotiate_export
 from crud.installation import InstallationCRUD
+from crud.expansion import InstallationExpander
+from storage.base import VersionConflict
+from cache import get_cache
 
 router = APIRouter()
 
@@ -17,14 +28,71 @@ def get_installation_crud(db=Depends(get_db)) -> InstallationCRUD:
     """
     return InstallationCRUD(db)
 
+def get_installation_expander(request: Request, db=Depends(get_db)) -> InstallationExpander:
+    """Get an InstallationExpander instance.
+
+    Args:
+        request (Request): The incoming request, whose application holds the reference caches.
+        db (Optional[Depends]): Optional database dependency.
+
+    Returns:
+        InstallationExpander: An instance of InstallationExpander.
+    """
+    return InstallationExpander(db, get_cache(request.app.state, "country"), get_cache(request.app.state, "product_category"))
+
+def get_installation_filter(
+    customer_id: Optional[int] = Query(None, description="Only installations of this customer."),
+    product_id: Optional[int] = Query(None, description="Only installations of this product."),
+    installation_date_from: Optional[date] = Query(None, description="Only installations on or after this date."),
+    installation_date_to: Optional[date] = Query(None, description="Only installations on or before this date."),
+) -> InstallationFilter:
+    """Read the installation list filters from the query string.
+
+    Args:
+        customer_id (Optional[int]): The customer ID, if any.
+        product_id (Optional[int]): The product ID, if any.
+        installation_date_from (Optional[date]): The first date, if any.
+        installation_date_to (Optional[date]): The last date, if any.
+
+    Raises:
+        RequestValidationError: If the date range is empty.
+
+    Returns:
+        InstallationFilter: The filters.
+    """
+    try:
+        return InstallationFilter(customer_id=customer_id, product_id=product_id, installation_date_from=installation_date_from, installation_date_to=installation_date_to)
+    except ValidationError as error:
+        raise RequestValidationError([{**detail, "loc": ("query", "installation_date_from")} for detail in error.errors(include_url=False, include_context=False)])
+
+def get_installation_expand(
+    expand: Optional[str] = Query(None, description=f"Comma-separated related objects to embed, among {', '.join(EXPANSIONS)}."),
+) -> InstallationExpand:
+    """Read the related objects to embed from the query string.
+
+    Args:
+        expand (Optional[str]): The comma-separated paths, if any.
+
+    Raises:
+        RequestValidationError: If a path is unknown.
+
+    Returns:
+        InstallationExpand: The requested paths.
+    """
+    try:
+        return InstallationExpand(paths=expand)
+    except ValidationError as error:
+        raise RequestValidationError([{**detail, "loc": ("query", "expand")} for detail in error.errors(include_url=False, include_context=False)])
+
 @router.post("/installations/", response_model=Installation, status_code=201, responses={
-    201: {"description": "Installation successfully created"},
+    201: {"description": "Installation successfully created, its version in the ETag header"},
     409: {"description": "Installation with this ID already exists"}})
-async def create_installation(installation: InstallationCreate, crud: InstallationCRUD = Depends(get_installation_crud)) -> Installation:
+async def create_installation(installation: InstallationCreate, response: Response, crud: InstallationCRUD = Depends(get_installation_crud)) -> Installation:
     """Create a new installation.
 
     Args:
         installation (InstallationCreate): The installation data to create.
+        response (Response): The response whose headers are set.
         crud (InstallationCRUD, optional): The CRUD instance. Defaults to Depends(get_installation_crud).
 
     Raises:
@@ -33,101 +101,178 @@ async def create_installation(installation: InstallationCreate, crud: Installati
     Returns:
         Installation: The created installation.
     """
-    new_installation = await crud.create_installation(installation)
-    if new_installation is None:
+    created = await crud.create_installation(installation)
+    if created is None:
         raise HTTPException(status_code=409, detail=f"Installation with id {installation.id} already exists.")
-    return new_installation
+    new_installation, version = created
+    response.headers["ETag"] = version_etag(version)
+    return json_response(new_installation, response, status_code=201)
+
+@router.post("/installations/bulk", response_model=BulkCreateResult[Installation], responses={
+    200: {"description": "Installations created, existing IDs reported as conflicts"}})
+async def create_installations(installations: List[InstallationCreate] = Body(..., max_length=MAX_BULK_SIZE), crud: InstallationCRUD = Depends(get_installation_crud)) -> BulkCreateResult[Installation]:
+    """Create many installations at once.
+
+    Args:
+        installations (List[InstallationCreate]): The installations to create.
+        crud (InstallationCRUD, optional): The CRUD instance. Defaults to Depends(get_installation_crud).
 
-@router.get("/installations/", response_model=List[Installation])
-async def read_installations(crud: InstallationCRUD = Depends(get_installation_crud)) -> List[Installation]:
-    """Get a list of all installations.
+    Returns:
+        BulkCreateResult[Installation]: The created installations and the rejected IDs.
+    """
+    created, conflicts = await crud.create_installations(installations)
+    return json_response(BulkCreateResult[Installation](
+        created=created,
+        conflicts=[BulkConflict(id=conflict_id, detail=f"Installation with id {conflict_id} already exists.") for conflict_id in conflicts]))
+
+@router.get("/installations/", response_model=List[InstallationExpanded], responses={**EXPORT_RESPONSES, **NOT_MODIFIED_RESPONSES})
+async def read_installations(request: Request, response: Response, page: Page = Depends(), filters: InstallationFilter = Depends(get_installation_filter), expand: InstallationExpand = Depends(get_installation_expand), crud: InstallationCRUD = Depends(get_installation_crud), expander: InstallationExpander = Depends(get_installation_expander)) -> List[InstallationExpanded]:
+    """Get a page of installations using keyset pagination on the ID, optionally filtered.
+
+    When ``Accept`` asks for NDJSON, CSV, MessagePack or Arrow, all installations after the cursor are
+    streamed instead, read from a server-side cursor in fixed-size batches, and
+    ``expand`` is ignored.
 
     Args:
+        request (Request): The incoming request.
+        response (Response): The response whose headers are set.
+        page (Page): The pagination parameters. Defaults to Depends().
+        filters (InstallationFilter): The customer, product and date range filters. Defaults to Depends(get_installation_filter).
+        expand (InstallationExpand): The related objects to embed. Defaults to Depends(get_installation_expand).
         crud (InstallationCRUD, optional): The CRUD instance. Defaults to Depends(get_installation_crud).
+        expander (InstallationExpander, optional): Reads the related objects. Defaults to Depends(get_installation_expander).
 
     Returns:
-        List[Installation]: A list of all installations.
+        List[InstallationExpanded]: A page of installations.
     """
-    return await crud.get_installations()
+    media_type = negotiate_export(request)
+    if media_type is not None:
+        batches = crud.stream_installations(EXPORT_BATCH_SIZE, page.after_id, filters)
+        return export_response(batches, Installation, media_type, "installations")
+    installations = paginate(request, response, await crud.get_installations(page.limit + 1, page.after_id, filters), page)
+    if expand.paths:
+        installations = await expander.expand(installations, expand.paths)
+    unchanged = not_modified(request, response, installations)
+    if unchanged is not None:
+        return unchanged
+    return json_response(installations, response)
 
-@router.get("/installations/{installation_id}", response_model=Installation, responses={
+@router.get("/installations/{installation_id}", response_model=InstallationExpanded, responses={
+    **NOT_MODIFIED_RESPONSES,
     404: {"description": "Installation not found"}})
-async def read_installation(installation_id: int, crud: InstallationCRUD = Depends(get_installation_crud)) -> Installation:
+async def read_installation(installation_id: int, request: Request, response: Response, expand: InstallationExpand = Depends(get_installation_expand), crud: InstallationCRUD = Depends(get_installation_crud), expander: InstallationExpander = Depends(get_installation_expander)) -> InstallationExpanded:
     """Get an installation by its ID.
 
+    The ETag is the version of the row, to send back in the ``If-Match`` header of
+    a write. With ``expand``, it is a hash of the whole representation instead,
+    which also changes with the embedded objects but is no row version.
+
     Args:
         installation_id (int): The ID of the installation to retrieve.
+        request (Request): The incoming request.
+        response (Response): The response whose headers are set.
+        expand (InstallationExpand): The related objects to embed. Defaults to Depends(get_installation_expand).
         crud (InstallationCRUD, optional): The CRUD instance. Defaults to Depends(get_installation_crud).
+        expander (InstallationExpander, optional): Reads the related objects. Defaults to Depends(get_installation_expander).
 
     Raises:
         HTTPException: If the installation with the given ID is not found.
 
     Returns:
-        Installation: The installation with the given ID.
+        InstallationExpanded: The installation with the given ID.
     """
-    installation = await crud.get_installation(installation_id)
-    if not installation:
+    found = await crud.get_installation(installation_id)
+    if not found:
         raise HTTPException(status_code=404, detail="Installation not found")
-    return installation
+    installation, version = found
+    etag = version_etag(version)
+    if expand.paths:
+        installation = (await expander.expand([installation], expand.paths))[0]
+        etag = None
+    unchanged = not_modified(request, response, installation, etag=etag)
+    if unchanged is not None:
+        return unchanged
+    return json_response(installation, response)
 
 @router.delete("/installations/{installation_id}", status_code=204, responses={
+    **PRECONDITION_FAILED_RESPONSES,
     204: {"description": "Installation successfully deleted"},
     404: {"description": "Installation not found"}})
-async def delete_installation(installation_id: int, crud: InstallationCRUD = Depends(get_installation_crud)) -> None:
-    """Delete an installation by its ID.
+async def delete_installation(installation_id: int, request: Request, crud: InstallationCRUD = Depends(get_installation_crud)) -> None:
+    """Delete an installation by its ID, only at the version of the ETag sent in ``If-Match``, if any.
 
     Args:
         installation_id (int): The ID of the installation to delete.
+        request (Request): The incoming request.
         crud (InstallationCRUD, optional): The CRUD instance. Defaults to Depends(get_installation_crud).
 
     Raises:
-        HTTPException: If the installation with the given ID is not found.
+        HTTPException: If the installation with the given ID is not found, or is at another version.
     """
-    installation = await crud.delete_installation(installation_id)
+    try:
+        installation = await crud.delete_installation(installation_id, parse_if_match(request))
+    except VersionConflict:
+        raise HTTPException(status_code=412, detail="Installation was modified since the ETag sent in If-Match")
     if not installation:
         raise HTTPException(status_code=404, detail="Installation not found")
     return None
 
 @router.put("/installations/{installation_id}", response_model=Installation, responses={
-    200: {"description": "Installation successfully updated"}, 
+    **PRECONDITION_FAILED_RESPONSES,
+    200: {"description": "Installation successfully updated, its new version in the ETag header"}, 
     404: {"description": "Installation not found"}})
-async def update_installation(installation_id: int, installation: InstallationCreate, crud: InstallationCRUD = Depends(get_installation_crud)) -> Installation:
-    """Update an installation by its ID.
+async def update_installation(installation_id: int, installation: InstallationCreate, request: Request, response: Response, crud: InstallationCRUD = Depends(get_installation_crud)) -> Installation:
+    """Update an installation by its ID, only at the version of the ETag sent in ``If-Match``, if any.
 
     Args:
         installation_id (int): The ID of the installation to update.
         installation (InstallationCreate): The new data for the installation.
+        request (Request): The incoming request.
+        response (Response): The response whose headers are set.
         crud (InstallationCRUD, optional): The CRUD instance. Defaults to Depends(get_installation_crud).
 
     Raises:
-        HTTPException: If the installation with the given ID is not found.
+        HTTPException: If the installation with the given ID is not found, or is at another version.
 
     Returns:
         Installation: The updated installation.
     """
-    updated_installation = await crud.update_installation(installation_id, installation)
-    if not updated_installation:
+    try:
+        updated = await crud.update_installation(installation_id, installation, parse_if_match(request))
+    except VersionConflict:
+        raise HTTPException(status_code=412, detail="Installation was modified since the ETag sent in If-Match")
+    if not updated:
         raise HTTPException(status_code=404, detail="Installation not found")
-    return updated_installation
+    updated_installation, version = updated
+    response.headers["ETag"] = version_etag(version)
+    return json_response(updated_installation, response)
 
 @router.patch("/installations/{installation_id}", response_model=Installation, responses={
-    200: {"description": "Installation successfully partially updated"}, 
+    **PRECONDITION_FAILED_RESPONSES,
+    200: {"description": "Installation successfully partially updated, its new version in the ETag header"}, 
     404: {"description": "Installation not found"}})
-async def partial_update_installation(installation_id: int, installation: InstallationUpdate, crud: InstallationCRUD = Depends(get_installation_crud)) -> Installation:
-    """Partially update an installation by its ID.
+async def partial_update_installation(installation_id: int, installation: InstallationUpdate, request: Request, response: Response, crud: InstallationCRUD = Depends(get_installation_crud)) -> Installation:
+    """Partially update an installation by its ID, only at the version of the ETag sent in ``If-Match``, if any.
 
     Args:
         installation_id (int): The ID of the installation to update.
         installation (InstallationUpdate): The partial data for the installation.
+        request (Request): The incoming request.
+        response (Response): The response whose headers are set.
         crud (InstallationCRUD, optional): The CRUD instance. Defaults to Depends(get_installation_crud).
 
     Raises:
-        HTTPException: If the installation with the given ID is not found.
+        HTTPException: If the installation with the given ID is not found, or is at another version.
 
     Returns:
         Installation: The updated installation.
     """
-    updated_installation = await crud.partial_update_installation(installation_id, installation)
-    if not updated_installation:
+    try:
+        updated = await crud.partial_update_installation(installation_id, installation, parse_if_match(request))
+    except VersionConflict:
+        raise HTTPException(status_code=412, detail="Installation was modified since the ETag sent in If-Match")
+    if not updated:
         raise HTTPException(status_code=404, detail="Installation not found")
-    return updated_installation
\ No newline at end of file
+    updated_installation, version = updated
+    response.headers["ETag"] = version_etag(version)
+    return json_response(updated_installation, response)
\ No newline at end of file
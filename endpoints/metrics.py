@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Response
+from metrics import metrics_response
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+async def read_metrics() -> Response:
+    """Get the Prometheus metrics of every worker.
+
+    Returns:
+        Response: The metrics in the Prometheus text format.
+    """
+    return metrics_response()
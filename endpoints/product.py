@@ -1,8 +1,15 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, Body
 from typing import List
 from models.product import Product, ProductCreate, ProductUpdate
+from models.bulk import BulkConflict, BulkCreateResult, ImportResult, MAX_BULK_SIZE
+from storage.base import InvalidData
 from dependencies import get_db
-from crud.product import ProductCRUD
+from pagination import Page, paginate
+from serialization import json_response
+from http_cache import NOT_MODIFIED_RESPONSES, not_modified
+from csv_import import CSV_REQUEST_BODY, read_csv_upload
+from export import EXPORT_BATCH_SIZE, EXPORT_RESPONSES, export_response, negotiate_export
+from crud.product import ProductCRUD, COLUMNS
 
 router = APIRouter()
 
@@ -36,27 +43,86 @@ async def create_product(product: ProductCreate, crud: ProductCRUD = Depends(get
     new_product = await crud.create_product(product)
     if new_product is None:
         raise HTTPException(status_code=409, detail=f"Product with id {product.id} already exists.")
-    return new_product
+    return json_response(new_product, status_code=201)
 
-@router.get("/products/", response_model=List[Product])
-async def read_products(crud: ProductCRUD = Depends(get_product_crud)) -> List[Product]:
-    """Get a list of all products.
+@router.post("/products/bulk", response_model=BulkCreateResult[Product], responses={
+    200: {"description": "Products created, existing IDs reported as conflicts"}})
+async def create_products(products: List[ProductCreate] = Body(..., max_length=MAX_BULK_SIZE), crud: ProductCRUD = Depends(get_product_crud)) -> BulkCreateResult[Product]:
+    """Create many products at once.
 
     Args:
+        products (List[ProductCreate]): The products to create.
         crud (ProductCRUD, optional): The CRUD instance. Defaults to Depends(get_product_crud).
 
     Returns:
-        List[Product]: A list of all products.
+        BulkCreateResult[Product]: The created products and the rejected IDs.
     """
-    return await crud.get_products()
+    created, conflicts = await crud.create_products(products)
+    return json_response(BulkCreateResult[Product](
+        created=created,
+        conflicts=[BulkConflict(id=conflict_id, detail=f"Product with id {conflict_id} already exists.") for conflict_id in conflicts]))
+
+@router.post("/products/import", response_model=ImportResult, openapi_extra=CSV_REQUEST_BODY, responses={
+    200: {"description": "CSV file merged, existing IDs updated"},
+    415: {"description": "Body is not text/csv"},
+    422: {"description": "Invalid CSV header or value"}})
+async def import_products(request: Request, crud: ProductCRUD = Depends(get_product_crud)) -> ImportResult:
+    """Upsert products from a CSV file streamed straight into ``COPY``.
+
+    The body is a ``text/csv`` file whose header names the columns, ``id`` included.
+    On Postgres, it is never buffered in full: chunks are forwarded to the database as they arrive.
+
+    Args:
+        request (Request): The incoming request with the CSV body.
+        crud (ProductCRUD, optional): The CRUD instance. Defaults to Depends(get_product_crud).
+
+    Raises:
+        HTTPException: If the body is not CSV, or if its header or a value is invalid.
+
+    Returns:
+        ImportResult: The row counts of the import.
+    """
+    columns, source = await read_csv_upload(request, COLUMNS)
+    try:
+        return await crud.import_products(columns, source)
+    except InvalidData as error:
+        raise HTTPException(status_code=422, detail=str(error))
+
+@router.get("/products/", response_model=List[Product], responses={**EXPORT_RESPONSES, **NOT_MODIFIED_RESPONSES})
+async def read_products(request: Request, response: Response, page: Page = Depends(), crud: ProductCRUD = Depends(get_product_crud)) -> List[Product]:
+    """Get a page of products using keyset pagination on the ID.
+
+    When ``Accept`` asks for NDJSON, CSV, MessagePack or Arrow, all products after the
+    cursor are streamed instead, in fixed-size batches.
+
+    Args:
+        request (Request): The incoming request.
+        response (Response): The response whose headers are set.
+        page (Page): The pagination parameters. Defaults to Depends().
+        crud (ProductCRUD, optional): The CRUD instance. Defaults to Depends(get_product_crud).
+
+    Returns:
+        List[Product]: A page of products.
+    """
+    media_type = negotiate_export(request)
+    if media_type is not None:
+        return export_response(crud.stream_products(EXPORT_BATCH_SIZE, page.after_id), Product, media_type, "products")
+    products = paginate(request, response, await crud.get_products(page.limit + 1, page.after_id), page)
+    unchanged = not_modified(request, response, products)
+    if unchanged is not None:
+        return unchanged
+    return json_response(products, response)
 
 @router.get("/products/{product_id}", response_model=Product, responses={
+    **NOT_MODIFIED_RESPONSES,
     404: {"description": "Product not found"}})
-async def read_product(product_id: int, crud: ProductCRUD = Depends(get_product_crud)) -> Product:
+async def read_product(product_id: int, request: Request, response: Response, crud: ProductCRUD = Depends(get_product_crud)) -> Product:
     """Get a product by its ID.
 
     Args:
         product_id (int): The ID of the product to retrieve.
+        request (Request): The incoming request.
+        response (Response): The response whose headers are set.
         crud (ProductCRUD, optional): The CRUD instance. Defaults to Depends(get_product_crud).
 
     Raises:
@@ -68,7 +134,10 @@ async def read_product(product_id: int, crud: ProductCRUD = Depends(get_product_
     product = await crud.get_product(product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    return product
+    unchanged = not_modified(request, response, product)
+    if unchanged is not None:
+        return unchanged
+    return json_response(product, response)
 
 @router.delete("/products/{product_id}", status_code=204, responses={
     204: {"description": "Product successfully deleted"},
@@ -111,7 +180,7 @@ async def update_product(product_id: int, product: ProductCreate, crud: ProductC
     updated_product = await crud.update_product(product_id, product)
     if not updated_product:
         raise HTTPException(status_code=404, detail="Product not found")
-    return updated_product
+    return json_response(updated_product)
 
 @router.patch("/products/{product_id}", response_model=Product, responses={
     200: {"description": "Product successfully partially updated"}, 
@@ -133,4 +202,4 @@ async def partial_update_product(product_id: int, product: ProductUpdate, crud:
     updated_product = await crud.partial_update_product(product_id, product)
     if not updated_product:
         raise HTTPException(status_code=404, detail="Product not found")
-    return updated_product
\ No newline at end of file
+    return json_response(updated_product)
\ No newline at end of file
@@ -1,21 +1,27 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, Body
 from typing import List
 from models.product_category import ProductCategory, ProductCategoryCreate, ProductCategoryUpdate
+from models.bulk import BulkConflict, BulkCreateResult, MAX_BULK_SIZE
 from dependencies import get_db
+from pagination import Page, paginate
+from serialization import json_response
+from http_cache import NOT_MODIFIED_RESPONSES, REFERENCE_CACHE_CONTROL, not_modified
+from cache import get_cache
 from crud.product_category import ProductCategoryCRUD
 
 router = APIRouter()
 
-def get_product_category_crud(db=Depends(get_db)) -> ProductCategoryCRUD:
-    """Get a ProductCategoryCRUD instance.
+def get_product_category_crud(request: Request, db=Depends(get_db)) -> ProductCategoryCRUD:
+    """Get a ProductCategoryCRUD instance, backed by the product category cache when the application has one.
 
     Args:
+        request (Request): The incoming request.
         db (Optional[Depends]): Optional database dependency.
 
     Returns:
         ProductCategoryCRUD: An instance of ProductCategoryCRUD.
     """
-    return ProductCategoryCRUD(db)
+    return ProductCategoryCRUD(db, get_cache(request.app.state, "product_category"))
 
 @router.post("/product_categories/", response_model=ProductCategory, status_code=201, responses={
     201: {"description": "Product category successfully created"},
@@ -36,27 +42,56 @@ async def create_product_category(category: ProductCategoryCreate, crud: Product
     new_category = await crud.create_product_category(category)
     if new_category is None:
         raise HTTPException(status_code=409, detail=f"Product category with id {category.id} already exists.")
-    return new_category
+    return json_response(new_category, status_code=201)
 
-@router.get("/product_categories/", response_model=List[ProductCategory])
-async def read_product_categories(crud: ProductCategoryCRUD = Depends(get_product_category_crud)) -> List[ProductCategory]:
-    """Get a list of all product categories.
+@router.post("/product_categories/bulk", response_model=BulkCreateResult[ProductCategory], responses={
+    200: {"description": "Product categories created, existing IDs reported as conflicts"}})
+async def create_product_categories(categories: List[ProductCategoryCreate] = Body(..., max_length=MAX_BULK_SIZE), crud: ProductCategoryCRUD = Depends(get_product_category_crud)) -> BulkCreateResult[ProductCategory]:
+    """Create many product categories at once.
 
     Args:
+        categories (List[ProductCategoryCreate]): The product categories to create.
         crud (ProductCategoryCRUD, optional): The CRUD instance. Defaults to Depends(get_product_category_crud).
 
     Returns:
-        List[ProductCategory]: A list of all product categories.
+        BulkCreateResult[ProductCategory]: The created product categories and the rejected IDs.
     """
-    return await crud.get_product_categories()
+    created, conflicts = await crud.create_product_categories(categories)
+    return json_response(BulkCreateResult[ProductCategory](
+        created=created,
+        conflicts=[BulkConflict(id=conflict_id, detail=f"Product category with id {conflict_id} already exists.") for conflict_id in conflicts]))
+
+@router.get("/product_categories/", response_model=List[ProductCategory], responses=NOT_MODIFIED_RESPONSES)
+async def read_product_categories(request: Request, response: Response, page: Page = Depends(), crud: ProductCategoryCRUD = Depends(get_product_category_crud)) -> List[ProductCategory]:
+    """Get a page of product categories using keyset pagination on the ID.
+
+    Args:
+        request (Request): The incoming request.
+        response (Response): The response whose headers are set.
+        page (Page): The pagination parameters. Defaults to Depends().
+        crud (ProductCategoryCRUD, optional): The CRUD instance. Defaults to Depends(get_product_category_crud).
+
+    Returns:
+        List[ProductCategory]: A page of product categories.
+    """
+    product_categories = paginate(request, response, await crud.get_product_categories(page.limit + 1, page.after_id), page)
+    unchanged = not_modified(request, response, product_categories, REFERENCE_CACHE_CONTROL)
+    if unchanged is not None:
+        return unchanged
+    if crud.cache is not None:
+        return crud.cache.response(product_categories, response)
+    return json_response(product_categories, response)
 
 @router.get("/product_categories/{category_id}", response_model=ProductCategory, responses={
+    **NOT_MODIFIED_RESPONSES,
     404: {"description": "Product category not found"}})
-async def read_product_category(category_id: int, crud: ProductCategoryCRUD = Depends(get_product_category_crud)) -> ProductCategory:
+async def read_product_category(category_id: int, request: Request, response: Response, crud: ProductCategoryCRUD = Depends(get_product_category_crud)) -> ProductCategory:
     """Get a product category by its ID.
 
     Args:
         category_id (int): The ID of the product category to retrieve.
+        request (Request): The incoming request.
+        response (Response): The response whose headers are set.
         crud (ProductCategoryCRUD, optional): The CRUD instance. Defaults to Depends(get_product_category_crud).
 
     Raises:
@@ -68,7 +103,12 @@ async def read_product_category(category_id: int, crud: ProductCategoryCRUD = De
     category = await crud.get_product_category(category_id)
     if not category:
         raise HTTPException(status_code=404, detail="Product category not found")
-    return category
+    unchanged = not_modified(request, response, category, REFERENCE_CACHE_CONTROL)
+    if unchanged is not None:
+        return unchanged
+    if crud.cache is not None:
+        return crud.cache.response(category, response)
+    return json_response(category, response)
 
 @router.delete("/product_categories/{category_id}", status_code=204, responses={
     204: {"description": "Product category successfully deleted"},
@@ -111,7 +151,7 @@ async def update_product_category(category_id: int, category: ProductCategoryCre
     updated_category = await crud.update_product_category(category_id, category)
     if not updated_category:
         raise HTTPException(status_code=404, detail="Product category not found")
-    return updated_category
+    return json_response(updated_category)
 
 @router.patch("/product_categories/{category_id}", response_model=ProductCategory, responses={
     200: {"description": "Product category successfully partially updated"}, 
@@ -133,4 +173,4 @@ async def partial_update_product_category(category_id: int, category: ProductCat
     updated_category = await crud.partial_update_product_category(category_id, category)
     if not updated_category:
         raise HTTPException(status_code=404, detail="Product category not found")
-    return updated_category
+    return json_response(updated_category)
@@ -0,0 +1,155 @@
+import csv
+import io
+import json
+import os
+import msgpack
+import pyarrow as pa
+from datetime import date
+from asyncpg import Record
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import Any, AsyncIterator, List, Optional, Sequence, Type
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CSV_MEDIA_TYPE = "text/csv"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+EXPORT_MEDIA_TYPES = (NDJSON_MEDIA_TYPE, CSV_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, ARROW_MEDIA_TYPE)
+
+# File extension suggested for each export format
+EXPORT_EXTENSIONS = {NDJSON_MEDIA_TYPE: "ndjson", CSV_MEDIA_TYPE: "csv", MSGPACK_MEDIA_TYPE: "msgpack", ARROW_MEDIA_TYPE: "arrows"}
+
+# Arrow type of each column type of the models; Postgres ``int`` columns are 32-bit
+ARROW_TYPES = {int: pa.int32(), str: pa.string(), date: pa.date32()}
+
+# End-of-stream marker of the Arrow IPC streaming format
+ARROW_END_OF_STREAM = b"\xff\xff\xff\xff\x00\x00\x00\x00"
+
+# Rows fetched from the server-side cursor per round trip, overridable from the .env file
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+
+# OpenAPI description of the export formats, merged into the list endpoint responses
+EXPORT_RESPONSES = {200: {"content": {media_type: {} for media_type in EXPORT_MEDIA_TYPES},
+                          "description": "Successful Response. The whole table is streamed when `Accept` asks for NDJSON, CSV, MessagePack or an Arrow IPC stream."}}
+
+def negotiate_export(request: Request) -> Optional[str]:
+    """Pick the streaming export format requested through the ``Accept`` header.
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        Optional[str]: The export media type, or None when the regular JSON page is preferred.
+    """
+    accept = request.headers.get("accept")
+    if not accept:
+        return None
+    best, best_quality = None, 0.0
+    for entry in accept.split(","):
+        media_type, _, params = entry.strip().partition(";")
+        media_type = media_type.strip().lower()
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > best_quality and (media_type in EXPORT_MEDIA_TYPES or media_type == "application/json"):
+            best, best_quality = media_type, quality
+    return best if best in EXPORT_MEDIA_TYPES else None
+
+def _encode_ndjson(batch: List[Record]) -> bytes:
+    return "".join(json.dumps(dict(record), default=str) + "\n" for record in batch).encode()
+
+def _encode_csv(batch: List[Record], header: Optional[Sequence[str]] = None) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header is not None:
+        writer.writerow(header)
+    writer.writerows(record.values() for record in batch)
+    return buffer.getvalue().encode()
+
+def _encode_msgpack_value(value: Any) -> Any:
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not MessagePack serializable")
+
+def _encode_msgpack(batch: List[Record], packer: msgpack.Packer) -> bytes:
+    return b"".join(packer.pack(dict(record)) for record in batch)
+
+def arrow_schema(model: Type[BaseModel]) -> pa.Schema:
+    """Build the Arrow schema of the rows of a model.
+
+    Args:
+        model (Type[BaseModel]): The model, whose fields are ``int``, ``str`` or ``date``.
+
+    Returns:
+        pa.Schema: One nullable field per model field, in the same order.
+    """
+    return pa.schema([(name, ARROW_TYPES[field.annotation]) for name, field in model.model_fields.items()])
+
+def record_batch(batch: Sequence[Record], schema: pa.Schema) -> pa.RecordBatch:
+    """Build an Arrow record batch column by column from database rows.
+
+    Each column is gathered straight from the records, then converted by Arrow in
+    one call, without building any object per row.
+
+    Args:
+        batch (Sequence[Record]): The rows, with a column named after each field of `schema`.
+        schema (pa.Schema): The schema of the batch.
+
+    Returns:
+        pa.RecordBatch: The record batch.
+    """
+    columns = [pa.array([record[field.name] for record in batch], type=field.type) for field in schema]
+    return pa.record_batch(columns, schema=schema)
+
+def _encode_arrow(batch: List[Record], schema: pa.Schema) -> bytes:
+    return record_batch(batch, schema).serialize().to_pybytes()
+
+async def _encode(batches: AsyncIterator[List[Record]], model: Type[BaseModel], media_type: str) -> AsyncIterator[bytes]:
+    if media_type == NDJSON_MEDIA_TYPE:
+        async for batch in batches:
+            yield _encode_ndjson(batch)
+        return
+    if media_type == MSGPACK_MEDIA_TYPE:
+        packer = msgpack.Packer(default=_encode_msgpack_value)
+        async for batch in batches:
+            yield _encode_msgpack(batch, packer)
+        return
+    if media_type == ARROW_MEDIA_TYPE:
+        schema = arrow_schema(model)
+        yield schema.serialize().to_pybytes()
+        async for batch in batches:
+            yield _encode_arrow(batch, schema)
+        yield ARROW_END_OF_STREAM
+        return
+    header = list(model.model_fields)
+    async for batch in batches:
+        yield _encode_csv(batch, header)
+        header = None
+    if header is not None:
+        yield _encode_csv([], header)
+
+def export_response(batches: AsyncIterator[List[Record]], model: Type[BaseModel], media_type: str, filename: str) -> StreamingResponse:
+    """Stream batches of records as NDJSON, CSV, MessagePack or an Arrow IPC stream.
+
+    Each batch is encoded and written on its own, so memory use is bounded by the
+    batch size and not by the size of the table. No model is built per row: NDJSON
+    and MessagePack write one map per record, one after the other, and each Arrow
+    record batch is built column by column from the records.
+
+    Args:
+        batches (AsyncIterator[List[Record]]): The record batches, e.g. read from a server-side cursor.
+        model (Type[BaseModel]): The model of the rows, whose fields give the columns and their types.
+        media_type (str): One of `EXPORT_MEDIA_TYPES`.
+        filename (str): The base name suggested to clients saving the export.
+
+    Returns:
+        StreamingResponse: The streaming response.
+    """
+    headers = {"Content-Disposition": f'attachment; filename="{filename}.{EXPORT_EXTENSIONS[media_type]}"'}
+    return StreamingResponse(_encode(batches, model, media_type), media_type=media_type, headers=headers)
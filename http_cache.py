@@ -0,0 +1,100 @@
+import hashlib
+import os
+from fastapi import Request, Response
+from pydantic import BaseModel
+from typing import List, Optional, Union
+
+# Seconds clients may reuse reference-table responses, overridable from the .env file
+REFERENCE_MAX_AGE = int(os.getenv("REFERENCE_MAX_AGE", "60"))
+REFERENCE_CACHE_CONTROL = f"public, max-age={REFERENCE_MAX_AGE}"
+
+# OpenAPI description of the conditional GET answer, merged into the GET endpoint responses
+NOT_MODIFIED_RESPONSES = {304: {"description": "Not modified since the ETag sent in If-None-Match"}}
+
+# OpenAPI description of a failed If-Match, merged into the write endpoint responses
+PRECONDITION_FAILED_RESPONSES = {412: {"description": "Changed since the ETag sent in If-Match"}}
+
+def compute_etag(content: Union[BaseModel, List[BaseModel]], *extra: Optional[str]) -> str:
+    """Compute a strong ETag from the field values of the returned rows.
+
+    The rows are hashed as they come from the database, before any JSON encoding.
+
+    Args:
+        content (Union[BaseModel, List[BaseModel]]): A row or a list of rows.
+        *extra (Optional[str]): Other values the representation depends on, such as the ``Link`` header.
+
+    Returns:
+        str: The quoted ETag.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for item in content if isinstance(content, list) else (content,):
+        digest.update(repr(tuple(item.__dict__.values())).encode())
+        digest.update(b"\x00")
+    for value in extra:
+        digest.update(repr(value).encode())
+    return f'"{digest.hexdigest()}"'
+
+def version_etag(version: int) -> str:
+    """Build the strong ETag of a row version.
+
+    Args:
+        version (int): The version of the row.
+
+    Returns:
+        str: The quoted ETag.
+    """
+    return f'"{version}"'
+
+def parse_if_match(request: Request) -> Optional[List[int]]:
+    """Read the row versions accepted by the ``If-Match`` header of a write.
+
+    Weak ETags never match, as required for ``If-Match``, and neither do ETags that
+    are not row versions, such as the content hashes of expanded representations.
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        Optional[List[int]]: The accepted versions, possibly none, or None when any version is accepted (no header or ``*``).
+    """
+    if_match = request.headers.get("if-match")
+    if if_match is None or if_match.strip() == "*":
+        return None
+    versions = []
+    for candidate in if_match.split(","):
+        candidate = candidate.strip()
+        if len(candidate) > 2 and candidate[0] == candidate[-1] == '"' and candidate[1:-1].isdigit():
+            versions.append(int(candidate[1:-1]))
+    return versions
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in if_none_match.split(","))
+
+def not_modified(request: Request, response: Response, content: Union[BaseModel, List[BaseModel]], cache_control: Optional[str] = None, etag: Optional[str] = None) -> Optional[Response]:
+    """Tag a GET response and answer a matching ``If-None-Match`` with 304.
+
+    The ``ETag`` (and ``Cache-Control``, if given) headers are set on `response`. When
+    the client already holds this representation, a bodiless 304 response is returned
+    and the endpoint skips serialization altogether.
+
+    Args:
+        request (Request): The incoming request.
+        response (Response): The response whose headers are set.
+        content (Union[BaseModel, List[BaseModel]]): The rows about to be returned.
+        cache_control (Optional[str]): The ``Cache-Control`` header value. Defaults to None.
+        etag (Optional[str]): The ETag, e.g. from `version_etag`. Defaults to None, for the hash of `content`.
+
+    Returns:
+        Optional[Response]: The 304 response, or None when the body must be sent.
+    """
+    if etag is None:
+        etag = compute_etag(content, response.headers.get("link"))
+    response.headers["ETag"] = etag
+    if cache_control is not None:
+        response.headers["Cache-Control"] = cache_control
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and _matches(if_none_match, etag):
+        return Response(status_code=304, headers=dict(response.headers))
+    return None
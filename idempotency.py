@@ -0,0 +1,231 @@
+import asyncio
+import hashlib
+import os
+import re
+import time
+from collections import OrderedDict
+from fastapi.responses import JSONResponse
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Seconds a stored response is replayed to the retries of its request, overridable from the .env file
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+# Number of stored responses kept per worker, the oldest are dropped first
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+# Bytes of stored response bodies kept per worker, the oldest are dropped first
+IDEMPOTENCY_MAX_BYTES = int(os.getenv("IDEMPOTENCY_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Header naming a request whose retries must not run it again, and the one marking a replayed response
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+# Longest key accepted
+MAX_KEY_LENGTH = 255
+
+# Paths of the create and bulk endpoints, the only ones honoring the header
+IDEMPOTENT_PATHS = re.compile(r"/v1/\w+/(?:bulk)?")
+
+class StoredResponse:
+    """Response of a request, kept for the retries sent with the same key.
+
+    Attributes:
+        fingerprint (bytes): The digest of the request body, which the retries must repeat.
+        status (int): The status code.
+        headers (List[Tuple[bytes, bytes]]): The raw headers.
+        body (bytes): The body.
+        expires (float): The `time.monotonic` time after which the response is dropped.
+    """
+    def __init__(self, fingerprint: bytes, status: int, headers: List[Tuple[bytes, bytes]], body: bytes, expires: float) -> None:
+        """Initialize the stored response.
+
+        Args:
+            fingerprint (bytes): The digest of the request body.
+            status (int): The status code.
+            headers (List[Tuple[bytes, bytes]]): The raw headers.
+            body (bytes): The body.
+            expires (float): The `time.monotonic` time after which the response is dropped.
+        """
+        self.fingerprint = fingerprint
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.expires = expires
+
+class IdempotencyStore:
+    """Bounded in-process store of the responses of keyed requests, and of the requests in flight.
+
+    Responses are kept in insertion order, which is also their expiry order since
+    they share the same TTL: dropping from the front both expires them and bounds
+    the store by number and by body size. Each request in flight has a future the
+    duplicates wait on, resolved once its response is stored or has failed.
+
+    Attributes:
+        ttl (float): The seconds a response is kept.
+        max_keys (int): The number of responses kept.
+        max_bytes (int): The total body size of the responses kept.
+    """
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL, max_keys: int = IDEMPOTENCY_MAX_KEYS, max_bytes: int = IDEMPOTENCY_MAX_BYTES) -> None:
+        """Initialize an empty store.
+
+        Args:
+            ttl (float): The seconds a response is kept. Defaults to IDEMPOTENCY_TTL.
+            max_keys (int): The number of responses kept. Defaults to IDEMPOTENCY_MAX_KEYS.
+            max_bytes (int): The total body size of the responses kept. Defaults to IDEMPOTENCY_MAX_BYTES.
+        """
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.max_bytes = max_bytes
+        self._responses: "OrderedDict[str, StoredResponse]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._bytes = 0
+
+    def get(self, key: str) -> Optional[StoredResponse]:
+        """Get the unexpired response of a key.
+
+        Args:
+            key (str): The key.
+
+        Returns:
+            Optional[StoredResponse]: The response, or None if there is none.
+        """
+        self._expire()
+        return self._responses.get(key)
+
+    def in_flight(self, key: str) -> Optional[asyncio.Future]:
+        """Get the future of the request running with a key.
+
+        Args:
+            key (str): The key.
+
+        Returns:
+            Optional[asyncio.Future]: The future, resolved when the request ends, or None if no request runs.
+        """
+        return self._in_flight.get(key)
+
+    def start(self, key: str) -> None:
+        """Mark a key as in flight, so its duplicates wait for it.
+
+        Args:
+            key (str): The key, neither stored nor in flight.
+        """
+        self._in_flight[key] = asyncio.get_running_loop().create_future()
+
+    def finish(self, key: str, response: Optional[StoredResponse]) -> None:
+        """Store the response of a key, if any, and wake up its duplicates.
+
+        Args:
+            key (str): The key in flight.
+            response (Optional[StoredResponse]): The response, or None when it must not be replayed.
+        """
+        if response is not None and len(response.body) <= self.max_bytes:
+            self._responses[key] = response
+            self._bytes += len(response.body)
+            while len(self._responses) > self.max_keys or self._bytes > self.max_bytes:
+                self._drop_oldest()
+        self._in_flight.pop(key).set_result(None)
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        while self._responses and next(iter(self._responses.values())).expires <= now:
+            self._drop_oldest()
+
+    def _drop_oldest(self) -> None:
+        _, response = self._responses.popitem(last=False)
+        self._bytes -= len(response.body)
+
+class IdempotencyMiddleware:
+    """Run a create or bulk request once per ``Idempotency-Key``, replaying its response to the retries.
+
+    The body of a keyed POST is read first and hashed. A retry with the same key
+    and body gets the stored response, marked ``Idempotent-Replayed: true``, without
+    reaching the endpoint; a duplicate arriving while the first request runs waits
+    for it instead of racing it. Reusing a key with another body answers ``422``.
+    Server errors are not stored, so their retries run again. Keys are scoped to
+    the path, and the store is per worker: with several workers, a retry or a
+    duplicate reaching another worker runs its request again.
+
+    Attributes:
+        store (IdempotencyStore): The responses and the requests in flight.
+    """
+    def __init__(self, app: Callable[..., Awaitable[None]], store: Optional[IdempotencyStore] = None) -> None:
+        """Wrap an ASGI application.
+
+        Args:
+            app (Callable[..., Awaitable[None]]): The wrapped application.
+            store (Optional[IdempotencyStore]): The store. Defaults to None, for a new store with the default bounds.
+        """
+        self.app = app
+        self.store = store or IdempotencyStore()
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable[..., Awaitable[Any]], send: Callable[..., Awaitable[None]]) -> None:
+        """Handle an ASGI call.
+
+        Args:
+            scope (Dict[str, Any]): The connection scope.
+            receive (Callable[..., Awaitable[Any]]): The receive channel.
+            send (Callable[..., Awaitable[None]]): The send channel.
+        """
+        header = IDEMPOTENCY_HEADER.lower().encode()
+        idempotency_key = next((value for name, value in scope.get("headers", ()) if name == header), None) if scope["type"] == "http" else None
+        if idempotency_key is None or scope["method"] != "POST" or not IDEMPOTENT_PATHS.fullmatch(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        if not 0 < len(idempotency_key) <= MAX_KEY_LENGTH:
+            await JSONResponse({"detail": f"{IDEMPOTENCY_HEADER} must have 1 to {MAX_KEY_LENGTH} characters"}, status_code=400)(scope, receive, send)
+            return
+
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body += message.get("body", b"")
+            if not message.get("more_body", False):
+                break
+        fingerprint = hashlib.sha256(body).digest()
+        key = f"{scope['path']} {idempotency_key.decode('latin-1')}"
+
+        while True:
+            stored = self.store.get(key)
+            if stored is not None:
+                await self._replay(stored, fingerprint, scope, receive, send)
+                return
+            running = self.store.in_flight(key)
+            if running is None:
+                break
+            # Shielded, so that a duplicate whose client gives up does not cancel the wait of the others
+            await asyncio.shield(running)
+
+        self.store.start(key)
+        response: Optional[StoredResponse] = None
+        start: Dict[str, Any] = {}
+        chunks = bytearray()
+        delivered = False
+
+        async def receive_body() -> Dict[str, Any]:
+            nonlocal delivered
+            if delivered:
+                return await receive()
+            delivered = True
+            return {"type": "http.request", "body": bytes(body), "more_body": False}
+
+        async def send_and_keep(message: Dict[str, Any]) -> None:
+            nonlocal response
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.extend(message.get("body", b""))
+                if not message.get("more_body", False) and start["status"] < 500:
+                    response = StoredResponse(fingerprint, start["status"], list(start.get("headers", [])), bytes(chunks), time.monotonic() + self.store.ttl)
+            await send(message)
+
+        try:
+            await self.app(scope, receive_body, send_and_keep)
+        finally:
+            self.store.finish(key, response)
+
+    @staticmethod
+    async def _replay(stored: StoredResponse, fingerprint: bytes, scope: Dict[str, Any], receive: Callable[..., Awaitable[Any]], send: Callable[..., Awaitable[None]]) -> None:
+        if stored.fingerprint != fingerprint:
+            await JSONResponse({"detail": f"{IDEMPOTENCY_HEADER} was already used with another request body"}, status_code=422)(scope, receive, send)
+            return
+        await send({"type": "http.response.start", "status": stored.status, "headers": [*stored.headers, (REPLAYED_HEADER.lower().encode(), b"true")]})
+        await send({"type": "http.response.body", "body": stored.body})
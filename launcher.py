@@ -0,0 +1,163 @@
+"""Run the API with several worker processes sharing one Postgres connection budget.
+
+    python -m launcher [--host HOST] [--port PORT] [--workers N]
+
+Each worker gets an equal share of the budget for its connection pool, so the
+total stays below the ``max_connections`` of the server, and writes its metrics
+to ``PROMETHEUS_MULTIPROC_DIR`` so that ``/metrics`` covers every worker. Send SIGHUP to the
+launcher to restart the workers one at a time: each one stops accepting
+connections, finishes its in-flight requests, then closes its pools in the
+lifespan shutdown before its replacement starts.
+"""
+import argparse
+import asyncio
+import importlib.util
+import logging
+import os
+import tempfile
+import asyncpg
+from prometheus_client import multiprocess
+from uvicorn.config import Config
+from uvicorn.server import Server
+from uvicorn.supervisors import Multiprocess
+from dependencies import DATABASE_URL, DB_POOL_MIN_SIZE
+from idempotency import IDEMPOTENCY_HEADER
+from replicas import DATABASE_REPLICA_SIMULATED_LAG, DATABASE_REPLICA_URLS
+from typing import Callable, List, Optional
+
+logger = logging.getLogger("uvicorn.error")
+
+# Launcher settings, overridable from the .env file
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "0")) or os.cpu_count() or 1
+# Connections all workers may open on the primary, 0 to derive it from max_connections
+DB_CONNECTION_BUDGET = int(os.getenv("DB_CONNECTION_BUDGET", "0"))
+# Connections left for other clients (psql, pgAdmin, migrations) when the budget is derived
+DB_RESERVED_CONNECTIONS = int(os.getenv("DB_RESERVED_CONNECTIONS", "5"))
+# Seconds a stopping worker waits for its in-flight requests
+GRACEFUL_SHUTDOWN_TIMEOUT = float(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", "30"))
+
+def pick_loop() -> str:
+    """Get the fastest event loop implementation installed.
+
+    Returns:
+        str: ``uvloop`` when installed, ``asyncio`` otherwise.
+    """
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+def pick_http() -> str:
+    """Get the fastest HTTP parser installed.
+
+    Returns:
+        str: ``httptools`` when installed, ``h11`` otherwise.
+    """
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+async def server_budget() -> int:
+    """Derive the connection budget from the settings of the primary.
+
+    Returns:
+        int: The connections left once the superuser and reserved connections are set aside.
+    """
+    connection = await asyncpg.connect(DATABASE_URL)
+    try:
+        max_connections = int(await connection.fetchval("SHOW max_connections"))
+        superuser_reserved = int(await connection.fetchval("SHOW superuser_reserved_connections"))
+    finally:
+        await connection.close()
+    return max_connections - superuser_reserved - DB_RESERVED_CONNECTIONS
+
+def pool_size(budget: int, workers: int) -> int:
+    """Get the pool size of each worker so that all workers fit in the budget.
+
+    Besides its pool, a worker holds the ``LISTEN`` connection of the reference
+    caches and, when a lag is simulated, a second pool on the primary.
+
+    Args:
+        budget (int): The connections all workers may open on the primary.
+        workers (int): The number of workers.
+
+    Raises:
+        SystemExit: If the budget cannot give each worker a pool of at least one connection.
+
+    Returns:
+        int: The maximum size of each pool.
+    """
+    pools = 2 if DATABASE_REPLICA_SIMULATED_LAG > 0 and not DATABASE_REPLICA_URLS else 1
+    size = (budget // workers - 1) // pools
+    if size < 1:
+        raise SystemExit(f"A budget of {budget} connections is too small for {workers} workers, lower --workers or raise DB_CONNECTION_BUDGET")
+    return size
+
+class BudgetedMultiprocess(Multiprocess):
+    """Uvicorn supervisor whose worker count is fixed by the connection budget.
+
+    SIGHUP is handled by `Multiprocess.restart_all`, which restarts the workers one
+    after the other, each draining before its replacement starts, so the budget
+    holds during the restart too.
+    """
+    def handle_ttin(self) -> None:
+        """Refuse to add a worker, which would exceed the connection budget."""
+        logger.warning("Received SIGTTIN, but the number of workers is fixed by the connection budget.")
+
+    def _replace(self, method: Callable[[], None]) -> None:
+        pids = {process.pid for process in self.processes}
+        method()
+        # Drop the live gauges of the workers that were replaced
+        for pid in pids - {process.pid for process in self.processes}:
+            multiprocess.mark_process_dead(pid)
+
+    def restart_all(self) -> None:
+        """Restart the workers one at a time."""
+        self._replace(super().restart_all)
+
+    def keep_subprocess_alive(self) -> None:
+        """Replace the workers that died."""
+        self._replace(super().keep_subprocess_alive)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Parse the command line and run the workers.
+
+    Args:
+        argv (Optional[List[str]]): The command line arguments. Defaults to None, for sys.argv.
+    """
+    parser = argparse.ArgumentParser(description="Run the API with several worker processes.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind.")
+    parser.add_argument("--port", type=int, default=8000, help="Port to bind.")
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY, help="Number of worker processes, defaults to WEB_CONCURRENCY or the CPU count.")
+    args = parser.parse_args(argv)
+
+    budget = DB_CONNECTION_BUDGET or asyncio.run(server_budget())
+    size = pool_size(budget, args.workers)
+    if "DB_POOL_MAX_SIZE" in os.environ:
+        size = min(size, int(os.environ["DB_POOL_MAX_SIZE"]))
+    # Read by dependencies.py when the workers import it
+    os.environ["DB_POOL_MAX_SIZE"] = str(size)
+    os.environ["DB_POOL_MIN_SIZE"] = str(min(DB_POOL_MIN_SIZE, size))
+    if args.workers > 1:
+        logger.warning(f"{IDEMPOTENCY_HEADER} responses are kept per worker: with {args.workers} workers, a retry or a concurrent duplicate reaching another worker runs its request again")
+        # Read by prometheus_client in the workers, so /metrics aggregates all of them
+        metrics_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR") or tempfile.mkdtemp(prefix="prometheus-")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = metrics_dir
+        for name in os.listdir(metrics_dir):
+            if name.endswith(".db"):
+                os.remove(os.path.join(metrics_dir, name))
+
+    config = Config(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop=pick_loop(),
+        http=pick_http(),
+        timeout_graceful_shutdown=GRACEFUL_SHUTDOWN_TIMEOUT,
+    )
+    logger.info(f"Starting {args.workers} workers with {config.loop} and {config.http}, {size} pooled connections each out of {budget}")
+    server = Server(config)
+    if args.workers == 1:
+        server.run()
+        return
+    sock = config.bind_socket()
+    BudgetedMultiprocess(config, target=server.run, sockets=[sock]).run()
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,81 @@
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
-from dependencies import connect_db
-from endpoints import country, product_category, customer, product, installation
+from dependencies import STORAGE_BACKEND, create_pool, get_memory_storage
+from cache import CacheListener, ReferenceCache
+from crud.analytics import AnalyticsRefresher
+from replicas import ConsistencyTokenMiddleware, ReplicaSet
+from idempotency import IdempotencyMiddleware
+from metrics import MetricsMiddleware, MetricsSampler
+from models.country import Country
+from models.product_category import ProductCategory
+from endpoints import country, product_category, customer, product, installation, analytics, admin, metrics
 from typing import AsyncGenerator
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     """Manage the lifespan of the FastAPI application.
 
+    The shared connection pool of the primary, and those of the replicas if any, are
+    created on startup and closed on shutdown. The reference-table caches are filled
+    on startup and kept in sync through a dedicated ``LISTEN`` connection, and the
+    analytics views are refreshed and the metrics sampled in the background.
+    With the memory backend there is no database: the memory storage is seeded on
+    startup and only the event loop is sampled.
+
     Args:
         app (FastAPI): The FastAPI application instance.
 
     Yields:
         None: Indicates that the lifespan context is active.
     """
-    app.state.db = await connect_db()
+    if STORAGE_BACKEND == "memory":
+        get_memory_storage()
+        sampler = MetricsSampler({})
+        sampler.start()
+        try:
+            yield
+        finally:
+            await sampler.stop()
+        return
+    app.state.db = await create_pool()
+    app.state.replicas = await ReplicaSet.create(app.state.db)
+    app.state.caches = {
+        "country": ReferenceCache("country", Country, app.state.db),
+        "product_category": ReferenceCache("product_category", ProductCategory, app.state.db),
+    }
+    listener = CacheListener(app.state.caches)
+    refresher = AnalyticsRefresher(app.state.db)
+    pools = {"primary": app.state.db}
+    if app.state.replicas is not None:
+        pools.update((replica.name, replica.pool) for replica in app.state.replicas.replicas)
+    sampler = MetricsSampler(pools)
     try:
+        if app.state.replicas is not None:
+            await app.state.replicas.start()
+        await listener.start()
+        for cache in app.state.caches.values():
+            await cache.load(app.state.db)
+        refresher.start()
+        sampler.start()
         yield
     finally:
+        await sampler.stop()
+        await refresher.stop()
+        await listener.stop()
+        if app.state.replicas is not None:
+            await app.state.replicas.stop()
         await app.state.db.close()
 
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(ConsistencyTokenMiddleware)
+app.add_middleware(IdempotencyMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(country.router, prefix="/v1")
 app.include_router(customer.router, prefix="/v1")
 app.include_router(product_category.router, prefix="/v1")
 app.include_router(product.router, prefix="/v1")
-app.include_router(installation.router, prefix="/v1")
\ No newline at end of file
+app.include_router(installation.router, prefix="/v1")
+app.include_router(analytics.router, prefix="/v1")
+app.include_router(admin.router, prefix="/v1")
+app.include_router(metrics.router)
\ No newline at end of file
@@ -0,0 +1,156 @@
+import asyncio
+import os
+import time
+from fastapi import Response
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest
+from prometheus_client import multiprocess
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Set by the launcher when several workers run: every worker then writes its samples
+# to files of this directory, and a scrape of any worker aggregates all of them
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+# Seconds between two samples of the event loop lag and of the pool gauges
+METRICS_SAMPLE_INTERVAL = float(os.getenv("METRICS_SAMPLE_INTERVAL", "1"))
+# Buffered requests moved into the metrics between two yields to the event loop
+METRICS_FLUSH_BATCH = int(os.getenv("METRICS_FLUSH_BATCH", "1000"))
+
+HTTP_REQUEST_DURATION = Histogram("http_request_duration_seconds", "Duration of HTTP requests, response body included.", ["method", "route"])
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by status code.", ["method", "route", "status"])
+DB_QUERY_DURATION = Histogram("db_query_duration_seconds", "Duration of the statements of the CRUD layer, connection acquisition included.", ["statement"])
+DB_POOL_ACQUIRE_DURATION = Histogram("db_pool_acquire_seconds", "Time waited for a pooled connection.", buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0))
+DB_POOL_SIZE = Gauge("db_pool_size", "Open connections of the pools.", ["pool"], multiprocess_mode="livesum")
+DB_POOL_IN_USE = Gauge("db_pool_in_use", "Connections of the pools lent to a query.", ["pool"], multiprocess_mode="livesum")
+EVENT_LOOP_LAG = Gauge("event_loop_lag_seconds", "Delay of the last event loop wake-up of a worker.", multiprocess_mode="livemax")
+
+# Route label of the requests that matched no route, so unknown paths do not create new series
+UNMATCHED_ROUTE = "unmatched"
+# Methods labelled as sent, any other is labelled OTHER_METHOD so clients cannot create new series
+HTTP_METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "CONNECT", "TRACE"})
+OTHER_METHOD = "other"
+
+# Requests served since the last flush, as (method, route, status, seconds)
+PENDING_REQUESTS: List[Tuple[str, Any, int, float]] = []
+
+# Labelled children already looked up, by (method, route) and (method, route, status)
+_durations: Dict[Tuple[str, str], Any] = {}
+_counts: Dict[Tuple[str, str, int], Any] = {}
+
+def flush_request_metrics(limit: Optional[int] = None) -> None:
+    """Move the buffered requests into the HTTP histogram and counter.
+
+    Called by `MetricsSampler` every interval and before every scrape, so the
+    request path only appends to a list.
+
+    Args:
+        limit (Optional[int]): The number of oldest requests to move. Defaults to None, for all of them.
+    """
+    pending = PENDING_REQUESTS[:limit]
+    del PENDING_REQUESTS[:len(pending)]
+    for method, route, status, elapsed in pending:
+        key = (method if method in HTTP_METHODS else OTHER_METHOD, route.path if route is not None else UNMATCHED_ROUTE)
+        duration = _durations.get(key)
+        if duration is None:
+            duration = _durations[key] = HTTP_REQUEST_DURATION.labels(*key)
+        duration.observe(elapsed)
+        count = _counts.get((*key, status))
+        if count is None:
+            count = _counts[(*key, status)] = HTTP_REQUESTS.labels(*key, str(status))
+        count.inc()
+
+class MetricsMiddleware:
+    """Time every HTTP request and count its status code, by route template.
+
+    A request only costs two clock reads and a list append: the observations are
+    buffered in `PENDING_REQUESTS` and moved into Prometheus by `MetricsSampler`
+    or a scrape, off the request path. The 1 µs budget is not met: the wrapper of
+    ``send`` that reads the status code adds two coroutine calls per request, which
+    take most of the measured 2 µs on CPython 3.11.
+    """
+    def __init__(self, app: Callable[..., Awaitable[None]]) -> None:
+        """Wrap an ASGI application.
+
+        Args:
+            app (Callable[..., Awaitable[None]]): The wrapped application.
+        """
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable[..., Awaitable[Any]], send: Callable[..., Awaitable[None]]) -> None:
+        """Handle an ASGI call.
+
+        Args:
+            scope (Dict[str, Any]): The connection scope.
+            receive (Callable[..., Awaitable[Any]]): The receive channel.
+            send (Callable[..., Awaitable[None]]): The send channel.
+        """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_with_status(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            PENDING_REQUESTS.append((scope["method"], scope.get("route"), status, time.perf_counter() - start))
+
+class MetricsSampler:
+    """Background task sampling the event loop lag and the pool gauges of a worker, and flushing its request metrics."""
+    def __init__(self, pools: Dict[str, Any], interval: float = METRICS_SAMPLE_INTERVAL) -> None:
+        """Initialize the sampler.
+
+        Args:
+            pools (Dict[str, Any]): The connection pools by name.
+            interval (float): Seconds between two samples. Defaults to METRICS_SAMPLE_INTERVAL.
+        """
+        self.pools = pools
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the background task."""
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task, flushing the requests it has not flushed yet."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        flush_request_metrics()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            EVENT_LOOP_LAG.set(max(0.0, loop.time() - expected))
+            # In batches, so a busy interval does not stall the requests waiting on the loop
+            while PENDING_REQUESTS:
+                flush_request_metrics(METRICS_FLUSH_BATCH)
+                await asyncio.sleep(0)
+            for name, pool in self.pools.items():
+                size = pool.get_size()
+                DB_POOL_SIZE.labels(name).set(size)
+                DB_POOL_IN_USE.labels(name).set(size - pool.get_idle_size())
+
+def metrics_response() -> Response:
+    """Render the metrics of every worker in the Prometheus text format.
+
+    Returns:
+        Response: The metrics.
+    """
+    flush_request_metrics()
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,75 @@
+from pydantic import BaseModel
+from typing import Generic, List, Optional, TypeVar
+from datetime import date, datetime
+
+T = TypeVar("T")
+
+class CategoryMonthCount(BaseModel):
+    """Installations of a month for a product category.
+
+    Attributes:
+        month (date): The first day of the month.
+        category_id (int): The ID of the product category.
+        category_name (str): The name of the product category.
+        installations (int): The number of installations.
+    """
+    month: date
+    category_id: int
+    category_name: str
+    installations: int
+
+class CountryMonthCount(BaseModel):
+    """Installations of a month for the customers of a country.
+
+    Attributes:
+        month (date): The first day of the month.
+        country_id (int): The ID of the country.
+        country_name (str): The name of the country.
+        region (str): The region of the country.
+        installations (int): The number of installations.
+    """
+    month: date
+    country_id: int
+    country_name: str
+    region: str
+    installations: int
+
+class RegionProductRank(BaseModel):
+    """Product ranked by its installations for the customers of a region.
+
+    Attributes:
+        region (str): The region.
+        rank (int): The rank of the product in the region, starting at 1.
+        product_id (int): The ID of the product.
+        product_name (str): The name of the product.
+        installations (int): The number of installations.
+    """
+    region: str
+    rank: int
+    product_id: int
+    product_name: str
+    installations: int
+
+class AnalyticsRefresh(BaseModel):
+    """Last refresh of an analytics view.
+
+    Attributes:
+        view (str): The name of the materialized view.
+        refreshed_at (datetime): When the view was last refreshed.
+    """
+    view: str
+    refreshed_at: datetime
+
+class AnalyticsReport(BaseModel, Generic[T]):
+    """Rows read from an analytics view, with their staleness.
+
+    Attributes:
+        view (str): The name of the materialized view.
+        refreshed_at (Optional[datetime]): When the view was last refreshed, if known.
+        refresh_interval (float): The seconds after which the view is refreshed again.
+        rows (List[T]): The rows.
+    """
+    view: str
+    refreshed_at: Optional[datetime]
+    refresh_interval: float
+    rows: List[T]
@@ -0,0 +1,42 @@
+from pydantic import BaseModel
+from typing import Generic, List, TypeVar
+import os
+
+# Maximum number of items accepted by a bulk endpoint, overridable from the .env file
+MAX_BULK_SIZE = int(os.getenv("MAX_BULK_SIZE", "10000"))
+
+T = TypeVar("T")
+
+class BulkConflict(BaseModel):
+    """Item of a bulk request that was not created.
+
+    Attributes:
+        id (int): The ID of the rejected item.
+        detail (str): Why the item was rejected.
+    """
+    id: int
+    detail: str
+
+class BulkCreateResult(BaseModel, Generic[T]):
+    """Outcome of a bulk creation.
+
+    Attributes:
+        created (List[T]): The created items.
+        conflicts (List[BulkConflict]): The items rejected because their ID already exists.
+    """
+    created: List[T]
+    conflicts: List[BulkConflict]
+
+class ImportResult(BaseModel):
+    """Outcome of a CSV import.
+
+    Attributes:
+        staged (int): The number of rows read from the CSV file.
+        inserted (int): The number of new rows.
+        updated (int): The number of existing rows overwritten.
+        rejected (int): The number of rows skipped because their ID is missing or a foreign key does not exist.
+    """
+    staged: int
+    inserted: int
+    updated: int
+    rejected: int
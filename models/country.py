@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from typing import Optional
+from models.update import PartialUpdate
 
 class Country(BaseModel):
     """Country model.
@@ -25,7 +26,7 @@ class CountryCreate(BaseModel):
     name: str
     region: str
 
-class CountryUpdate(BaseModel):
+class CountryUpdate(PartialUpdate):
     """Country update model.
 
     Attributes:
@@ -1,5 +1,7 @@
 from pydantic import BaseModel
 from typing import Optional
+from models.country import Country
+from models.update import PartialUpdate
 
 class Customer(BaseModel):
     """Customer model.
@@ -33,7 +35,7 @@ class CustomerCreate(BaseModel):
     country_id: int
     premium_customer: str
 
-class CustomerUpdate(BaseModel):
+class CustomerUpdate(PartialUpdate):
     """Customer update model.
 
     Attributes:
@@ -45,4 +47,12 @@ class CustomerUpdate(BaseModel):
     name: Optional[str] = None
     email: Optional[str] = None
     country_id: Optional[int] = None
-    premium_customer: Optional[str] = None
\ No newline at end of file
+    premium_customer: Optional[str] = None
+
+class CustomerExpanded(Customer):
+    """Customer model with its related objects, as requested with ``expand``.
+
+    Attributes:
+        country (Optional[Country]): The country of the customer, if expanded.
+    """
+    country: Optional[Country] = None
\ No newline at end of file
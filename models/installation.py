@@ -1,6 +1,12 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, field_validator, model_validator
+from typing import Any, FrozenSet, Optional
 from datetime import date
+from models.customer import CustomerExpanded
+from models.product import ProductExpanded
+from models.update import PartialUpdate
+
+# Related objects that can be embedded in installations, parents before children
+EXPANSIONS = ("customer", "customer.country", "product", "product.category")
 
 class Installation(BaseModel):
     """Installation model.
@@ -20,6 +26,16 @@ class Installation(BaseModel):
     customer_id: int
     installation_date: date
 
+class InstallationExpanded(Installation):
+    """Installation model with its related objects, as requested with ``expand``.
+
+    Attributes:
+        customer (Optional[CustomerExpanded]): The customer of the installation, if expanded.
+        product (Optional[ProductExpanded]): The product of the installation, if expanded.
+    """
+    customer: Optional[CustomerExpanded] = None
+    product: Optional[ProductExpanded] = None
+
 class InstallationCreate(BaseModel):
     """Installation creation model.
 
@@ -38,7 +54,7 @@ class InstallationCreate(BaseModel):
     customer_id: int
     installation_date: date
 
-class InstallationUpdate(BaseModel):
+class InstallationUpdate(PartialUpdate):
     """Installation update model.
 
     Attributes:
@@ -52,4 +68,66 @@ class InstallationUpdate(BaseModel):
     description: Optional[str] = None
     product_id: Optional[int] = None
     customer_id: Optional[int] = None
-    installation_date: Optional[date] = None
\ No newline at end of file
+    installation_date: Optional[date] = None
+
+class InstallationFilter(BaseModel):
+    """Query string filters of the installation list.
+
+    Attributes:
+        customer_id (Optional[int]): Only installations of this customer.
+        product_id (Optional[int]): Only installations of this product.
+        installation_date_from (Optional[date]): Only installations on or after this date.
+        installation_date_to (Optional[date]): Only installations on or before this date.
+    """
+    customer_id: Optional[int] = None
+    product_id: Optional[int] = None
+    installation_date_from: Optional[date] = None
+    installation_date_to: Optional[date] = None
+
+    @model_validator(mode="after")
+    def check_date_range(self) -> "InstallationFilter":
+        """Reject an empty date range.
+
+        Raises:
+            ValueError: If the first date is after the last one.
+
+        Returns:
+            InstallationFilter: The filters.
+        """
+        if self.installation_date_from is not None and self.installation_date_to is not None and self.installation_date_from > self.installation_date_to:
+            raise ValueError("installation_date_from must not be after installation_date_to")
+        return self
+
+class InstallationExpand(BaseModel):
+    """Related objects to embed in the returned installations.
+
+    Attributes:
+        paths (FrozenSet[str]): The requested paths of `EXPANSIONS`, with their parents.
+    """
+    paths: FrozenSet[str] = frozenset()
+
+    @field_validator("paths", mode="before")
+    @classmethod
+    def parse_paths(cls, value: Any) -> Any:
+        """Split the comma-separated paths of the query string and add their parents.
+
+        Args:
+            value (Any): The comma-separated paths, or already a collection of paths.
+
+        Raises:
+            ValueError: If a path is unknown.
+
+        Returns:
+            Any: The paths.
+        """
+        if value is None:
+            return frozenset()
+        if isinstance(value, str):
+            value = filter(None, (path.strip() for path in value.split(",")))
+        paths = set()
+        for path in value:
+            if path not in EXPANSIONS:
+                raise ValueError(f"Cannot expand {path}, expected one of {', '.join(EXPANSIONS)}")
+            paths.add(path)
+            paths.add(path.split(".")[0])
+        return frozenset(paths)
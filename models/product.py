@@ -1,5 +1,7 @@
 from pydantic import BaseModel
 from typing import Optional
+from models.product_category import ProductCategory
+from models.update import PartialUpdate
 
 class Product(BaseModel):
     """Product model.
@@ -33,7 +35,7 @@ class ProductCreate(BaseModel):
     category_id: int
     price: str
 
-class ProductUpdate(BaseModel):
+class ProductUpdate(PartialUpdate):
     """Product update model.
 
     Attributes:
@@ -45,4 +47,12 @@ class ProductUpdate(BaseModel):
     reference: Optional[str] = None
     name: Optional[str] = None
     category_id: Optional[int] = None
-    price: Optional[str] = None
\ No newline at end of file
+    price: Optional[str] = None
+
+class ProductExpanded(Product):
+    """Product model with its related objects, as requested with ``expand``.
+
+    Attributes:
+        category (Optional[ProductCategory]): The category of the product, if expanded.
+    """
+    category: Optional[ProductCategory] = None
\ No newline at end of file
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from typing import Optional
+from models.update import PartialUpdate
 
 class ProductCategory(BaseModel):
     """ProductCategory model.
@@ -21,7 +22,7 @@ class ProductCategoryCreate(BaseModel):
     id: int
     name: str
 
-class ProductCategoryUpdate(BaseModel):
+class ProductCategoryUpdate(PartialUpdate):
     """ProductCategory update model.
 
     Attributes:
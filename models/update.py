@@ -0,0 +1,38 @@
+from pydantic import BaseModel, field_validator
+from typing import Any, Dict
+
+def _without_null(schema: Dict[str, Any]) -> None:
+    for field in schema.get("properties", {}).values():
+        types = [option for option in field.pop("anyOf", []) if option.get("type") != "null"]
+        if len(types) == 1:
+            field.update(types[0])
+        elif types:
+            field["anyOf"] = types
+
+class PartialUpdate(BaseModel):
+    """Body of a PATCH request, whose fields may be left out but not set to null.
+
+    Every column is required by the read models, so a null would break the schema of
+    the following responses. The fields default to None only to tell them apart from
+    the sent ones, through ``model_dump(exclude_unset=True)``; the OpenAPI schema
+    does not mark them as nullable.
+    """
+    model_config = {"json_schema_extra": _without_null}
+
+    @field_validator("*", mode="before")
+    @classmethod
+    def reject_null(cls, value: Any) -> Any:
+        """Refuse an explicit null.
+
+        Args:
+            value (Any): The sent value.
+
+        Raises:
+            ValueError: If the value is null.
+
+        Returns:
+            Any: The value.
+        """
+        if value is None:
+            raise ValueError("may be left out, but not set to null")
+        return value
@@ -0,0 +1,94 @@
+import base64
+import binascii
+import json
+import os
+from fastapi import HTTPException, Query, Request, Response
+from typing import Any, List, Optional
+
+# Page size settings, overridable from the .env file
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+
+# Range of the integer primary keys, so that a cursor never sends the database an ID it cannot hold
+MIN_ID = -2**31
+MAX_ID = 2**31 - 1
+
+def encode_cursor(last_id: int) -> str:
+    """Encode the primary key of the last row of a page into an opaque cursor.
+
+    Args:
+        last_id (int): The ID of the last row returned.
+
+    Returns:
+        str: The URL-safe cursor.
+    """
+    raw = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> int:
+    """Decode a cursor produced by `encode_cursor`.
+
+    Args:
+        cursor (str): The cursor sent by the client.
+
+    Raises:
+        HTTPException: If the cursor is malformed or its ID is not a valid primary key.
+
+    Returns:
+        int: The ID after which the next page starts.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        last_id = json.loads(raw)["id"]
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # bool is a subclass of int, but a cursor holding true was not produced by encode_cursor
+    if not isinstance(last_id, int) or isinstance(last_id, bool) or not MIN_ID <= last_id <= MAX_ID:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return last_id
+
+class Page:
+    """Keyset pagination parameters of a list endpoint.
+
+    Attributes:
+        limit (int): The maximum number of rows in the page.
+        after_id (Optional[int]): The ID after which the page starts, or None for the first page.
+    """
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of items in the page."),
+        cursor: Optional[str] = Query(None, description="Opaque cursor taken from the `Link` header of the previous page."),
+    ) -> None:
+        """Initialize the pagination parameters from the query string.
+
+        Args:
+            limit (int): The maximum number of rows in the page.
+            cursor (Optional[str]): The cursor of the previous page, if any.
+        """
+        self.limit = limit
+        self.after_id = decode_cursor(cursor) if cursor else None
+
+def paginate(request: Request, response: Response, items: List[Any], page: Page) -> List[Any]:
+    """Trim a page fetched with one look-ahead row and advertise the next page.
+
+    The CRUD layer is asked for ``page.limit + 1`` rows; the extra row only tells
+    whether a next page exists. When it does, a ``Link: <...>; rel="next"`` header and
+    an ``X-Next-Cursor`` header are added to the response.
+
+    Args:
+        request (Request): The incoming request.
+        response (Response): The response whose headers are set.
+        items (List[Any]): The fetched rows, with an ``id`` attribute.
+        page (Page): The pagination parameters.
+
+    Returns:
+        List[Any]: The rows of the page.
+    """
+    if len(items) <= page.limit:
+        return items
+    items = items[:page.limit]
+    cursor = encode_cursor(items[-1].id)
+    next_url = request.url.include_query_params(limit=page.limit, cursor=cursor)
+    response.headers["Link"] = f'<{next_url}>; rel="next"'
+    response.headers["X-Next-Cursor"] = cursor
+    return items
@@ -0,0 +1,266 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from fastapi import HTTPException, Request
+from asyncpg import Pool
+from dependencies import DATABASE_URL, create_pool
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated DSNs of the streaming replicas serving GET requests, overridable from the .env file
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# Seconds of lag of a replica simulated on DATABASE_URL, used when no replica is configured (0 disables it)
+DATABASE_REPLICA_SIMULATED_LAG = float(os.getenv("DATABASE_REPLICA_SIMULATED_LAG", "0"))
+# Seconds between two health checks of the replicas
+REPLICA_HEALTH_INTERVAL = float(os.getenv("REPLICA_HEALTH_INTERVAL", "1"))
+# Seconds a read carrying a consistency token waits for a replica to catch up before using the primary
+REPLICA_WAIT_TIMEOUT = float(os.getenv("REPLICA_WAIT_TIMEOUT", "0.2"))
+# Seconds between two LSN checks while a read waits for a replica
+REPLICA_POLL_INTERVAL = 0.01
+
+# Header carrying the WAL position of a write, sent back by clients to read their own writes
+CONSISTENCY_HEADER = "X-Consistency-Token"
+
+# Methods served by the replicas, every other method goes to the primary
+READ_METHODS = frozenset({"GET", "HEAD"})
+
+def parse_lsn(lsn: str) -> int:
+    """Convert a Postgres WAL position such as ``16/B374D848`` to an integer.
+
+    Args:
+        lsn (str): The WAL position.
+
+    Raises:
+        ValueError: If the position is malformed.
+
+    Returns:
+        int: The position as a byte offset.
+    """
+    high, low = lsn.split("/")
+    return (int(high, 16) << 32) + int(low, 16)
+
+class Replica:
+    """Connection pool of a streaming replica and its last known health.
+
+    Attributes:
+        name (str): The name of the replica in logs.
+        pool (Pool): The connection pool.
+        healthy (bool): Whether the last health check succeeded.
+        replay_lsn (int): The last WAL position replayed by the replica.
+        simulated_lag (float): The seconds of lag simulated on the primary, or 0 for a real replica.
+    """
+    def __init__(self, name: str, pool: Pool, simulated_lag: float = 0.0) -> None:
+        """Initialize the replica.
+
+        Args:
+            name (str): The name of the replica in logs.
+            pool (Pool): The connection pool.
+            simulated_lag (float): When positive, the pool is the primary and reports the WAL position it had this many seconds ago. Defaults to 0.0.
+        """
+        self.name = name
+        self.pool = pool
+        self.healthy = False
+        self.replay_lsn = 0
+        self.simulated_lag = simulated_lag
+        self._samples: Deque[Tuple[float, int]] = deque()
+
+    def load(self) -> float:
+        """Get the share of the pool connections currently in use.
+
+        Returns:
+            float: A ratio between 0 and 1.
+        """
+        return (self.pool.get_size() - self.pool.get_idle_size()) / self.pool.get_max_size()
+
+    async def check(self) -> None:
+        """Read the replayed WAL position of the replica, marking it unhealthy on failure."""
+        try:
+            if self.simulated_lag > 0:
+                self.replay_lsn = self._lagged(parse_lsn(await self.pool.fetchval("SELECT pg_current_wal_lsn()::text")))
+            else:
+                lsn = await self.pool.fetchval("SELECT pg_last_wal_replay_lsn()::text")
+                if lsn is None:
+                    raise RuntimeError("not a streaming replica")
+                self.replay_lsn = parse_lsn(lsn)
+            self.healthy = True
+        except Exception as error:
+            if self.healthy:
+                logger.warning("Replica %s is unhealthy: %s", self.name, error)
+            self.healthy = False
+
+    def _lagged(self, current_lsn: int) -> int:
+        now = time.monotonic()
+        self._samples.append((now, current_lsn))
+        lsn = self.replay_lsn
+        while self._samples and self._samples[0][0] <= now - self.simulated_lag:
+            lsn = self._samples.popleft()[1]
+        return lsn
+
+class ReplicaSet:
+    """Route reads to the replicas and writes to the primary.
+
+    Reads go to the least busy healthy replica. A read carrying the consistency
+    token of a previous write only goes to a replica that has replayed it, waiting
+    up to `wait_timeout` seconds for one to catch up, then falls back to the primary.
+
+    Attributes:
+        primary (Pool): The connection pool of the primary.
+        replicas (List[Replica]): The replicas.
+    """
+    def __init__(self, primary: Pool, replicas: List[Replica], health_interval: float = REPLICA_HEALTH_INTERVAL, wait_timeout: float = REPLICA_WAIT_TIMEOUT) -> None:
+        """Initialize the replica set.
+
+        Args:
+            primary (Pool): The connection pool of the primary.
+            replicas (List[Replica]): The replicas.
+            health_interval (float): Seconds between two health checks. Defaults to REPLICA_HEALTH_INTERVAL.
+            wait_timeout (float): Seconds a read waits for a replica to catch up. Defaults to REPLICA_WAIT_TIMEOUT.
+        """
+        self.primary = primary
+        self.replicas = replicas
+        self.health_interval = health_interval
+        self.wait_timeout = wait_timeout
+        self._monitor: Optional[asyncio.Task] = None
+        self._check: Optional[asyncio.Future] = None
+
+    @classmethod
+    async def create(cls, primary: Pool) -> Optional["ReplicaSet"]:
+        """Open the pools of the configured replicas.
+
+        Args:
+            primary (Pool): The connection pool of the primary.
+
+        Returns:
+            Optional[ReplicaSet]: The replica set, or None when no replica is configured.
+        """
+        if DATABASE_REPLICA_URLS:
+            replicas = [Replica(f"replica-{index}", await create_pool(url)) for index, url in enumerate(DATABASE_REPLICA_URLS)]
+        elif DATABASE_REPLICA_SIMULATED_LAG > 0:
+            replicas = [Replica("simulated", await create_pool(DATABASE_URL), DATABASE_REPLICA_SIMULATED_LAG)]
+        else:
+            return None
+        return cls(primary, replicas)
+
+    async def start(self) -> None:
+        """Check the replicas once, then keep checking them in the background."""
+        await self.check()
+        self._monitor = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the health checks and close the replica pools."""
+        if self._monitor is not None:
+            self._monitor.cancel()
+            try:
+                await self._monitor
+            except asyncio.CancelledError:
+                pass
+        for replica in self.replicas:
+            await replica.pool.close()
+
+    async def check(self) -> None:
+        """Check every replica, sharing a check already running."""
+        if self._check is None or self._check.done():
+            self._check = asyncio.gather(*(replica.check() for replica in self.replicas))
+        await asyncio.shield(self._check)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await self.check()
+
+    def _pick(self, min_lsn: int) -> Optional[Pool]:
+        candidates = [replica for replica in self.replicas if replica.healthy and replica.replay_lsn >= min_lsn]
+        if not candidates:
+            return None
+        return min(candidates, key=Replica.load).pool
+
+    async def read_pool(self, min_lsn: int = 0) -> Pool:
+        """Get the pool serving a read.
+
+        Args:
+            min_lsn (int): The WAL position the data must include. Defaults to 0.
+
+        Returns:
+            Pool: The pool of a replica, or of the primary when none is healthy or caught up in time.
+        """
+        pool = self._pick(min_lsn)
+        if pool is not None or min_lsn == 0:
+            return pool or self.primary
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(REPLICA_POLL_INTERVAL)
+            await self.check()
+            pool = self._pick(min_lsn)
+            if pool is not None:
+                return pool
+        return self.primary
+
+    async def pool_for(self, request: Request) -> Pool:
+        """Get the pool serving a request, and remember writes for `ConsistencyTokenMiddleware`.
+
+        Args:
+            request (Request): The incoming request.
+
+        Raises:
+            HTTPException: If the consistency token is malformed.
+
+        Returns:
+            Pool: The pool of a replica for reads, of the primary otherwise.
+        """
+        if request.method not in READ_METHODS:
+            request.state.wrote_primary = True
+            return self.primary
+        token = request.headers.get(CONSISTENCY_HEADER)
+        if token is None:
+            return await self.read_pool()
+        try:
+            min_lsn = parse_lsn(token)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid consistency token")
+        return await self.read_pool(min_lsn)
+
+    async def write_token(self) -> str:
+        """Get a token covering every write committed on the primary so far.
+
+        Returns:
+            str: The current WAL position of the primary.
+        """
+        return await self.primary.fetchval("SELECT pg_current_wal_lsn()::text")
+
+class ConsistencyTokenMiddleware:
+    """Add the consistency token to the successful responses of writes.
+
+    Only requests that were given the primary by `ReplicaSet.pool_for` pay the extra
+    query, and only when replicas are configured.
+    """
+    def __init__(self, app: Callable[..., Awaitable[None]]) -> None:
+        """Wrap an ASGI application.
+
+        Args:
+            app (Callable[..., Awaitable[None]]): The wrapped application.
+        """
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable[..., Awaitable[Any]], send: Callable[..., Awaitable[None]]) -> None:
+        """Handle an ASGI call.
+
+        Args:
+            scope (Dict[str, Any]): The connection scope.
+            receive (Callable[..., Awaitable[Any]]): The receive channel.
+            send (Callable[..., Awaitable[None]]): The send channel.
+        """
+        if scope["type"] != "http" or scope["method"] in READ_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_token(message: Dict[str, Any]) -> None:
+            replicas = getattr(scope["app"].state, "replicas", None)
+            if message["type"] == "http.response.start" and replicas is not None and message["status"] < 400 and scope.get("state", {}).get("wrote_primary"):
+                token = await replicas.write_token()
+                message["headers"] = [*message.get("headers", []), (CONSISTENCY_HEADER.lower().encode(), token.encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_with_token)
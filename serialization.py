@@ -0,0 +1,77 @@
+import orjson
+from fastapi import Response
+from pydantic import BaseModel
+from typing import Any, Dict, Mapping, Optional, Tuple, Type, TypeVar
+
+M = TypeVar("M", bound=BaseModel)
+
+def from_row(model: Type[M], row: Mapping[str, Any]) -> M:
+    """Build a model from a row of our own database, without validating it.
+
+    The columns already have the types of the fields, so the instance is filled the
+    way ``model_construct`` does, minus its per-field default handling.
+
+    Args:
+        model (Type[M]): The model class, whose required fields are all in the row.
+        row (Mapping[str, Any]): The row.
+
+    Returns:
+        M: The model.
+    """
+    return _construct(model, dict(row))
+
+def from_versioned_row(model: Type[M], row: Mapping[str, Any]) -> Tuple[M, int]:
+    """Build a model from a row of a versioned table, without validating it.
+
+    Args:
+        model (Type[M]): The model class, whose required fields are all in the row.
+        row (Mapping[str, Any]): The row, with its ``version`` column.
+
+    Returns:
+        Tuple[M, int]: The model and the version of the row.
+    """
+    values = dict(row)
+    version = values.pop("version")
+    return _construct(model, values), version
+
+def _construct(model: Type[M], values: Dict[str, Any]) -> M:
+    item = object.__new__(model)
+    object.__setattr__(item, "__dict__", values)
+    object.__setattr__(item, "__pydantic_fields_set__", set(values))
+    object.__setattr__(item, "__pydantic_extra__", None)
+    object.__setattr__(item, "__pydantic_private__", None)
+    return item
+
+def _encode_model(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.__dict__
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def encode_json(content: Any) -> bytes:
+    """Encode models read from our own database to JSON, without validating them again.
+
+    Args:
+        content (Any): A model, a list of models or any JSON-compatible value.
+
+    Returns:
+        bytes: The JSON document.
+    """
+    return orjson.dumps(content, default=_encode_model)
+
+def json_response(content: Any, response: Optional[Response] = None, status_code: int = 200) -> Response:
+    """Build a JSON response from trusted content, bypassing ``response_model``.
+
+    Rows built by the CRUD layer are already valid, so the validation and
+    ``jsonable_encoder`` passes FastAPI would run on them are skipped; the
+    ``response_model`` of the route still documents the schema.
+
+    Args:
+        content (Any): A model, a list of models or any JSON-compatible value.
+        response (Optional[Response]): The response whose headers are kept. Defaults to None.
+        status_code (int): The status code. Defaults to 200.
+
+    Returns:
+        Response: The JSON response.
+    """
+    headers = dict(response.headers) if response is not None else None
+    return Response(content=encode_json(content), status_code=status_code, media_type="application/json", headers=headers)
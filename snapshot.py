@@ -0,0 +1,220 @@
+"""Write a Parquet snapshot of the installation table, partitioned by month, for the data lake.
+
+Run from the repository root against the database of the .env file:
+
+    python -m snapshot OUTPUT_DIR [--denormalize] [--batch-size N] [--compression CODEC] [--replace]
+
+The rows are read through a server-side cursor in a read-only transaction, so
+the snapshot is consistent, ``--batch-size`` rows at a time. They come ordered by
+installation date, so the month partitions are written one after the other,
+each as ``installation_month=YYYY-MM/part-0.parquet`` (Hive-style, rows without
+a date in ``installation_month=__HIVE_DEFAULT_PARTITION__``): a single Parquet
+writer is open at a time and each batch becomes a row group, so memory stays
+bounded by the batch size. With ``--denormalize``, the columns of the product and
+the customer of each installation are added, prefixed with ``product_`` and
+``customer_``.
+
+The files are written to a temporary directory next to OUTPUT_DIR, renamed to
+OUTPUT_DIR once complete, so readers never see a partial snapshot. With
+``--replace``, the previous snapshot is first renamed aside and only deleted
+once the new one is in place: OUTPUT_DIR is missing for the instant between the
+two renames, but never holds part of a snapshot.
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import pyarrow as pa
+import pyarrow.parquet as pq
+from dependencies import connect_db
+from export import EXPORT_BATCH_SIZE, arrow_schema, record_batch
+from models.customer import Customer
+from models.installation import Installation
+from models.product import Product
+from datetime import date
+from typing import Dict, List, Optional
+
+# Directory of the rows without an installation date, as named by Hive
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+# Tables joined by --denormalize, with the foreign key of the installation pointing to them
+JOINED_TABLES = (("product", Product, "product_id"), ("customer", Customer, "customer_id"))
+
+def snapshot_schema(denormalize: bool) -> pa.Schema:
+    """Build the schema of the snapshot files.
+
+    Args:
+        denormalize (bool): Whether the product and customer columns are added.
+
+    Returns:
+        pa.Schema: The installation columns, then the ``product_`` and ``customer_`` ones if denormalized.
+    """
+    fields = list(arrow_schema(Installation))
+    if denormalize:
+        for table, model, _ in JOINED_TABLES:
+            fields += [field.with_name(f"{table}_{field.name}") for field in arrow_schema(model) if field.name != "id"]
+    return pa.schema(fields)
+
+def snapshot_query(denormalize: bool) -> str:
+    """Build the query read through the cursor, ordered by month partition.
+
+    The order matches the ``(installation_date, id)`` index of data/init.sql.
+
+    Args:
+        denormalize (bool): Whether the product and customer columns are joined.
+
+    Returns:
+        str: The SQL query.
+    """
+    columns = [f"i.{column}" for column in Installation.model_fields]
+    joins = []
+    if denormalize:
+        for table, model, foreign_key in JOINED_TABLES:
+            columns += [f"{table}.{column} AS {table}_{column}" for column in model.model_fields if column != "id"]
+            joins.append(f"LEFT JOIN {table} ON {table}.id = i.{foreign_key}")
+    return f"SELECT {', '.join(columns)} FROM installation i {' '.join(joins)} ORDER BY i.installation_date, i.id"
+
+def partition(row_date: Optional[date]) -> str:
+    """Get the partition directory of a row.
+
+    Args:
+        row_date (Optional[date]): The installation date of the row.
+
+    Returns:
+        str: The Hive-style directory name.
+    """
+    return f"installation_month={NULL_PARTITION if row_date is None else f'{row_date:%Y-%m}'}"
+
+class PartitionWriter:
+    """Parquet writer of the current month partition, replaced when the month changes.
+
+    Attributes:
+        root (str): The directory receiving the partitions.
+        schema (pa.Schema): The schema of the files.
+        compression (str): The Parquet compression codec.
+        rows (Dict[str, int]): The number of rows written to each partition.
+    """
+    def __init__(self, root: str, schema: pa.Schema, compression: str) -> None:
+        """Initialize the writer, with no partition open.
+
+        Args:
+            root (str): The directory receiving the partitions.
+            schema (pa.Schema): The schema of the files.
+            compression (str): The Parquet compression codec.
+        """
+        self.root = root
+        self.schema = schema
+        self.compression = compression
+        self.rows: Dict[str, int] = {}
+        self._name: Optional[str] = None
+        self._writer: Optional[pq.ParquetWriter] = None
+
+    def write(self, name: str, batch: pa.RecordBatch) -> None:
+        """Append rows to a partition, closing the previous one if it differs.
+
+        Args:
+            name (str): The partition directory, never revisited once closed.
+            batch (pa.RecordBatch): The rows, written as one row group.
+        """
+        if name != self._name:
+            self.close()
+            os.makedirs(os.path.join(self.root, name))
+            self._writer = pq.ParquetWriter(os.path.join(self.root, name, "part-0.parquet"), self.schema, compression=self.compression)
+            self._name = name
+            self.rows[name] = 0
+        self._writer.write_batch(batch)
+        self.rows[name] += batch.num_rows
+
+    def close(self) -> None:
+        """Close the open partition, if any."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+async def write_snapshot(root: str, denormalize: bool, batch_size: int, compression: str) -> Dict[str, int]:
+    """Write the partitions of the snapshot to a directory.
+
+    Args:
+        root (str): The existing, empty directory receiving the partitions.
+        denormalize (bool): Whether the product and customer columns are added.
+        batch_size (int): The number of rows fetched per round trip, and the maximum row group size.
+        compression (str): The Parquet compression codec.
+
+    Returns:
+        Dict[str, int]: The number of rows of each partition.
+    """
+    schema = snapshot_schema(denormalize)
+    writer = PartitionWriter(root, schema, compression)
+    connection = await connect_db()
+    try:
+        async with connection.transaction(isolation="repeatable_read", readonly=True):
+            cursor = await connection.cursor(snapshot_query(denormalize))
+            while True:
+                rows = await cursor.fetch(batch_size)
+                if not rows:
+                    break
+                # The rows are sorted by date: split the batch where the month changes
+                start = 0
+                names = [partition(row["installation_date"]) for row in rows]
+                for end in range(1, len(rows) + 1):
+                    if end == len(rows) or names[end] != names[start]:
+                        writer.write(names[start], record_batch(rows[start:end], schema))
+                        start = end
+    finally:
+        writer.close()
+        await connection.close()
+    return writer.rows
+
+def replace_directory(source: str, target: str) -> None:
+    """Rename a directory to a path, moving the directory found there aside first.
+
+    Each step is a rename, so `target` is always either the complete old directory,
+    the complete new one, or briefly missing. A crash before the old directory is
+    deleted leaves it in a hidden ``.<name>-old-`` directory next to `target`.
+
+    Args:
+        source (str): The directory to move, on the same file system as `target`.
+        target (str): The path it is moved to.
+    """
+    if not os.path.exists(target):
+        os.rename(source, target)
+        return
+    aside = tempfile.mkdtemp(prefix=f".{os.path.basename(target)}-old-", dir=os.path.dirname(target))
+    os.rename(target, os.path.join(aside, "snapshot"))
+    os.rename(source, target)
+    shutil.rmtree(aside)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Parse the command line and write the snapshot.
+
+    Args:
+        argv (Optional[List[str]]): The command line arguments. Defaults to None, for sys.argv.
+
+    Raises:
+        SystemExit: If OUTPUT_DIR already exists and --replace is not given.
+    """
+    parser = argparse.ArgumentParser(description="Write a Parquet snapshot of the installation table, partitioned by month.")
+    parser.add_argument("output", help="Directory receiving the snapshot.")
+    parser.add_argument("--denormalize", action="store_true", help="Add the product and customer columns of each installation.")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE, help="Rows fetched per round trip and per row group. Defaults to EXPORT_BATCH_SIZE.")
+    parser.add_argument("--compression", default="zstd", help="Parquet compression codec.")
+    parser.add_argument("--replace", action="store_true", help="Replace OUTPUT_DIR if it exists.")
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output)
+    if os.path.exists(output) and not args.replace:
+        raise SystemExit(f"{output} already exists, pass --replace to overwrite it")
+    started = time.perf_counter()
+    staging = tempfile.mkdtemp(prefix=f".{os.path.basename(output)}-", dir=os.path.dirname(output))
+    try:
+        rows = asyncio.run(write_snapshot(staging, args.denormalize, args.batch_size, args.compression))
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    replace_directory(staging, output)
+    print(f"Wrote {sum(rows.values())} installations in {len(rows)} partitions to {output} in {time.perf_counter() - started:.1f} s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+from abc import ABC, abstractmethod
+from datetime import date
+from pydantic import BaseModel
+from models.bulk import ImportResult
+from typing import Any, AsyncIterator, Dict, List, Mapping, Optional, Sequence, Tuple, Type
+
+# A row as returned by a backend: an asyncpg Record or a plain dict, both mappings of column to value
+Row = Mapping[str, Any]
+
+class InvalidData(Exception):
+    """A value of an imported file does not fit its column."""
+
+class IntegrityError(Exception):
+    """A write would leave a foreign key pointing to a missing row."""
+
+class VersionConflict(Exception):
+    """A conditional write found the row at another version than the expected ones."""
+
+class TableSpec:
+    """Schema of a table, shared by every storage backend.
+
+    Attributes:
+        name (str): The table name.
+        crud (str): The name of the CRUD class, prefix of the Postgres statement names.
+        singular (str): The name of one row in method names, e.g. ``product_category``.
+        plural (str): The name of several rows in method names, e.g. ``product_categories``.
+        model (Type[BaseModel]): The model of a row; its fields are the columns, ``id`` first.
+        columns (Tuple[str, ...]): The columns, in table order.
+        foreign_keys (Dict[str, str]): The referenced table of each foreign key column.
+        filters (Dict[str, Tuple[str, str]]): The column and comparison operator (``=``, ``>=`` or ``<=``) of each list filter.
+        batched (bool): Whether lookups by ID are batched (see `crud.loader.BatchLoader`) rather than sent one by one.
+        versioned (bool): Whether single rows carry their ``version``, which changes on every write (``xmin`` on Postgres).
+    """
+    def __init__(
+        self,
+        name: str,
+        crud: str,
+        singular: str,
+        plural: str,
+        model: Type[BaseModel],
+        foreign_keys: Optional[Dict[str, str]] = None,
+        filters: Optional[Dict[str, Tuple[str, str]]] = None,
+        batched: bool = False,
+        versioned: bool = False,
+    ) -> None:
+        """Initialize the table schema.
+
+        Args:
+            name (str): The table name.
+            crud (str): The name of the CRUD class.
+            singular (str): The name of one row in method names.
+            plural (str): The name of several rows in method names.
+            model (Type[BaseModel]): The model of a row.
+            foreign_keys (Optional[Dict[str, str]]): The referenced table of each foreign key column. Defaults to None.
+            filters (Optional[Dict[str, Tuple[str, str]]]): The column and operator of each list filter. Defaults to None.
+            batched (bool): Whether lookups by ID are batched. Defaults to False.
+            versioned (bool): Whether single rows carry their version. Defaults to False.
+        """
+        self.name = name
+        self.crud = crud
+        self.singular = singular
+        self.plural = plural
+        self.model = model
+        self.columns = tuple(model.model_fields)
+        self.foreign_keys = foreign_keys or {}
+        self.filters = filters or {}
+        self.batched = batched
+        self.versioned = versioned
+
+    def column_type(self, column: str) -> type:
+        """Get the Python type of a column.
+
+        Args:
+            column (str): The column.
+
+        Returns:
+            type: ``int``, ``str`` or ``date``.
+        """
+        return self.model.model_fields[column].annotation
+
+    def parse(self, column: str, text: Optional[str]) -> Any:
+        """Convert a textual value, as found in SQL or CSV files, to the type of its column.
+
+        Args:
+            column (str): The column.
+            text (Optional[str]): The value, None or an empty string for NULL.
+
+        Raises:
+            InvalidData: If the value does not fit the column.
+
+        Returns:
+            Any: The converted value.
+        """
+        if text is None or text == "":
+            return None
+        kind = self.column_type(column)
+        try:
+            if kind is int:
+                return int(text)
+            if kind is date:
+                return date.fromisoformat(text)
+        except ValueError:
+            raise InvalidData(f"invalid input for column {column} of {self.name}: {text!r}")
+        return text
+
+# Schema of every table of the CRUD layer by name, filled by `storage.tables.register_table`
+TABLES: Dict[str, TableSpec] = {}
+
+class TableStorage(ABC):
+    """Operations of the CRUD classes on one table, implemented by each storage backend.
+
+    Rows are returned as mappings of column to value, ready for `serialization.from_row`.
+    The rows of a versioned table returned by `insert`, `get`, `get_many`, `delete`,
+    `update` and `patch` also carry their ``version``, which the conditional writes compare.
+
+    Attributes:
+        spec (TableSpec): The schema of the table.
+    """
+    def __init__(self, spec: TableSpec) -> None:
+        """Initialize the table.
+
+        Args:
+            spec (TableSpec): The schema of the table.
+        """
+        self.spec = spec
+
+    @abstractmethod
+    async def insert(self, values: Sequence[Any]) -> Optional[Row]:
+        """Insert a row.
+
+        Args:
+            values (Sequence[Any]): The value of each column, in table order.
+
+        Returns:
+            Optional[Row]: The inserted row, or None if its ID already exists.
+        """
+
+    @abstractmethod
+    async def insert_many(self, columns: Sequence[Sequence[Any]]) -> List[Row]:
+        """Insert many rows at once, skipping those whose ID already exists.
+
+        Args:
+            columns (Sequence[Sequence[Any]]): The values of each column, in table order.
+
+        Returns:
+            List[Row]: The inserted rows.
+        """
+
+    @abstractmethod
+    async def page(self, limit: int, after_id: Optional[int] = None, filters: Optional[Dict[str, Any]] = None) -> List[Row]:
+        """Get a page of rows ordered by ID.
+
+        Args:
+            limit (int): The maximum number of rows.
+            after_id (Optional[int]): Only return rows with a greater ID. Defaults to None.
+            filters (Optional[Dict[str, Any]]): The value of each applied filter of `TableSpec.filters`. Defaults to None.
+
+        Returns:
+            List[Row]: The rows.
+        """
+
+    @abstractmethod
+    def stream(self, batch_size: int, after_id: Optional[int] = None, filters: Optional[Dict[str, Any]] = None) -> AsyncIterator[List[Row]]:
+        """Read rows ordered by ID, `batch_size` at a time.
+
+        Args:
+            batch_size (int): The number of rows per batch.
+            after_id (Optional[int]): Only return rows with a greater ID. Defaults to None.
+            filters (Optional[Dict[str, Any]]): The value of each applied filter. Defaults to None.
+
+        Yields:
+            List[Row]: The next batch of rows.
+        """
+
+    @abstractmethod
+    async def get(self, row_id: int) -> Optional[Row]:
+        """Get a row by its ID.
+
+        Args:
+            row_id (int): The ID.
+
+        Returns:
+            Optional[Row]: The row or None if not found.
+        """
+
+    @abstractmethod
+    async def get_many(self, ids: List[int]) -> List[Row]:
+        """Get many rows by their IDs.
+
+        Args:
+            ids (List[int]): The IDs.
+
+        Returns:
+            List[Row]: The rows found, in no particular order.
+        """
+
+    @abstractmethod
+    async def delete(self, row_id: int, versions: Optional[List[int]] = None) -> Optional[Row]:
+        """Delete a row by its ID.
+
+        Args:
+            row_id (int): The ID.
+            versions (Optional[List[int]]): Only delete the row at one of these versions. Defaults to None, for any version.
+
+        Raises:
+            VersionConflict: If the row is at another version.
+
+        Returns:
+            Optional[Row]: The deleted row or None if not found.
+        """
+
+    @abstractmethod
+    async def update(self, row_id: int, values: Sequence[Any], versions: Optional[List[int]] = None) -> Optional[Row]:
+        """Overwrite every column of a row but its ID.
+
+        Args:
+            row_id (int): The ID.
+            values (Sequence[Any]): The value of each column after ``id``, in table order.
+            versions (Optional[List[int]]): Only write the row at one of these versions. Defaults to None, for any version.
+
+        Raises:
+            VersionConflict: If the row is at another version.
+
+        Returns:
+            Optional[Row]: The updated row or None if not found.
+        """
+
+    @abstractmethod
+    async def patch(self, row_id: int, values: Dict[str, Any], versions: Optional[List[int]] = None) -> Optional[Row]:
+        """Overwrite some columns of a row, keeping the others.
+
+        Args:
+            row_id (int): The ID.
+            values (Dict[str, Any]): The new value of each written column, None to set it to NULL; ``id`` is ignored.
+            versions (Optional[List[int]]): Only write the row at one of these versions. Defaults to None, for any version.
+
+        Raises:
+            VersionConflict: If the row is at another version.
+
+        Returns:
+            Optional[Row]: The updated row or None if not found.
+        """
+
+    @abstractmethod
+    async def import_csv(self, columns: Sequence[str], source: AsyncIterator[bytes]) -> ImportResult:
+        """Upsert rows streamed from a CSV file on their ID.
+
+        When an ID appears several times, its last row wins. Every column is required
+        by the read models, so rows with an empty value, with a dangling foreign key,
+        or with a new ID when the header lacks some columns are counted as rejected
+        and left out.
+
+        Args:
+            columns (Sequence[str]): The CSV columns, already checked against the table.
+            source (AsyncIterator[bytes]): The CSV data without its header line.
+
+        Raises:
+            InvalidData: If a value does not fit its column.
+
+        Returns:
+            ImportResult: The row counts of the import.
+        """
@@ -0,0 +1,357 @@
+import csv
+import io
+import operator
+import re
+from bisect import bisect_right, insort
+from models.bulk import ImportResult
+from storage.base import IntegrityError, Row, TableSpec, TableStorage, VersionConflict
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Comparison of each filter operator of `TableSpec.filters`
+OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {"=": operator.eq, ">=": operator.ge, "<=": operator.le}
+
+# Start of the INSERT statements of a SQL file, followed by their value tuples
+INSERT_PATTERN = re.compile(r"\binsert\s+into\s+(\w+)\s+values\s*", re.IGNORECASE)
+
+def parse_values(sql: str, position: int) -> Tuple[List[List[Optional[str]]], int]:
+    """Read the value tuples of an INSERT statement, up to its semicolon.
+
+    Only the literals found in data/init.sql are understood: quoted strings,
+    numbers and NULL.
+
+    Args:
+        sql (str): The SQL text.
+        position (int): The index of the first tuple.
+
+    Raises:
+        ValueError: If the text is not a list of value tuples.
+
+    Returns:
+        Tuple[List[List[Optional[str]]], int]: The values of each tuple as text, None for NULL, and the index after the statement.
+    """
+    rows: List[List[Optional[str]]] = []
+    token = re.compile(r"\s*(?:'((?:[^']|'')*)'|(null)\b|([^\s,()';]+))\s*([,)])", re.IGNORECASE | re.DOTALL)
+    separator = re.compile(r"\s*([(,;])", re.DOTALL)
+    while True:
+        match = separator.match(sql, position)
+        if match is None:
+            raise ValueError(f"Unexpected SQL at index {position}")
+        position = match.end()
+        if match.group(1) == ";":
+            return rows, position
+        if match.group(1) == ",":
+            continue
+        values: List[Optional[str]] = []
+        while True:
+            match = token.match(sql, position)
+            if match is None:
+                raise ValueError(f"Unexpected SQL value at index {position}")
+            quoted, null, bare, end = match.groups()
+            values.append(quoted.replace("''", "'") if quoted is not None else None if null else bare)
+            position = match.end()
+            if end == ")":
+                break
+        rows.append(values)
+
+class MemoryTable(TableStorage):
+    """Table held in process memory, indexed like its Postgres counterpart.
+
+    Rows are dicts, never modified in place: a write stores a new dict, so rows
+    already returned stay consistent. Every operation runs without awaiting, and is
+    therefore atomic within the event loop.
+
+    Attributes:
+        storage (MemoryStorage): The storage holding the referenced and referencing tables.
+        rows (Dict[int, Dict[str, Any]]): The hash index of the rows on their ID.
+        ids (List[int]): The IDs in increasing order, for keyset pagination.
+        indexes (Dict[str, Dict[Any, List[int]]]): The sorted IDs of the rows of each value of each foreign key column.
+        versions (Dict[int, int]): The version of each row, drawn from the counter of the storage on every write.
+    """
+    def __init__(self, storage: "MemoryStorage", spec: TableSpec) -> None:
+        """Initialize an empty table.
+
+        Args:
+            storage (MemoryStorage): The storage holding the table.
+            spec (TableSpec): The schema of the table.
+        """
+        super().__init__(spec)
+        self.storage = storage
+        self.rows: Dict[int, Dict[str, Any]] = {}
+        self.ids: List[int] = []
+        self.indexes: Dict[str, Dict[Any, List[int]]] = {column: {} for column in spec.foreign_keys}
+        self.versions: Dict[int, int] = {}
+
+    def _put(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        previous = self.rows.get(row["id"])
+        if previous is None:
+            insort(self.ids, row["id"])
+        for column, index in self.indexes.items():
+            if previous is not None and previous[column] == row[column]:
+                continue
+            if previous is not None and previous[column] is not None:
+                self._unindex(index, previous[column], row["id"])
+            if row[column] is not None:
+                insort(index.setdefault(row[column], []), row["id"])
+        self.rows[row["id"]] = row
+        self.versions[row["id"]] = self.storage.next_version()
+        return row
+
+    def _remove(self, row_id: int) -> Optional[Dict[str, Any]]:
+        row = self.rows.pop(row_id, None)
+        if row is None:
+            return None
+        del self.versions[row_id]
+        del self.ids[bisect_right(self.ids, row_id) - 1]
+        for column, index in self.indexes.items():
+            if row[column] is not None:
+                self._unindex(index, row[column], row_id)
+        return row
+
+    @staticmethod
+    def _unindex(index: Dict[Any, List[int]], value: Any, row_id: int) -> None:
+        ids = index[value]
+        del ids[bisect_right(ids, row_id) - 1]
+        if not ids:
+            del index[value]
+
+    def _versioned(self, row: Optional[Dict[str, Any]], version: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        if row is None or not self.spec.versioned:
+            return row
+        return {**row, "version": self.versions[row["id"]] if version is None else version}
+
+    def _check_version(self, row_id: int, versions: Optional[List[int]]) -> None:
+        if versions is not None and self.versions[row_id] not in versions:
+            raise VersionConflict(f"Row {row_id} is at version {self.versions[row_id]}")
+
+    def _row(self, values: Sequence[Any], row_id: Optional[int] = None) -> Dict[str, Any]:
+        if row_id is None:
+            return dict(zip(self.spec.columns, values))
+        return dict(zip(self.spec.columns, (row_id, *values)))
+
+    def _scan(self, after_id: Optional[int], filters: Optional[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        conditions = [
+            (column, OPERATORS[symbol], filters[name])
+            for name, (column, symbol) in self.spec.filters.items()
+            if filters and filters.get(name) is not None
+        ]
+        # Walk the shortest foreign key index matching an equality filter, else every ID
+        candidates = self.ids
+        for column, compare, value in conditions:
+            if compare is operator.eq and column in self.indexes:
+                ids = self.indexes[column].get(value, [])
+                if len(ids) < len(candidates):
+                    candidates = ids
+        start = 0 if after_id is None else bisect_right(candidates, after_id)
+        for position in range(start, len(candidates)):
+            row = self.rows[candidates[position]]
+            if all(row[column] is not None and compare(row[column], value) for column, compare, value in conditions):
+                yield row
+
+    async def insert(self, values: Sequence[Any]) -> Optional[Row]:
+        row = self._row(values)
+        if row["id"] in self.rows:
+            return None
+        self.storage.check_references(self.spec, [row])
+        return self._versioned(self._put(row))
+
+    async def insert_many(self, columns: Sequence[Sequence[Any]]) -> List[Row]:
+        rows, seen = [], set()
+        for values in zip(*columns):
+            row = self._row(values)
+            if row["id"] not in self.rows and row["id"] not in seen:
+                seen.add(row["id"])
+                rows.append(row)
+        self.storage.check_references(self.spec, rows)
+        return [self._put(row) for row in rows]
+
+    async def page(self, limit: int, after_id: Optional[int] = None, filters: Optional[Dict[str, Any]] = None) -> List[Row]:
+        rows = []
+        for row in self._scan(after_id, filters):
+            if len(rows) == limit:
+                break
+            rows.append(row)
+        return rows
+
+    async def stream(self, batch_size: int, after_id: Optional[int] = None, filters: Optional[Dict[str, Any]] = None) -> AsyncIterator[List[Row]]:
+        # Each batch resumes after the last ID, so writes between batches are safe
+        while True:
+            batch = await self.page(batch_size, after_id, filters)
+            if not batch:
+                break
+            yield batch
+            after_id = batch[-1]["id"]
+
+    async def get(self, row_id: int) -> Optional[Row]:
+        return self._versioned(self.rows.get(row_id))
+
+    async def get_many(self, ids: List[int]) -> List[Row]:
+        return [self._versioned(self.rows[row_id]) for row_id in set(ids) if row_id in self.rows]
+
+    async def delete(self, row_id: int, versions: Optional[List[int]] = None) -> Optional[Row]:
+        if row_id not in self.rows:
+            return None
+        self._check_version(row_id, versions)
+        self.storage.check_referenced(self.spec, row_id)
+        version = self.versions[row_id]
+        return self._versioned(self._remove(row_id), version)
+
+    async def update(self, row_id: int, values: Sequence[Any], versions: Optional[List[int]] = None) -> Optional[Row]:
+        if row_id not in self.rows:
+            return None
+        self._check_version(row_id, versions)
+        row = self._row(values, row_id)
+        self.storage.check_references(self.spec, [row])
+        return self._versioned(self._put(row))
+
+    async def patch(self, row_id: int, values: Dict[str, Any], versions: Optional[List[int]] = None) -> Optional[Row]:
+        current = self.rows.get(row_id)
+        if current is None:
+            return None
+        self._check_version(row_id, versions)
+        changes = {column: value for column, value in values.items() if column in current and column != "id"}
+        if not changes:
+            return self._versioned(current)
+        row = {**current, **changes}
+        self.storage.check_references(self.spec, [row])
+        return self._versioned(self._put(row))
+
+    async def import_csv(self, columns: Sequence[str], source: AsyncIterator[bytes]) -> ImportResult:
+        data = bytearray()
+        async for chunk in source:
+            data += chunk
+        staged = rejected = 0
+        merged: Dict[int, Dict[str, Any]] = {}
+        partial = not set(self.spec.columns) <= set(columns)
+        # Every value is converted before any row is written, so a bad value aborts the whole import
+        for fields in csv.reader(io.StringIO(data.decode())):
+            if not fields:
+                continue
+            staged += 1
+            values = {column: self.spec.parse(column, text) for column, text in zip(columns, fields)}
+            # Every column is required by the read models: a partial row can only update an existing one
+            if (any(values.get(column) is None for column in columns)
+                    or partial and values["id"] not in self.rows
+                    or not self.storage.references_exist(self.spec, values)):
+                rejected += 1
+                continue
+            merged[values["id"]] = values
+        inserted = updated = 0
+        for row_id, values in merged.items():
+            current = self.rows.get(row_id)
+            if current is None:
+                inserted += 1
+                self._put({column: values[column] for column in self.spec.columns})
+            else:
+                updated += 1
+                self._put({**current, **values})
+        return ImportResult(staged=staged, inserted=inserted, updated=updated, rejected=rejected)
+
+class MemoryStorage:
+    """Database held in process memory, standing in for Postgres without a server.
+
+    Primary keys are hash indexes and foreign keys are enforced on writes, through
+    the secondary index kept on every foreign key column.
+
+    Attributes:
+        tables (Dict[str, MemoryTable]): The tables by name.
+        version (int): The last row version handed out, shared by every table.
+    """
+    def __init__(self, specs: Iterable[TableSpec]) -> None:
+        """Initialize empty tables.
+
+        Args:
+            specs (Iterable[TableSpec]): The schema of each table.
+        """
+        self.version = 0
+        self.tables = {spec.name: MemoryTable(self, spec) for spec in specs}
+
+    def next_version(self) -> int:
+        """Hand out the version of a written row, like the transaction ID stored in ``xmin``.
+
+        Returns:
+            int: A version greater than every previous one.
+        """
+        self.version += 1
+        return self.version
+
+    def table(self, spec: TableSpec) -> MemoryTable:
+        """Get a table.
+
+        Args:
+            spec (TableSpec): The schema of the table.
+
+        Returns:
+            MemoryTable: The table.
+        """
+        return self.tables[spec.name]
+
+    def load_sql(self, sql: str) -> int:
+        """Insert the rows of the ``insert into <table> values ...`` statements of a SQL file.
+
+        Statements on other tables are ignored, and so is everything else in the file.
+
+        Args:
+            sql (str): The SQL text, e.g. that of data/init.sql.
+
+        Returns:
+            int: The number of rows inserted.
+        """
+        loaded = 0
+        position = 0
+        while True:
+            match = INSERT_PATTERN.search(sql, position)
+            if match is None:
+                return loaded
+            position = match.end()
+            table = self.tables.get(match.group(1).lower())
+            if table is None:
+                continue
+            rows, position = parse_values(sql, position)
+            for values in rows:
+                table._put({column: table.spec.parse(column, text) for column, text in zip(table.spec.columns, values)})
+                loaded += 1
+
+    def references_exist(self, spec: TableSpec, row: Dict[str, Any]) -> bool:
+        """Tell whether every foreign key of a row points to an existing row.
+
+        Args:
+            spec (TableSpec): The schema of the table of the row.
+            row (Dict[str, Any]): The row, possibly missing some columns.
+
+        Returns:
+            bool: Whether the foreign keys are satisfied.
+        """
+        return all(
+            row.get(column) is None or row[column] in self.tables[referenced].rows
+            for column, referenced in spec.foreign_keys.items()
+        )
+
+    def check_references(self, spec: TableSpec, rows: List[Dict[str, Any]]) -> None:
+        """Enforce the foreign keys of rows about to be written.
+
+        Args:
+            spec (TableSpec): The schema of the table of the rows.
+            rows (List[Dict[str, Any]]): The rows.
+
+        Raises:
+            IntegrityError: If a foreign key points to a missing row.
+        """
+        for row in rows:
+            for column, referenced in spec.foreign_keys.items():
+                if row[column] is not None and row[column] not in self.tables[referenced].rows:
+                    raise IntegrityError(f'{column} {row[column]} of {spec.name} {row["id"]} is not present in table "{referenced}"')
+
+    def check_referenced(self, spec: TableSpec, row_id: int) -> None:
+        """Refuse to delete a row that other rows still reference.
+
+        Args:
+            spec (TableSpec): The schema of the table of the row.
+            row_id (int): The ID of the row.
+
+        Raises:
+            IntegrityError: If a row of another table references it.
+        """
+        for table in self.tables.values():
+            for column, referenced in table.spec.foreign_keys.items():
+                if referenced == spec.name and row_id in table.indexes[column]:
+                    raise IntegrityError(f'{spec.name} {row_id} is still referenced from table "{table.spec.name}"')
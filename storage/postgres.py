@@ -0,0 +1,255 @@
+import time
+from asyncpg import Connection, Pool
+from asyncpg.exceptions import DataError, UniqueViolationError
+from datetime import date
+from crud.statements import Statement, register, track
+from crud.loader import BatchLoader, loader
+from crud.staging import copy_and_merge
+from dependencies import acquire_connection
+from models.bulk import ImportResult
+from storage.base import InvalidData, Row, TableSpec, TableStorage, VersionConflict
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple, Union
+
+# Postgres array type of each column type, for the unnest of bulk inserts
+ARRAY_TYPES = {int: "int[]", str: "varchar[]", date: "date[]"}
+# Version of a row: the ID of the transaction that wrote it, changed by every write, replicas included
+VERSION_COLUMN = "xmin::text::bigint"
+
+class TableStatements:
+    """Statements of a table, registered once as ``<CRUD class>.<method>``.
+
+    Attributes:
+        spec (TableSpec): The schema of the table.
+        create (Statement): Inserts a row.
+        create_many (Statement): Inserts column arrays, skipping existing IDs.
+        page (Statement): Gets the first rows.
+        page_after (Statement): Gets the rows after an ID.
+        get (Optional[Statement]): Gets a row by ID, None when lookups are batched.
+        get_many (Statement): Gets the rows of an array of IDs.
+        loader (Optional[BatchLoader]): Batches the lookups by ID of `get_many`, if the table is batched.
+        delete (Statement): Deletes a row.
+        update (Statement): Overwrites a row.
+        delete_if_version (Optional[Statement]): Deletes a row at an expected version, if the table is versioned.
+        update_if_version (Optional[Statement]): Overwrites a row at an expected version, if the table is versioned.
+    """
+    def __init__(self, spec: TableSpec) -> None:
+        """Register the statements of a table.
+
+        Args:
+            spec (TableSpec): The schema of the table.
+        """
+        self.spec = spec
+        prefix = spec.crud
+        columns = ", ".join(spec.columns)
+        self.columns = f"{columns}, {VERSION_COLUMN} AS version" if spec.versioned else columns
+        self.select = f"SELECT {columns} FROM {spec.name}"
+        self.returning = f"RETURNING {self.columns}"
+        placeholders = ", ".join(f"${index}" for index in range(1, len(spec.columns) + 1))
+        arrays = ", ".join(f"${index}::{ARRAY_TYPES[spec.column_type(column)]}" for index, column in enumerate(spec.columns, 1))
+        assignments = ", ".join(f"{column} = ${index}" for index, column in enumerate(spec.columns[1:], 2))
+        self.create = register(f"{prefix}.create_{spec.singular}", f"INSERT INTO {spec.name} ({columns}) VALUES ({placeholders}) {self.returning}")
+        self.create_many = register(f"{prefix}.create_{spec.plural}", f"INSERT INTO {spec.name} ({columns}) SELECT * FROM unnest({arrays}) ON CONFLICT (id) DO NOTHING RETURNING {columns}")
+        self.page = register(f"{prefix}.get_{spec.plural}", f"{self.select} ORDER BY id LIMIT $1")
+        self.page_after = register(f"{prefix}.get_{spec.plural}_after", f"{self.select} WHERE id > $1 ORDER BY id LIMIT $2")
+        self.get = None if spec.batched else register(f"{prefix}.get_{spec.singular}", f"SELECT {self.columns} FROM {spec.name} WHERE id = $1")
+        self.get_many = register(f"{prefix}.get_{spec.plural}_by_ids", f"SELECT {self.columns} FROM {spec.name} WHERE id = ANY($1::int[])")
+        self.loader = loader(self.get_many) if spec.batched else None
+        self.delete = register(f"{prefix}.delete_{spec.singular}", f"DELETE FROM {spec.name} WHERE id = $1 {self.returning}")
+        self.update = register(f"{prefix}.update_{spec.singular}", f"UPDATE {spec.name} SET {assignments} WHERE id = $1 {self.returning}")
+        self.delete_if_version = self.update_if_version = None
+        if spec.versioned:
+            self.delete_if_version = self._if_version(f"{prefix}.delete_{spec.singular}", f"DELETE FROM {spec.name} WHERE id = $1", 2)
+            self.update_if_version = self._if_version(f"{prefix}.update_{spec.singular}", f"UPDATE {spec.name} SET {assignments} WHERE id = $1", len(spec.columns) + 1)
+        self._patches: Dict[Tuple[Tuple[str, ...], bool], Statement] = {}
+
+    def _if_version(self, name: str, write: str, index: int) -> Statement:
+        """Register the conditional form of a write, which tells a version mismatch from a missing row in one round trip.
+
+        The written row comes back with ``matched`` true. When the version differs,
+        nothing is written and the current row comes back with ``matched`` false; no
+        row means that the ID does not exist.
+
+        Args:
+            name (str): The name of the unconditional statement.
+            write (str): The ``UPDATE`` or ``DELETE`` filtering on ``id = $1``, without ``RETURNING``.
+            index (int): The parameter number of the array of expected versions.
+
+        Returns:
+            Statement: The registered statement, named after `name` with an ``_if_version`` suffix.
+        """
+        return register(f"{name}_if_version", (
+            f"WITH written AS ({write} AND {VERSION_COLUMN} = ANY(${index}::bigint[]) {self.returning}) "
+            f"SELECT *, true AS matched FROM written UNION ALL "
+            f"SELECT {self.columns}, false FROM {self.spec.name} WHERE id = $1 AND NOT EXISTS (SELECT 1 FROM written)"
+        ))
+
+    def patch(self, columns: Tuple[str, ...], conditional: bool = False) -> Statement:
+        """Get the statement writing only some columns, registered on first use.
+
+        Args:
+            columns (Tuple[str, ...]): The written columns, in table order.
+            conditional (bool): Whether the row must be at an expected version, given last. Defaults to False.
+
+        Returns:
+            Statement: The ``UPDATE`` setting these columns from ``$2`` on, the row ID being ``$1``.
+        """
+        statement = self._patches.get((columns, conditional))
+        if statement is None:
+            assignments = ", ".join(f"{column} = ${index}" for index, column in enumerate(columns, 2))
+            name = f"{self.spec.crud}.partial_update_{self.spec.singular}_set_{'_and_'.join(columns)}"
+            write = f"UPDATE {self.spec.name} SET {assignments} WHERE id = $1"
+            if conditional:
+                statement = self._if_version(name, write, len(columns) + 2)
+            else:
+                statement = register(name, f"{write} {self.returning}")
+            self._patches[(columns, conditional)] = statement
+        return statement
+
+# Statements of each table, by table name
+STATEMENTS: Dict[str, TableStatements] = {}
+
+def _where(spec: TableSpec, filters: Optional[Dict[str, Any]], after_id: Optional[int]) -> Tuple[str, str, List[Any]]:
+    """Compile the list filters into a parameterized WHERE clause.
+
+    Args:
+        spec (TableSpec): The schema of the table.
+        filters (Optional[Dict[str, Any]]): The value of each applied filter, if any.
+        after_id (Optional[int]): Only keep rows with a greater ID.
+
+    Returns:
+        Tuple[str, str, List[Any]]: The name suffix of the statement, the WHERE clause and its arguments.
+    """
+    names, conditions, args = [], [], []
+    for name, (column, operator) in spec.filters.items():
+        value = (filters or {}).get(name)
+        if value is not None:
+            args.append(value)
+            names.append(name)
+            conditions.append(f"{column} {operator} ${len(args)}")
+    suffix = "_by_" + "_and_".join(names) if names else ""
+    if after_id is not None:
+        args.append(after_id)
+        suffix += "_after"
+        conditions.append(f"id > ${len(args)}")
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+    return suffix, where, args
+
+class PostgresTable(TableStorage):
+    """Table of the Postgres database, queried through the prepared statements of the registry.
+
+    Attributes:
+        db (Union[Pool, Connection]): The handle yielded by `get_db`.
+        statements (TableStatements): The statements of the table.
+    """
+    def __init__(self, db: Union[Pool, Connection], spec: TableSpec) -> None:
+        """Initialize the table.
+
+        Args:
+            db (Union[Pool, Connection]): The handle yielded by `get_db`.
+            spec (TableSpec): The schema of the table, registered with `storage.tables.register_table`.
+        """
+        super().__init__(spec)
+        self.db = db
+        self.statements = STATEMENTS[spec.name]
+
+    async def insert(self, values: Sequence[Any]) -> Optional[Row]:
+        try:
+            return await self.statements.create.fetchrow(self.db, *values)
+        except UniqueViolationError:
+            return None
+
+    async def insert_many(self, columns: Sequence[Sequence[Any]]) -> List[Row]:
+        return await self.statements.create_many.fetch(self.db, *columns)
+
+    async def page(self, limit: int, after_id: Optional[int] = None, filters: Optional[Dict[str, Any]] = None) -> List[Row]:
+        suffix, where, args = _where(self.spec, filters, after_id)
+        if suffix == "":
+            return await self.statements.page.fetch(self.db, limit)
+        if suffix == "_after":
+            return await self.statements.page_after.fetch(self.db, after_id, limit)
+        # Each combination of filters is registered as its own prepared statement
+        statement = register(f"{self.spec.crud}.get_{self.spec.plural}{suffix}", f"{self.statements.select}{where} ORDER BY id LIMIT ${len(args) + 1}")
+        return await statement.fetch(self.db, *args, limit)
+
+    async def stream(self, batch_size: int, after_id: Optional[int] = None, filters: Optional[Dict[str, Any]] = None) -> AsyncIterator[List[Row]]:
+        """Read rows ordered by ID through a server-side cursor.
+
+        The cursor lives in a transaction on a connection reserved for the whole
+        iteration, and only `batch_size` rows are held in memory at a time. The
+        iteration is counted as one execution of ``<CRUD class>.stream_<plural>``
+        in the statement stats and the slow query log.
+
+        Args:
+            batch_size (int): The number of rows fetched per round trip.
+            after_id (Optional[int]): Only return rows with a greater ID. Defaults to None.
+            filters (Optional[Dict[str, Any]]): The value of each applied filter. Defaults to None.
+
+        Yields:
+            List[Row]: The next batch of rows.
+        """
+        suffix, where, args = _where(self.spec, filters, after_id)
+        sql = f"{self.statements.select}{where} ORDER BY id"
+        # Only the time spent in the database counts, not the time the consumer takes between batches
+        query = track(f"{self.spec.crud}.stream_{self.spec.plural}{suffix}", sql, explain=True)
+        elapsed, rows = 0.0, 0
+        try:
+            async with acquire_connection(self.db) as connection:
+                async with connection.transaction(readonly=True):
+                    start = time.perf_counter()
+                    cursor = await connection.cursor(sql, *args)
+                    while True:
+                        batch = await cursor.fetch(batch_size)
+                        elapsed += time.perf_counter() - start
+                        if not batch:
+                            break
+                        rows += len(batch)
+                        yield batch
+                        start = time.perf_counter()
+        finally:
+            query.observe(self.db, tuple(args), rows, elapsed)
+
+    async def get(self, row_id: int) -> Optional[Row]:
+        if self.statements.loader is not None:
+            return await self.statements.loader.load(self.db, row_id)
+        return await self.statements.get.fetchrow(self.db, row_id)
+
+    async def get_many(self, ids: List[int]) -> List[Row]:
+        return await self.statements.get_many.fetch(self.db, ids)
+
+    @staticmethod
+    def _matched(row: Optional[Row]) -> Optional[Row]:
+        if row is None:
+            return None
+        values = dict(row)
+        if not values.pop("matched"):
+            raise VersionConflict(f"Row {values['id']} is at version {values['version']}")
+        return values
+
+    async def delete(self, row_id: int, versions: Optional[List[int]] = None) -> Optional[Row]:
+        if versions is None:
+            return await self.statements.delete.fetchrow(self.db, row_id)
+        return self._matched(await self.statements.delete_if_version.fetchrow(self.db, row_id, versions))
+
+    async def update(self, row_id: int, values: Sequence[Any], versions: Optional[List[int]] = None) -> Optional[Row]:
+        if versions is None:
+            return await self.statements.update.fetchrow(self.db, row_id, *values)
+        return self._matched(await self.statements.update_if_version.fetchrow(self.db, row_id, *values, versions))
+
+    async def patch(self, row_id: int, values: Dict[str, Any], versions: Optional[List[int]] = None) -> Optional[Row]:
+        columns = tuple(column for column in self.spec.columns[1:] if column in values)
+        if not columns:
+            row = await self.get(row_id)
+            if row is not None and versions is not None and row["version"] not in versions:
+                raise VersionConflict(f"Row {row_id} is at version {row['version']}")
+            return row
+        # Only the sent columns are written: an untouched indexed column keeps the update HOT
+        args = [values[column] for column in columns]
+        if versions is None:
+            return await self.statements.patch(columns).fetchrow(self.db, row_id, *args)
+        return self._matched(await self.statements.patch(columns, True).fetchrow(self.db, row_id, *args, versions))
+
+    async def import_csv(self, columns: Sequence[str], source: AsyncIterator[bytes]) -> ImportResult:
+        try:
+            return await copy_and_merge(self.db, self.spec.name, columns, source, self.spec.foreign_keys, self.spec.columns)
+        except DataError as error:
+            raise InvalidData(str(error))
@@ -0,0 +1,57 @@
+from asyncpg import Connection, Pool
+from serialization import M, from_row
+from storage.base import TABLES, Row, TableSpec, TableStorage
+from storage.memory import MemoryStorage
+from storage.postgres import STATEMENTS, PostgresTable, TableStatements
+from typing import List, Sequence, Tuple, Type, Union
+
+def register_table(spec: TableSpec) -> TableSpec:
+    """Declare a table of the CRUD layer and register its Postgres statements.
+
+    Called at import time, so the statements are prepared on every pooled connection
+    like the rest of the registry.
+
+    Args:
+        spec (TableSpec): The schema of the table.
+
+    Returns:
+        TableSpec: The same schema.
+    """
+    TABLES[spec.name] = spec
+    STATEMENTS[spec.name] = TableStatements(spec)
+    return spec
+
+def open_table(db: Union[Pool, Connection, MemoryStorage], spec: TableSpec) -> TableStorage:
+    """Get the storage of a table from the handle yielded by `get_db`.
+
+    Args:
+        db (Union[Pool, Connection, MemoryStorage]): The handle yielded by `get_db`.
+        spec (TableSpec): The schema of the table.
+
+    Returns:
+        TableStorage: The table on the backend of the handle.
+    """
+    if isinstance(db, MemoryStorage):
+        return db.table(spec)
+    return PostgresTable(db, spec)
+
+def split_conflicts(model: Type[M], ids: Sequence[int], rows: Sequence[Row]) -> Tuple[List[M], List[int]]:
+    """Split the outcome of `TableStorage.insert_many` into created rows and conflicts.
+
+    Args:
+        model (Type[M]): The model of a row.
+        ids (Sequence[int]): The IDs sent, in request order.
+        rows (Sequence[Row]): The inserted rows.
+
+    Returns:
+        Tuple[List[M], List[int]]: The created rows and, in request order, the IDs that were not inserted.
+    """
+    created = [from_row(model, row) for row in rows]
+    pending = {row["id"] for row in rows}
+    conflicts = []
+    for row_id in ids:
+        if row_id in pending:
+            pending.discard(row_id)
+        else:
+            conflicts.append(row_id)
+    return created, conflicts
@@ -0,0 +1,104 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from dependencies import STORAGE_BACKEND
+from crud.slow_queries import SLOW_QUERIES
+from crud.statements import UNPREPARED, timed
+from metrics import PENDING_REQUESTS, flush_request_metrics
+from prometheus_client import REGISTRY
+
+client = TestClient(app)
+
+requires_postgres = pytest.mark.skipif(STORAGE_BACKEND != "postgres", reason="needs the postgres storage backend")
+
+@requires_postgres
+def test_get_statement_stats():
+    response = client.get("/v1/installations/1000")
+    assert response.status_code == 200
+
+    response = client.get("/v1/admin/statements")
+    assert response.status_code == 200
+    stats = {statement["name"]: statement for statement in response.json()}
+    assert stats["InstallationCRUD.get_installations_by_ids"]["calls"] >= 1
+
+@requires_postgres
+def test_get_loader_stats():
+    response = client.get("/v1/customers/1000")
+    assert response.status_code == 200
+
+    response = client.get("/v1/admin/loaders")
+    assert response.status_code == 200
+    stats = {loader["name"]: loader for loader in response.json()}
+    assert stats["CustomerCRUD.get_customers_by_ids"]["loads"] >= 1
+    assert stats["CustomerCRUD.get_customers_by_ids"]["batches"] >= 1
+
+@requires_postgres
+def test_refresh_analytics():
+    response = client.post("/v1/admin/analytics/refresh")
+    assert response.status_code == 200
+    assert {refresh["view"] for refresh in response.json()} == {"installations_by_category_month", "installations_by_country_month", "top_products_by_region"}
+
+
+def test_get_metrics():
+    response = client.get("/v1/products/1000")
+    assert response.status_code == 200
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert 'http_requests_total{method="GET",route="/v1/products/{product_id}",status="200"}' in response.text
+    assert 'db_query_duration_seconds_count{statement="ProductCRUD.get_products_by_ids"}' in response.text
+
+def test_flush_request_metrics():
+    labels = {"method": "GET", "route": "/v1/products/{product_id}", "status": "200"}
+    flush_request_metrics()
+    before = REGISTRY.get_sample_value("http_requests_total", labels) or 0
+    response = client.get("/v1/products/1000")
+    assert response.status_code == 200
+    method, route, status, _ = PENDING_REQUESTS[-1]
+    assert (method, route.path, status) == ("GET", "/v1/products/{product_id}", 200)
+    assert (REGISTRY.get_sample_value("http_requests_total", labels) or 0) == before
+
+    flush_request_metrics()
+    assert PENDING_REQUESTS == []
+    assert REGISTRY.get_sample_value("http_requests_total", labels) == before + 1
+
+def test_request_metrics_method_label():
+    response = client.request("PURGE", "/v1/products/1000")
+    assert response.status_code == 405
+    flush_request_metrics()
+    methods = {sample.labels["method"] for metric in REGISTRY.collect() if metric.name == "http_requests" for sample in metric.samples}
+    assert "other" in methods and "PURGE" not in methods
+
+def test_get_slow_queries():
+    response = client.delete("/v1/admin/slow-queries")
+    assert response.status_code == 204
+
+    response = client.get("/v1/admin/slow-queries")
+    assert response.status_code == 200
+    assert response.json() == []
+
+def test_get_timed_query_stats():
+    async def run_query():
+        async with timed("test.copy_installation", "COPY installation FROM STDIN", None) as timing:
+            timing.rows = 3
+
+    threshold = SLOW_QUERIES.threshold
+    SLOW_QUERIES.threshold = 1e-9
+    try:
+        asyncio.run(run_query())
+    finally:
+        SLOW_QUERIES.threshold = threshold
+
+    response = client.get("/v1/admin/statements")
+    assert response.status_code == 200
+    stats = {statement["name"]: statement for statement in response.json()}
+    assert stats["test.copy_installation"]["calls"] == 1
+    assert stats["test.copy_installation"]["rows"] == 3
+    assert stats["test.copy_installation"]["prepares"] == 0
+
+    response = client.get("/v1/admin/slow-queries")
+    assert response.status_code == 200
+    assert response.json()[0]["statement"] == "test.copy_installation"
+    assert response.json()[0]["plan"] is None
+    UNPREPARED.pop("test.copy_installation")
\ No newline at end of file
@@ -0,0 +1,38 @@
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from dependencies import STORAGE_BACKEND
+
+client = TestClient(app)
+
+pytestmark = pytest.mark.skipif(STORAGE_BACKEND != "postgres", reason="needs the postgres storage backend")
+
+def test_get_installations_by_category():
+    response = client.get("/v1/analytics/installations-by-category", params={"month_from": "2021-07-01", "month_to": "2021-09-01"})
+    assert response.status_code == 200
+    report = response.json()
+    assert report["view"] == "installations_by_category_month"
+    assert report["refreshed_at"] is not None
+    assert len(report["rows"]) > 0
+    assert all("2021-07-01" <= row["month"] <= "2021-09-01" for row in report["rows"])
+
+def test_get_installations_by_country():
+    response = client.get("/v1/analytics/installations-by-country", params={"region": "Europe"})
+    assert response.status_code == 200
+    report = response.json()
+    assert len(report["rows"]) > 0
+    assert all(row["region"] == "Europe" for row in report["rows"])
+
+def test_get_top_products_by_region():
+    response = client.get("/v1/analytics/top-products-by-region", params={"limit": 1})
+    assert response.status_code == 200
+    rows = response.json()["rows"]
+    assert len(rows) > 0
+    assert all(row["rank"] == 1 for row in rows)
+    assert len({row["region"] for row in rows}) == len(rows)
+
+    response = client.get("/v1/analytics/top-products-by-region", params={"limit": 0})
+    assert response.status_code == 422
+
+
+# pytest test/test_analytics.py -v
\ No newline at end of file
@@ -110,4 +110,47 @@ def test_delete_invalid():
     response = client.delete(f"/v1/countries/{'string'}")
     assert response.status_code == 422
 
+def test_post_bulk():
+    response = client.post(
+        "/v1/countries/bulk",
+        json=[
+            {"id": 9990, "name": "Bulkland", "region": "TestRegion"},
+            {"id": 9990, "name": "Bulkland Again", "region": "TestRegion"},
+            {"id": 1000, "name": "DuplicateCountry", "region": "DuplicateRegion"}
+        ]
+    )
+    assert response.status_code == 200
+    assert response.json()["created"] == [{"id": 9990, "name": "Bulkland", "region": "TestRegion"}]
+    assert [conflict["id"] for conflict in response.json()["conflicts"]] == [9990, 1000]
+
+    response = client.delete("/v1/countries/9990")
+    assert response.status_code == 204
+
+def test_cached_reads():
+    # Entering the client runs the lifespan, which fills the reference-table caches
+    with TestClient(app) as cached_client:
+        response = cached_client.get("/v1/countries/1000")
+        assert response.status_code == 200
+        assert response.json() == {"id": 1000, "name": "Belgium", "region": "Europe"}
+
+        response = cached_client.post("/v1/countries/", json={"id": 9990, "name": "Cacheland", "region": "TestRegion"})
+        assert response.status_code == 201
+        response = cached_client.get("/v1/countries/9990")
+        assert response.status_code == 200
+        assert response.json() == {"id": 9990, "name": "Cacheland", "region": "TestRegion"}
+
+        response = cached_client.delete("/v1/countries/9990")
+        assert response.status_code == 204
+        response = cached_client.get("/v1/countries/9990")
+        assert response.status_code == 404
+
+def test_get_not_modified():
+    response = client.get("/v1/countries/1000")
+    assert response.status_code == 200
+    assert response.headers["cache-control"].startswith("public")
+
+    response = client.get("/v1/countries/1000", headers={"If-None-Match": response.headers["etag"]})
+    assert response.status_code == 304
+
+
 # pytest test/test_country.py -v
\ No newline at end of file
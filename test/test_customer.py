@@ -1,3 +1,4 @@
+import pyarrow as pa
 from fastapi.testclient import TestClient
 from main import app
 
@@ -73,6 +74,15 @@ def test_patch_customer_success():
     assert response.status_code == 200
     assert response.json() == {"id": 9999, "name": "Partially Updated User", "email": "updateduser@test.com", "country_id": 1000, "premium_customer": "yes"}
 
+def test_patch_customer_null():
+    response = client.patch("/v1/customers/9999", json={"email": None})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "email"]
+
+    response = client.patch("/v1/customers/9999", json={})
+    assert response.status_code == 200
+    assert response.json()["email"] == "updateduser@test.com"
+
 def test_patch_customer_failed():
     response = client.patch(
         "/v1/customers/9998",
@@ -103,4 +113,49 @@ def test_delete_customer_failed():
 
 def test_delete_customer_invalid():
     response = client.delete(f"/v1/customers/{'string'}")
-    assert response.status_code == 422
\ No newline at end of file
+    assert response.status_code == 422
+
+def test_import_customers():
+    csv = (
+        "id,name,email,country_id,premium_customer\n"
+        "9990,Imported User,imported@test.com,1000,no\n"
+        "1000,Alberto Alvaro,alberto@alvaro.com,1001,yes\n"
+        "9991,Orphan User,orphan@test.com,9999,no\n"
+    )
+    response = client.post("/v1/customers/import", content=csv, headers={"Content-Type": "text/csv"})
+    assert response.status_code == 200
+    assert response.json() == {"staged": 3, "inserted": 1, "updated": 1, "rejected": 1}
+
+    response = client.get("/v1/customers/9991")
+    assert response.status_code == 404
+    response = client.delete("/v1/customers/9990")
+    assert response.status_code == 204
+
+def test_import_customers_missing_values():
+    name = client.get("/v1/customers/1000").json()["name"]
+    response = client.post("/v1/customers/import", content="id\n9995\n", headers={"Content-Type": "text/csv"})
+    assert response.status_code == 200
+    assert response.json() == {"staged": 1, "inserted": 0, "updated": 0, "rejected": 1}
+
+    response = client.post("/v1/customers/import", content="id,name\n1000,\n9995,Partial User\n", headers={"Content-Type": "text/csv"})
+    assert response.status_code == 200
+    assert response.json() == {"staged": 2, "inserted": 0, "updated": 0, "rejected": 2}
+
+    response = client.get("/v1/customers/9995")
+    assert response.status_code == 404
+    response = client.get("/v1/customers/1000")
+    assert response.status_code == 200
+    assert response.json()["name"] == name
+
+def test_import_customers_invalid():
+    response = client.post("/v1/customers/import", content="id,unknown\n1,2\n", headers={"Content-Type": "text/csv"})
+    assert response.status_code == 422
+    response = client.post("/v1/customers/import", json=[{"id": 1}])
+    assert response.status_code == 415
+
+def test_export_customers():
+    response = client.get("/v1/customers", headers={"Accept": "application/vnd.apache.arrow.stream"})
+    assert response.status_code == 200
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.column_names == ["id", "name", "email", "country_id", "premium_customer"]
+    assert table.num_rows >= 6
\ No newline at end of file
@@ -0,0 +1,113 @@
+import asyncio
+import time
+import httpx
+from fastapi import Depends
+from fastapi.testclient import TestClient
+from main import app
+from dependencies import get_db
+from crud.installation import InstallationCRUD
+from endpoints.installation import get_installation_crud
+from idempotency import IdempotencyStore, StoredResponse
+
+client = TestClient(app)
+
+class SlowInstallationCRUD(InstallationCRUD):
+    """Installation CRUD whose creations take long enough for duplicates to overlap, and are counted."""
+    calls = 0
+
+    async def create_installation(self, installation):
+        SlowInstallationCRUD.calls += 1
+        await asyncio.sleep(0.1)
+        return await super().create_installation(installation)
+
+def get_slow_installation_crud(db=Depends(get_db)) -> SlowInstallationCRUD:
+    return SlowInstallationCRUD(db)
+
+def stored(body: bytes, expires: float) -> StoredResponse:
+    return StoredResponse(b"", 201, [], body, expires)
+
+def keep(store: IdempotencyStore, key: str, response: StoredResponse) -> None:
+    async def run():
+        store.start(key)
+        store.finish(key, response)
+    asyncio.run(run())
+
+def test_post_installation_retried():
+    installation = {"id": 9980, "name": "Inst-99980", "description": "Retried Installation", "product_id": 1000, "customer_id": 1000, "installation_date": "2023-01-01"}
+    response = client.post("/v1/installations/", json=installation, headers={"Idempotency-Key": "test-post-installation-retried"})
+    assert response.status_code == 201
+    assert "idempotent-replayed" not in response.headers
+
+    response = client.post("/v1/installations/", json=installation, headers={"Idempotency-Key": "test-post-installation-retried"})
+    assert response.status_code == 201
+    assert response.headers["idempotent-replayed"] == "true"
+    assert response.json() == installation
+
+    response = client.post("/v1/installations/", json={**installation, "name": "Inst-99981"}, headers={"Idempotency-Key": "test-post-installation-retried"})
+    assert response.status_code == 422
+
+    response = client.post("/v1/installations/", json=installation)
+    assert response.status_code == 409
+
+    response = client.delete("/v1/installations/9980")
+    assert response.status_code == 204
+
+def test_post_installations_bulk_retried():
+    installations = [{"id": 9981, "name": "Inst-99981", "description": "Retried Bulk Installation", "product_id": 1000, "customer_id": 1000, "installation_date": "2023-01-01"}]
+    response = client.post("/v1/installations/bulk", json=installations, headers={"Idempotency-Key": "test-post-installations-bulk-retried"})
+    assert response.status_code == 200
+    assert response.json() == {"created": installations, "conflicts": []}
+
+    response = client.post("/v1/installations/bulk", json=installations, headers={"Idempotency-Key": "test-post-installations-bulk-retried"})
+    assert response.status_code == 200
+    assert response.json() == {"created": installations, "conflicts": []}
+
+    response = client.delete("/v1/installations/9981")
+    assert response.status_code == 204
+
+def test_post_installation_concurrent_duplicates():
+    installation = {"id": 9982, "name": "Inst-99982", "description": "Concurrent Installation", "product_id": 1000, "customer_id": 1000, "installation_date": "2023-01-01"}
+
+    async def post_duplicates():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as async_client:
+            return await asyncio.gather(*(
+                async_client.post("/v1/installations/", json=installation, headers={"Idempotency-Key": "test-post-installation-concurrent"})
+                for _ in range(5)
+            ))
+
+    app.dependency_overrides[get_installation_crud] = get_slow_installation_crud
+    SlowInstallationCRUD.calls = 0
+    try:
+        responses = asyncio.run(post_duplicates())
+    finally:
+        app.dependency_overrides.clear()
+    assert SlowInstallationCRUD.calls == 1
+    assert [response.status_code for response in responses] == [201] * 5
+    assert sorted(response.headers.get("idempotent-replayed", "false") for response in responses) == ["false"] + ["true"] * 4
+    assert all(response.json() == installation for response in responses)
+
+    response = client.delete("/v1/installations/9982")
+    assert response.status_code == 204
+
+def test_idempotency_store_expiry():
+    store = IdempotencyStore(ttl=60)
+    keep(store, "expired", stored(b"old", time.monotonic() - 1))
+    keep(store, "kept", stored(b"new", time.monotonic() + 60))
+    assert store.get("expired") is None
+    assert store.get("kept").body == b"new"
+
+def test_idempotency_store_eviction():
+    store = IdempotencyStore(max_keys=2, max_bytes=10)
+    for key in ("a", "b", "c"):
+        keep(store, key, stored(b"123", time.monotonic() + 60))
+    assert store.get("a") is None
+    assert store.get("b") is not None and store.get("c") is not None
+
+    keep(store, "d", stored(b"12345678", time.monotonic() + 60))
+    assert store.get("b") is None and store.get("c") is None
+    assert store.get("d") is not None
+
+    keep(store, "e", stored(b"too large body", time.monotonic() + 60))
+    assert store.get("e") is None
+    assert store.get("d") is not None
+    assert store.in_flight("e") is None
\ No newline at end of file
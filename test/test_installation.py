@@ -1,5 +1,8 @@
+import msgpack
+import pyarrow as pa
 from fastapi.testclient import TestClient
 from main import app
+from pagination import encode_cursor
 
 client = TestClient(app)
 
@@ -73,6 +76,16 @@ def test_patch_installation_success():
     assert response.status_code == 200
     assert response.json() == {"id": 9999, "name": "Inst-99999", "description": "Partially Updated Installation", "product_id": 1000, "customer_id": 1000, "installation_date": "2023-01-02"}
 
+def test_patch_installation_null():
+    response = client.patch("/v1/installations/1000", json={"product_id": None, "name": None})
+    assert response.status_code == 422
+    assert sorted(error["loc"][1] for error in response.json()["detail"]) == ["name", "product_id"]
+
+    response = client.get("/v1/installations/1000")
+    assert response.status_code == 200
+    assert response.json()["product_id"] is not None
+    assert response.json()["name"] is not None
+
 def test_patch_installation_failed():
     response = client.patch(
         "/v1/installations/9998",
@@ -103,4 +116,165 @@ def test_delete_installation_failed():
 
 def test_delete_installation_invalid():
     response = client.delete(f"/v1/installations/{'string'}")
-    assert response.status_code == 422
\ No newline at end of file
+    assert response.status_code == 422
+
+def test_get_installations_paginated():
+    response = client.get("/v1/installations", params={"limit": 10})
+    assert response.status_code == 200
+    first_page = response.json()
+    assert len(first_page) == 10
+    assert 'rel="next"' in response.headers["link"]
+
+    response = client.get("/v1/installations", params={"limit": 10, "cursor": response.headers["x-next-cursor"]})
+    assert response.status_code == 200
+    second_page = response.json()
+    assert second_page[0]["id"] > first_page[-1]["id"]
+
+def test_get_installations_invalid_page():
+    response = client.get("/v1/installations", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
+    response = client.get("/v1/installations", params={"limit": 100000})
+    assert response.status_code == 422
+
+def test_get_installations_boolean_cursor():
+    response = client.get("/v1/installations", params={"cursor": encode_cursor(True)})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
+
+def test_get_installations_out_of_range_cursor():
+    for last_id in (2**31, -2**31 - 1):
+        response = client.get("/v1/installations", params={"cursor": encode_cursor(last_id)})
+        assert response.status_code == 400
+        assert response.json() == {"detail": "Invalid cursor"}
+    response = client.get("/v1/installations", params={"cursor": encode_cursor(2**31 - 1)})
+    assert response.status_code == 200
+    assert response.json() == []
+
+def test_get_installations_filtered():
+    response = client.get("/v1/installations", params={"customer_id": 1000})
+    assert response.status_code == 200
+    installations = response.json()
+    assert len(installations) > 0
+    assert all(installation["customer_id"] == 1000 for installation in installations)
+
+    response = client.get("/v1/installations", params={"product_id": 1005, "installation_date_from": "2021-08-01", "installation_date_to": "2021-08-31"})
+    assert response.status_code == 200
+    installations = response.json()
+    assert len(installations) > 0
+    assert all(installation["product_id"] == 1005 and "2021-08-01" <= installation["installation_date"] <= "2021-08-31" for installation in installations)
+
+def test_get_installations_invalid_filter():
+    response = client.get("/v1/installations", params={"installation_date_from": "2021-10-01", "installation_date_to": "2021-09-01"})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["query", "installation_date_from"]
+    response = client.get("/v1/installations", params={"customer_id": "abc"})
+    assert response.status_code == 422
+
+def test_get_installations_expanded():
+    response = client.get("/v1/installations", params={"customer_id": 1000, "expand": "customer.country,product.category"})
+    assert response.status_code == 200
+    installations = response.json()
+    assert len(installations) > 0
+    for installation in installations:
+        assert installation["customer"]["id"] == installation["customer_id"]
+        assert installation["customer"]["country"]["id"] == installation["customer"]["country_id"]
+        assert installation["product"]["id"] == installation["product_id"]
+        assert installation["product"]["category"]["id"] == installation["product"]["category_id"]
+
+    response = client.get("/v1/installations/1000", params={"expand": "customer"})
+    assert response.status_code == 200
+    assert response.json()["customer"]["id"] == response.json()["customer_id"]
+    assert "product" not in response.json()
+
+    response = client.get("/v1/installations", params={"expand": "invalid"})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["query", "expand"]
+
+def test_export_installations():
+    response = client.get("/v1/installations", headers={"Accept": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [line for line in response.text.splitlines() if line]
+    assert len(rows) >= 36
+
+    response = client.get("/v1/installations", headers={"Accept": "text/csv"})
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert lines[0] == "id,name,description,product_id,customer_id,installation_date"
+    assert len(lines) == len(rows) + 1
+
+def test_export_installations_binary():
+    response = client.get("/v1/installations", headers={"Accept": "application/x-ndjson"})
+    count = len([line for line in response.text.splitlines() if line])
+
+    response = client.get("/v1/installations", headers={"Accept": "application/msgpack"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/msgpack")
+    unpacker = msgpack.Unpacker(raw=False)
+    unpacker.feed(response.content)
+    rows = list(unpacker)
+    assert len(rows) == count
+    assert set(rows[0]) == {"id", "name", "description", "product_id", "customer_id", "installation_date"}
+
+    response = client.get("/v1/installations", headers={"Accept": "application/vnd.apache.arrow.stream"})
+    assert response.status_code == 200
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.num_rows == count
+    assert table.schema.field("installation_date").type == pa.date32()
+    assert table.column("id").to_pylist() == sorted(table.column("id").to_pylist())
+
+def test_post_installations_bulk():
+    response = client.post(
+        "/v1/installations/bulk",
+        json=[
+            {"id": 9990, "name": "Inst-99990", "description": "Bulk Installation", "product_id": 1000, "customer_id": 1000, "installation_date": "2023-01-01"},
+            {"id": 1000, "name": "Inst-00000", "description": "Duplicate Installation", "product_id": 1000, "customer_id": 1000, "installation_date": "2023-01-01"}
+        ]
+    )
+    assert response.status_code == 200
+    assert response.json() == {
+        "created": [{"id": 9990, "name": "Inst-99990", "description": "Bulk Installation", "product_id": 1000, "customer_id": 1000, "installation_date": "2023-01-01"}],
+        "conflicts": [{"id": 1000, "detail": "Installation with id 1000 already exists."}]
+    }
+
+    response = client.delete("/v1/installations/9990")
+    assert response.status_code == 204
+
+def test_get_installation_not_modified():
+    response = client.get("/v1/installations/1000")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    response = client.get("/v1/installations/1000", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    response = client.get("/v1/installations", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+def test_put_installation_if_match():
+    response = client.get("/v1/installations/1000")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    installation = response.json()
+
+    response = client.put("/v1/installations/1000", json=installation, headers={"If-Match": '"0"'})
+    assert response.status_code == 412
+
+    response = client.patch("/v1/installations/1000", json={"description": installation["description"]}, headers={"If-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    patched_etag = response.headers["etag"]
+
+    response = client.put("/v1/installations/1000", json=installation, headers={"If-Match": etag})
+    assert response.status_code == 412
+
+    response = client.put("/v1/installations/1000", json=installation, headers={"If-Match": patched_etag})
+    assert response.status_code == 200
+    assert response.json() == installation
+
+    response = client.delete("/v1/installations/1000", headers={"If-Match": patched_etag})
+    assert response.status_code == 412
+    response = client.delete("/v1/installations/9999", headers={"If-Match": patched_etag})
+    assert response.status_code == 404
\ No newline at end of file
@@ -0,0 +1,123 @@
+import asyncio
+import time
+import pytest
+from fastapi import HTTPException
+from starlette.datastructures import State
+from starlette.requests import Request
+from typing import Dict, Optional
+from replicas import CONSISTENCY_HEADER, ConsistencyTokenMiddleware, Replica, ReplicaSet, parse_lsn
+
+class StubPool:
+    """Pool answering every query with its WAL position, with a fixed number of connections in use."""
+    def __init__(self, lsn: str = "0/0", in_use: int = 0, size: int = 10) -> None:
+        self.lsn = lsn
+        self.in_use = in_use
+        self.size = size
+
+    def get_size(self) -> int:
+        return self.size
+
+    def get_idle_size(self) -> int:
+        return self.size - self.in_use
+
+    def get_max_size(self) -> int:
+        return self.size
+
+    async def fetchval(self, query: str) -> str:
+        return self.lsn
+
+    async def close(self) -> None:
+        pass
+
+def replica_set(*replicas: Replica, wait_timeout: float = 0.05) -> ReplicaSet:
+    replica_set = ReplicaSet(StubPool("0/1000"), list(replicas), wait_timeout=wait_timeout)
+    asyncio.run(replica_set.check())
+    return replica_set
+
+def request(method: str, headers: Optional[Dict[str, str]] = None) -> Request:
+    return Request({"type": "http", "method": method, "path": "/", "headers": [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()], "state": {}})
+
+def test_parse_lsn():
+    assert parse_lsn("16/B374D848") == (0x16 << 32) + 0xB374D848
+    assert parse_lsn("0/0") == 0
+    for lsn in ("B374D848", "16/XYZ", ""):
+        with pytest.raises(ValueError):
+            parse_lsn(lsn)
+
+def test_read_pool_least_busy():
+    busy, idle, down = StubPool("0/1000", in_use=8), StubPool("0/1000", in_use=2), StubPool(None)
+    replicas = replica_set(Replica("busy", busy), Replica("idle", idle), Replica("down", down))
+    assert [replica.healthy for replica in replicas.replicas] == [True, True, False]
+    assert asyncio.run(replicas.read_pool()) is idle
+
+    idle.in_use = 9
+    assert asyncio.run(replicas.read_pool()) is busy
+
+def test_read_pool_skips_lagging_replicas():
+    behind, caught_up = StubPool("0/100", in_use=0), StubPool("0/200", in_use=5)
+    replicas = replica_set(Replica("behind", behind), Replica("caught-up", caught_up))
+    assert asyncio.run(replicas.read_pool(parse_lsn("0/150"))) is caught_up
+    assert asyncio.run(replicas.read_pool(parse_lsn("0/100"))) is behind
+
+def test_read_pool_falls_back_to_primary():
+    replicas = replica_set(Replica("behind", StubPool("0/100")), wait_timeout=0.05)
+    started = time.monotonic()
+    assert asyncio.run(replicas.read_pool(parse_lsn("0/200"))) is replicas.primary
+    assert time.monotonic() - started >= 0.05
+
+def test_read_pool_waits_for_simulated_lag():
+    # The simulated replica is a second pool on the primary, reporting its WAL position with a delay
+    lagging = StubPool("0/100")
+    replica = Replica("simulated", lagging, simulated_lag=0.05)
+    replicas = ReplicaSet(StubPool("0/100"), [replica], wait_timeout=1)
+    asyncio.run(replicas.check())
+    assert replica.healthy and replica.replay_lsn == 0
+
+    started = time.monotonic()
+    assert asyncio.run(replicas.read_pool(parse_lsn("0/100"))) is lagging
+    assert 0.05 <= time.monotonic() - started < 1
+    assert replica.replay_lsn == parse_lsn("0/100")
+
+def test_pool_for():
+    replica = StubPool("0/200")
+    replicas = replica_set(Replica("replica", replica))
+
+    write = request("POST")
+    assert asyncio.run(replicas.pool_for(write)) is replicas.primary
+    assert write.state.wrote_primary
+
+    read = request("GET", {CONSISTENCY_HEADER: "0/100"})
+    assert asyncio.run(replicas.pool_for(read)) is replica
+    assert not hasattr(read.state, "wrote_primary")
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(replicas.pool_for(request("GET", {CONSISTENCY_HEADER: "not-a-token"})))
+    assert error.value.status_code == 400
+
+def test_consistency_token_on_successful_writes():
+    class App:
+        state = State({"replicas": replica_set(Replica("replica", StubPool("0/1000")))})
+
+    def respond(status: int, wrote_primary: bool):
+        async def endpoint(scope, receive, send):
+            if wrote_primary:
+                scope["state"]["wrote_primary"] = True
+            await send({"type": "http.response.start", "status": status, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+        return endpoint
+
+    def token(method: str, status: int, wrote_primary: bool = True):
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": method, "app": App(), "state": {}}
+        asyncio.run(ConsistencyTokenMiddleware(respond(status, wrote_primary))(scope, None, send))
+        return dict(sent[0]["headers"]).get(CONSISTENCY_HEADER.lower().encode())
+
+    assert token("POST", 201) == b"0/1000"
+    assert token("DELETE", 204) == b"0/1000"
+    assert token("POST", 409) is None
+    assert token("POST", 201, wrote_primary=False) is None
+    assert token("GET", 200) is None
\ No newline at end of file
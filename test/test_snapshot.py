@@ -0,0 +1,108 @@
+import asyncio
+import pyarrow.parquet as pq
+import snapshot
+from contextlib import asynccontextmanager
+from datetime import date
+
+def installation(installation_id: int, installation_date, **joined) -> dict:
+    return {"id": installation_id, "name": f"Inst-{installation_id}", "description": "Snapshot Installation", "product_id": 1000, "customer_id": 1000, "installation_date": installation_date, **joined}
+
+class StubCursor:
+    def __init__(self, rows: list) -> None:
+        self.rows = rows
+
+    async def fetch(self, count: int) -> list:
+        batch, self.rows = self.rows[:count], self.rows[count:]
+        return batch
+
+class StubConnection:
+    """Connection whose cursor returns the given rows, in order, whatever the query."""
+    def __init__(self, rows: list) -> None:
+        self.rows = rows
+        self.queries = []
+        self.closed = False
+
+    @asynccontextmanager
+    async def transaction(self, **options):
+        assert options == {"isolation": "repeatable_read", "readonly": True}
+        yield
+
+    async def cursor(self, query: str) -> StubCursor:
+        self.queries.append(query)
+        return StubCursor(self.rows)
+
+    async def close(self) -> None:
+        self.closed = True
+
+def run_snapshot(monkeypatch, root, rows: list, denormalize: bool = False, batch_size: int = 2) -> dict:
+    connection = StubConnection(rows)
+
+    async def connect_db():
+        return connection
+
+    monkeypatch.setattr(snapshot, "connect_db", connect_db)
+    partitions = asyncio.run(snapshot.write_snapshot(str(root), denormalize, batch_size, "zstd"))
+    assert connection.closed
+    return partitions
+
+def test_partition():
+    assert snapshot.partition(date(2021, 8, 31)) == "installation_month=2021-08"
+    assert snapshot.partition(None) == "installation_month=__HIVE_DEFAULT_PARTITION__"
+
+def test_write_snapshot_partitions(monkeypatch, tmp_path):
+    # Ordered like the query, rows without a date last; the batches of 3 rows straddle the month boundaries
+    rows = [
+        installation(1, date(2021, 8, 1)),
+        installation(2, date(2021, 8, 31)),
+        installation(3, date(2021, 9, 1)),
+        installation(4, date(2021, 9, 15)),
+        installation(5, date(2021, 10, 1)),
+        installation(6, None),
+        installation(7, None),
+    ]
+    partitions = run_snapshot(monkeypatch, tmp_path, rows, batch_size=3)
+    assert partitions == {
+        "installation_month=2021-08": 2,
+        "installation_month=2021-09": 2,
+        "installation_month=2021-10": 1,
+        "installation_month=__HIVE_DEFAULT_PARTITION__": 2,
+    }
+    for name, count in partitions.items():
+        table = pq.read_table(tmp_path / name / "part-0.parquet")
+        assert table.num_rows == count
+        assert table.schema == snapshot.snapshot_schema(False)
+    assert pq.read_table(tmp_path / "installation_month=2021-09" / "part-0.parquet").column("id").to_pylist() == [3, 4]
+    assert pq.ParquetFile(tmp_path / "installation_month=2021-09" / "part-0.parquet").num_row_groups == 2
+    assert pq.read_table(tmp_path / "installation_month=__HIVE_DEFAULT_PARTITION__" / "part-0.parquet").column("installation_date").to_pylist() == [None, None]
+
+def test_write_snapshot_denormalized(monkeypatch, tmp_path):
+    query = snapshot.snapshot_query(True)
+    assert "LEFT JOIN product ON product.id = i.product_id" in query
+    assert "LEFT JOIN customer ON customer.id = i.customer_id" in query
+    assert query.endswith("ORDER BY i.installation_date, i.id")
+
+    schema = snapshot.snapshot_schema(True)
+    assert "product_name" in schema.names and "customer_email" in schema.names
+    assert "product_id" in schema.names and schema.names.count("product_id") == 1
+
+    joined = {name: None for name in schema.names if name.startswith(("product_", "customer_")) and name not in ("product_id", "customer_id")}
+    rows = [installation(1, date(2021, 8, 1), **{**joined, "product_name": "Scanner", "customer_email": "user@test.com"})]
+    run_snapshot(monkeypatch, tmp_path, rows, denormalize=True)
+    table = pq.read_table(tmp_path / "installation_month=2021-08" / "part-0.parquet")
+    assert table.schema == schema
+    assert table.column("product_name").to_pylist() == ["Scanner"]
+    assert table.column("customer_email").to_pylist() == ["user@test.com"]
+
+def test_replace_directory(tmp_path):
+    target = tmp_path / "snapshot"
+    first, second = tmp_path / ".first", tmp_path / ".second"
+    for directory, name in ((first, "old.parquet"), (second, "new.parquet")):
+        directory.mkdir()
+        (directory / name).write_bytes(b"data")
+
+    snapshot.replace_directory(str(first), str(target))
+    assert [path.name for path in target.iterdir()] == ["old.parquet"]
+
+    snapshot.replace_directory(str(second), str(target))
+    assert [path.name for path in target.iterdir()] == ["new.parquet"]
+    assert [path.name for path in tmp_path.iterdir()] == ["snapshot"]
\ No newline at end of file
@@ -0,0 +1,45 @@
+import asyncio
+import pytest
+from dependencies import MEMORY_SEED_FILE
+import main  # Registers the tables of the CRUD layer
+from storage.base import TABLES, IntegrityError, InvalidData
+from storage.memory import MemoryStorage
+
+def seeded_storage():
+    storage = MemoryStorage(TABLES.values())
+    with open(MEMORY_SEED_FILE) as file:
+        storage.load_sql(file.read())
+    return storage
+
+def test_memory_storage_filters_on_foreign_key_index():
+    installations = seeded_storage().tables["installation"]
+    customer_id = installations.rows[1000]["customer_id"]
+    rows = asyncio.run(installations.page(100, None, {"customer_id": customer_id}))
+    assert rows
+    assert all(row["customer_id"] == customer_id for row in rows)
+    assert [row["id"] for row in rows] == sorted(installations.indexes["customer_id"][customer_id])
+
+def test_memory_storage_enforces_foreign_keys():
+    storage = seeded_storage()
+    with pytest.raises(IntegrityError):
+        asyncio.run(storage.tables["customer"].insert((9999, "Test Customer", "test@example.com", 999999, "yes")))
+    with pytest.raises(IntegrityError):
+        asyncio.run(storage.tables["country"].delete(1000))
+    assert 1000 in storage.tables["country"].rows
+
+def test_memory_storage_imports_csv():
+    async def source(data):
+        yield data
+
+    customers = seeded_storage().tables["customer"]
+    result = asyncio.run(customers.import_csv(["id", "name", "country_id"], source(b"1000,Renamed,1001\n9999,New,1000\n9998,Dangling,999999\n9999,Newer,1000\n")))
+    # The header lacks email and premium_customer: the new IDs are rejected rather than inserted with nulls
+    assert (result.staged, result.inserted, result.updated, result.rejected) == (4, 0, 1, 3)
+    assert customers.rows[1000]["name"] == "Renamed"
+    assert customers.rows[1000]["email"] == "alberto@alvaro.com"
+    assert 9999 not in customers.rows
+    result = asyncio.run(customers.import_csv(list(customers.spec.columns), source(b"9999,New,new@test.com,1000,no\n9999,Newer,new@test.com,1000,no\n9997,,empty@test.com,1000,no\n")))
+    assert (result.staged, result.inserted, result.updated, result.rejected) == (3, 1, 0, 1)
+    assert customers.rows[9999]["name"] == "Newer"
+    with pytest.raises(InvalidData):
+        asyncio.run(customers.import_csv(["id", "country_id"], source(b"1000,abc\n")))
\ No newline at end of file